@@ -1,6 +1,6 @@
 import os
 import sqlite3
-from datetime import datetime
+import sys
 
 # Get the directory of the main.py script (c:/Code/ResponSync-1/src)
 # Assuming the database is in c:/Code/ResponSync-1/database/
@@ -9,25 +9,83 @@ SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.abspath(os.path.join(SRC_DIR, '..')) # Go up from src/backend to ResponSync-1
 DB_PATH = os.path.join(ROOT_DIR, 'database', 'database.db')
 
+if os.path.dirname(DB_PATH) not in sys.path:
+    sys.path.insert(0, os.path.dirname(DB_PATH))
+import storage
+
 def connect_to_db():
     """Connects to the SQLite database."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = storage.connect(DB_PATH)
         print(f"Connected to {os.path.basename(DB_PATH)}")
     except sqlite3.Error as e:
         print(f"Could not establish a connection to {os.path.basename(DB_PATH)}: {e}")
         return None
     return conn
 
-def calculate_kpi(conn):
-    """Calculates and displays KPI details for each allocation."""
-    cursor = conn.cursor()
+# Always listed in the distributions, even before their first allocation
+INCIDENT_TYPES = ('crime', 'fire', 'medical', 'accident')
+RESOURCE_TYPES = ('Police Car', 'Ambulance', 'Fire Truck')
+
+def read_kpi_totals(conn):
+    """Reads the running aggregates that the history triggers keep up to date.
 
-    query = """
+    Returns (totals_row, incident_counts, resource_counts); the cost doesn't
+    depend on how much history there is.
+    """
+    totals = conn.execute("""
+        SELECT allocation_count, latency_sum, latency_count, first_report_epoch, last_report_epoch
+        FROM kpi_totals WHERE id = 1
+    """).fetchone()
+    incident_counts = dict.fromkeys(INCIDENT_TYPES, 0)
+    resource_counts = dict.fromkeys(RESOURCE_TYPES, 0)
+    for category, type_name, count in conn.execute('SELECT category, type, count FROM kpi_type_counts'):
+        counts = incident_counts if category == 'incident' else resource_counts
+        counts[type_name] = count
+    return totals, incident_counts, resource_counts
+
+# Filters accepted by the allocation history: name -> (condition, parser).
+# start/end bound the assignment time, in epoch seconds.
+HISTORY_FILTERS = {
+    "incident_type": ("ci.type = ?", str),
+    "resource_type": ("cr.type = ?", str),
+    "severity": ("ci.severity = ?", int),
+    "start": ("ca.assignment_epoch >= ?", int),
+    "end": ("ca.assignment_epoch < ?", int),
+}
+
+def parse_history_filters(args):
+    """Picks the history filters out of a mapping of strings. Raises ValueError on a bad value."""
+    return {name: parse(args[name]) for name, (_, parse) in HISTORY_FILTERS.items() if args.get(name)}
+
+def history_cursor(detail):
+    """Keyset cursor just past `detail`: '<assignment epoch>.<allocation id>'."""
+    return f"{detail['assignment_epoch']}.{detail['allocation_id']}"
+
+def parse_history_cursor(cursor):
+    """(assignment epoch, allocation id) from a history cursor. Raises ValueError if malformed."""
+    epoch, allocation_id = cursor.split('.')
+    return int(epoch), int(allocation_id)
+
+def iter_allocation_history(conn, filters=None, after=None, limit=None, chunk_size=500):
+    """Yields historical allocations with their allocation time, oldest first.
+
+    Rows are ordered by (assignment time, allocation id), which the
+    assignment index serves directly, so resuming `after` a cursor is an
+    index seek rather than an OFFSET scan.
+    """
+    conditions, params = [], []
+    for name, value in (filters or {}).items():
+        conditions.append(HISTORY_FILTERS[name][0])
+        params.append(value)
+    if after is not None:
+        conditions.append("(ca.assignment_epoch, ca.allocation_id) > (?, ?)")
+        params.extend(after)
+    query = f"""
     SELECT
         ca.allocation_id,
-        ca.assignment_time,
-        ci.report_time,
+        ca.assignment_epoch,
+        ca.assignment_epoch - ci.report_epoch AS allocation_time_seconds,
         ci.type AS incident_type,
         ci.severity AS incident_severity,
         cr.type AS resource_type
@@ -37,58 +95,67 @@ def calculate_kpi(conn):
         all_incidents ci ON ca.incident_id = ci.incident_id
     JOIN
         all_resources cr ON ca.resource_id = cr.resource_id
+    WHERE {' AND '.join(conditions) or '1'}
     ORDER BY
-        ca.assignment_time;
+        ca.assignment_epoch, ca.allocation_id
+    {'LIMIT ?' if limit is not None else ''};
     """
-
-    try:
-        cursor.execute(query)
-        allocations = cursor.fetchall()
-
-        if not allocations:
-            print("No allocations found in the database.")
-            return None
-
-        print("\n--- Allocation Details ---\n")
-        print(f"{'Allocation ID':<15} {'Resource Type':<15} {'Incident Type':<15} {'Severity':<10} {'Allocation Time (s)':<25}")
-        print("-" * 80)
-        allocation_details = []
-        total_allocation_time = 0
-        incident_counts = {'crime': 0, 'fire': 0, 'medical': 0, 'accident':0}
-        resource_counts = {'Police Car':0,'Ambulance':0,'Fire Truck':0}
-
-        for alloc in allocations:
-            alloc_id, assignment_time_str, report_time_str, incident_type, incident_severity, resource_type = alloc
-
-            # Convert string timestamps to datetime objects
-            assignment_time = datetime.strptime(assignment_time_str, '%Y-%m-%d %H:%M:%S')
-            report_time = datetime.strptime(report_time_str, '%Y-%m-%d %H:%M:%S')
-            # Calculate incident and resource counts
-            incident_counts[incident_type] += 1
-            resource_counts[resource_type] += 1
-            
-            # Calculate allocation time in seconds
-            allocation_time_delta = assignment_time - report_time
-            allocation_time_seconds = allocation_time_delta.total_seconds()
-            total_allocation_time+=allocation_time_seconds
-
-            print(f"{alloc_id:<15} {resource_type:<15} {incident_type:<15} {incident_severity:<10} {allocation_time_seconds:<25.2f}")
-            allocation_details.append({
+    if limit is not None:
+        params.append(limit)
+
+    cursor = conn.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for alloc_id, assignment_epoch, allocation_time_seconds, incident_type, incident_severity, resource_type in rows:
+            yield {
                 "allocation_id": alloc_id,
+                "assignment_epoch": assignment_epoch,
                 "resource_type": resource_type,
                 "incident_type": incident_type,
                 "severity": incident_severity,
                 "allocation_time_seconds": f"{allocation_time_seconds:.2f}"
-            })
+            }
+
+def get_allocation_history_page(conn, filters=None, after=None, limit=100):
+    """One keyset page: (details, cursor of the next page or None on the last page)."""
+    details = list(iter_allocation_history(conn, filters, after, limit + 1))
+    if len(details) <= limit:
+        return details, None
+    details = details[:limit]
+    return details, history_cursor(details[-1])
+
+def print_allocation_details(allocation_details):
+    """Prints the allocation detail table (command-line use only)."""
+    print("\n--- Allocation Details ---\n")
+    print(f"{'Allocation ID':<15} {'Resource Type':<15} {'Incident Type':<15} {'Severity':<10} {'Allocation Time (s)':<25}")
+    print("-" * 80)
+    for detail in allocation_details:
+        print(f"{detail['allocation_id']:<15} {detail['resource_type']:<15} {detail['incident_type']:<15} "
+              f"{detail['severity']:<10} {detail['allocation_time_seconds']:<25}")
+    print("\n--- End of Allocation Details ---\n")
 
-        average_allocation_time = total_allocation_time / len(allocations)
+def calculate_kpi(conn):
+    """Builds the KPI summary from the running aggregates.
+
+    The per-allocation details are served separately, a page at a time
+    (see iter_allocation_history).
+    """
+    try:
+        totals, incident_counts, resource_counts = read_kpi_totals(conn)
+        total_allocations, latency_sum, latency_count, _, _ = totals
+
+        if not total_allocations:
+            print("No allocations found in the database.")
+            return None
+
+        average_allocation_time = latency_sum / latency_count if latency_count else 0.0
         simulation_length = calculate_simulation_length(conn)
         incident_distribution, resource_distribution = calculate_distributions(incident_counts, resource_counts)
-        total_allocations = len(allocations)
 
         print(f"\nAverage Allocation Time: {average_allocation_time:.2f} seconds")
         print(f"\nSimulation Length: {simulation_length:.2f} seconds")
-        print("\n--- End of Allocation Details ---\n")
 
         # Combine all kpi data into kpi_data and return
         kpi_data = {
@@ -96,8 +163,7 @@ def calculate_kpi(conn):
             "resource_distribution": resource_distribution,
             "average_allocation_time": f"{average_allocation_time:.2f}",
             "simulation_length": f"{simulation_length:.2f}",
-            "total_allocations": total_allocations,
-            "allocation_details": allocation_details
+            "total_allocations": total_allocations
         }
 
         return kpi_data
@@ -107,35 +173,18 @@ def calculate_kpi(conn):
         return None
 
 def calculate_simulation_length(conn):
-    """Calculates and displays the simulation length in seconds."""
-    cursor = conn.cursor()
-
-    query = """
-    SELECT
-        MIN(report_time) AS start_time,
-        MAX(report_time) AS end_time
-    FROM
-        all_incidents;
-    """
+    """Returns the time between the first and last reported incident, in seconds."""
     try:
-        cursor.execute(query)
-        result = cursor.fetchone()
-        start_time_str, end_time_str = result
-
-        # Convert string timestamps to datetime objects
-        start_time = datetime.strptime(start_time_str, '%Y-%m-%d %H:%M:%S')
-        end_time = datetime.strptime(end_time_str, '%Y-%m-%d %H:%M:%S')
-
-        # Calculate simulation length in seconds
-        simulation_length_delta = end_time - start_time
-        simulation_length_seconds = simulation_length_delta.total_seconds()
-
+        start_time, end_time = conn.execute(
+            'SELECT first_report_epoch, last_report_epoch FROM kpi_totals WHERE id = 1').fetchone()
     except sqlite3.Error as e:
         print(f"Error querying simulation length: {e}")
         return None
 
+    if start_time is None or end_time is None:
+        return 0.0
     # return simulation length in seconds
-    return simulation_length_seconds
+    return float(end_time - start_time)
 
 def calculate_distributions(incident_counts, resource_counts):
     """Calculates and displays incident and resource distributions."""
@@ -162,20 +211,21 @@ def main():
     conn = connect_to_db()
     if conn:
         # Calculate KPIs
-        calculate_kpi(conn)
+        kpi_data = calculate_kpi(conn)
+        if kpi_data:
+            print_allocation_details(iter_allocation_history(conn))
         conn.close()
         print("KPI calculation complete.")
     else:
         print("Database connection failed. Cannot calculate KPIs.")
 
 def get_kpi_data():
-    conn = connect_to_db()
-    if conn:
-        kpi_data = calculate_kpi(conn)
-        conn.close()
-        return kpi_data
-    else:
-        print("Database connection failed in get_kpi_data. Cannot calculate KPIs.")
+    # Borrow from the API's pool instead of opening a connection per request
+    try:
+        with storage.get_pool(DB_PATH).connection() as conn:
+            return calculate_kpi(conn)
+    except sqlite3.Error as e:
+        print(f"Database connection failed in get_kpi_data. Cannot calculate KPIs: {e}")
         return {"kpi_data": []}
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import bisect
+import threading
+import time
+
+# Upper bounds (seconds) of the report -> allocation latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 15, 30, 60, 120, 300)
+
+# How long to keep collecting events after the first one before waking the allocator
+DEFAULT_MAX_WAIT_SECONDS = 0.2
+
+
+class LatencyHistogram:
+    """Per-bucket (non-cumulative) counts plus sum and count of observed latencies."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)  # last bucket is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self._sum += seconds
+            self._count += 1
+
+    def snapshot(self):
+        """Returns the histogram as a JSON-friendly dict."""
+        with self._lock:
+            labels = [str(b) for b in self.bounds] + ['+Inf']
+            return {
+                "buckets": [{"le": label, "count": count} for label, count in zip(labels, self._counts)],
+                "count": self._count,
+                "sum_seconds": round(self._sum, 6),
+                "average_seconds": round(self._sum / self._count, 6) if self._count else None
+            }
+
+
+class AllocationTrigger:
+    """Wakes the in-process allocator as soon as new work arrives.
+
+    The API calls notify() when an incident or resource is created. The
+    allocator thread blocks in wait_for_batch(), which returns once events
+    arrive and max_wait seconds have passed since the first of them, so a
+    burst of reports is handled in one cycle instead of one cycle each.
+    """
+
+    def __init__(self, max_wait=DEFAULT_MAX_WAIT_SECONDS):
+        self.max_wait = max_wait
+        self._events = []
+        self._condition = threading.Condition()
+        self._reported_at = {}  # incident_id -> monotonic report time
+        self.latency = LatencyHistogram()
+
+    def notify(self, kind, entity_id):
+        """Records a new incident/resource and wakes the allocator."""
+        now = time.monotonic()
+        with self._condition:
+            if kind == 'incident':
+                self._reported_at[entity_id] = now
+            self._events.append((kind, entity_id, now))
+            self._condition.notify_all()
+
+    def wait_for_batch(self, timeout):
+        """Blocks until events arrive (or timeout) and returns the coalesced batch.
+
+        An empty list means the timeout passed without any new events, which
+        the caller treats as a periodic sweep.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._events:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+
+            # Let the rest of a burst land before handing the batch over
+            window_end = self._events[0][2] + self.max_wait
+            while True:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch, self._events = self._events, []
+            return batch
+
+    def allocation_made(self, incident_id):
+        """Records the report -> allocation latency for an incident reported through this process."""
+        with self._condition:
+            reported_at = self._reported_at.pop(incident_id, None)
+        if reported_at is not None:
+            self.latency.observe(time.monotonic() - reported_at)
+
+    def forget_incident(self, incident_id):
+        """Drops tracking for an incident that was deleted before being allocated."""
+        with self._condition:
+            self._reported_at.pop(incident_id, None)
+
+
+# Shared by the API handlers and the allocator thread started from main.py
+allocation_trigger = AllocationTrigger()
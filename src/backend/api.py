@@ -1,9 +1,30 @@
 import sqlite3
-from flask import Flask, request, jsonify, g, render_template
+from flask import Flask, Response, request, jsonify, g, render_template
 import os # Import the os module
 from flask_cors import CORS
 from . import KPI # Import the KPI module using a relative import
+from . import kpi_rollups
+from .allocation_trigger import allocation_trigger
+from .delta_sync import Feed, SyncState, VersionedCache, deleted_ids
+from .change_stream import ChangeStream
+from .prediction_service import PredictionBatcher
+from contextlib import contextmanager
 import threading # Import threading for the shutdown event
+import sys
+import json
+import time
+
+# The allocator's helpers live in src/model and the storage layer in
+# src/database; neither is a package
+MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'model'))
+DATABASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'database'))
+for _path in (MODEL_DIR, DATABASE_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from spatial_index import ResourceIndex
+import model_versions
+import storage
 
 # Determine the absolute path to the database file
 # __file__ is the path to api.py (e.g., c:/Code/ResponSync/src/backend/api.py)
@@ -15,22 +36,41 @@ DATABASE_ABS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'
 
 DATABASE = DATABASE_ABS_PATH # Use the absolute path
 
+# Training data and versioned models (src/backend/../../data)
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+
 app = Flask(__name__)
 CORS(app) # This will enable CORS for all routes
 app.config['JSON_SORT_KEYS'] = False # Keep JSON order as is
 
 def get_db():
-    """Opens a new database connection if there is none yet for the current application context."""
+    """Borrows a pooled connection (WAL, tuned pragmas) for the current application context."""
     if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row # Return rows as dictionary-like objects
+        g.db = storage.get_pool(DATABASE).acquire() # Rows come back as sqlite3.Row
     return g.db
 
 @app.teardown_appcontext
 def close_db(error):
-    """Closes the database again at the end of the request."""
-    if hasattr(g, 'db'):
-        g.db.close()
+    """Returns the connection to the pool at the end of the request."""
+    db = g.pop('db', None)
+    if db is not None:
+        storage.get_pool(DATABASE).release(db)
+
+# --- Spatial index over current_resources ---
+# Built lazily from the database on first use, then kept in sync by the
+# resource/allocation handlers below so queries never rescan the table.
+_resource_index = None
+_resource_index_lock = threading.Lock()
+
+def get_resource_index():
+    """Returns the process-wide resource index, building it from current_resources if needed."""
+    global _resource_index
+    if _resource_index is None:
+        with _resource_index_lock:
+            if _resource_index is None:
+                rows = query_db('SELECT resource_id, type, current_latitude, current_longitude FROM current_resources')
+                _resource_index = ResourceIndex.from_records(rows)
+    return _resource_index
 
 def query_db(query, args=(), one=False):
     """Helper function to query the database."""
@@ -40,15 +80,231 @@ def query_db(query, args=(), one=False):
     return (rv[0] if rv else None) if one else rv
 
 def execute_db(query, args=()):
-    """Helper function to execute commands (INSERT, UPDATE, DELETE)."""
+    """Helper function to execute commands (INSERT, UPDATE, DELETE).
+
+    Commits immediately unless called inside storage.transaction(), in which
+    case the write becomes part of that transaction.
+    """
     conn = get_db()
     cur = conn.cursor()
     cur.execute(query, args)
-    conn.commit()
+    if not conn.in_explicit_transaction:
+        conn.commit()
     last_id = cur.lastrowid
     cur.close()
     return last_id
 
+# --- Bulk ingestion helpers ---
+
+def _parse_batch_body(key):
+    """Reads a batch body as a JSON array, {key: [...]}, or NDJSON (one object per line).
+
+    Returns (rows, error_message).
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        rows = []
+        # Read line by line so large streams are parsed as they arrive
+        for line_no, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                return None, f"Invalid JSON on line {line_no}"
+        return rows, None
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get(key)
+    if not isinstance(data, list):
+        return None, f"Expected a JSON array, {{\"{key}\": [...]}} or NDJSON body"
+    return data, None
+
+def _bulk_insert(conn, tables, columns, rows):
+    """Inserts rows into every table in `tables` and returns the IDs assigned in the last one.
+
+    Must run inside a write transaction: AUTOINCREMENT IDs handed out in one
+    exclusive transaction are contiguous, so they can be derived from
+    sqlite_sequence instead of reading every row back.
+    """
+    placeholders = ', '.join('?' * len(columns))
+    for table in tables:
+        conn.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', rows)
+    last_id = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', [tables[-1]]).fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+# --- Delta sync and ETags ---
+
+@app.after_request
+def add_etag(response):
+    """Strong ETag and If-None-Match -> 304 for every GET that didn't set its own ETag."""
+    if (request.method == 'GET' and response.status_code == 200
+            and not response.is_streamed and 'ETag' not in response.headers):
+        response.add_etag()
+        response = response.make_conditional(request)
+    return response
+
+def _sync_headers(response, state, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate; a 304 costs no query
+    response.headers['X-Sync-Cursor'] = state.cursor
+    return response
+
+def _serve_feed(feed):
+    """Shared GET logic for the delta-syncable endpoints.
+
+    Without ?since the body is the full JSON array, as before, and the
+    cursor is sent in X-Sync-Cursor. With ?since=<cursor> the body is
+    {"cursor", "reset", "upserts", "deleted"}; reset is true (and upserts is
+    the full list) when the cursor is too old or from another database.
+    """
+    since = request.args.get('since')
+    conn = get_db()
+    # A read transaction gives the version check and the rows one snapshot
+    with storage.transaction(conn, immediate=False):
+        state = SyncState(conn, feed.tables)
+        etag = state.etag(feed.name, since)
+        if request.if_none_match.contains(etag):
+            return _sync_headers(app.response_class(status=304), state, etag)
+        body = feed.read_all(conn) if since is None else feed.body(conn, state, since)
+    return _sync_headers(jsonify(body), state, etag)
+
+def _table_feed(name, table, pk, serialize, where='1'):
+    """Feed over one current_* table. Rows that stop matching `where` are reported as deleted."""
+    def read_all(conn):
+        return [serialize(row) for row in conn.execute(f'SELECT * FROM {table} WHERE {where} ORDER BY {pk}')]
+
+    def read_delta(conn, since):
+        upserts = [serialize(row) for row in conn.execute(
+            f'SELECT * FROM {table} WHERE change_seq > ? AND ({where}) ORDER BY {pk}', [since])]
+        left_feed = [row[0] for row in conn.execute(
+            f'SELECT {pk} FROM {table} WHERE change_seq > ? AND NOT ({where})', [since])]
+        return upserts, sorted(left_feed + deleted_ids(conn, table, since))
+
+    return Feed(name, [table], read_all, read_delta)
+
+# An allocation's joined row changes when the allocation, its incident or its resource does
+ALLOCATIONS_CHANGED_SINCE = '''
+    ca.allocation_id IN (
+        SELECT allocation_id FROM current_allocations WHERE change_seq > :since
+        UNION SELECT allocation_id FROM current_allocations WHERE incident_id IN
+            (SELECT incident_id FROM current_incidents WHERE change_seq > :since)
+        UNION SELECT allocation_id FROM current_allocations WHERE resource_id IN
+            (SELECT resource_id FROM current_resources WHERE change_seq > :since))
+'''
+# ...and drops out of the join when any of the three is deleted
+ALLOCATIONS_ORPHANED_SINCE = '''
+    SELECT allocation_id FROM current_allocations
+    WHERE incident_id IN (SELECT entity_id FROM sync_tombstones WHERE table_name = 'current_incidents' AND change_seq > :since)
+       OR resource_id IN (SELECT entity_id FROM sync_tombstones WHERE table_name = 'current_resources' AND change_seq > :since)
+'''
+
+def _allocation_feed(name, select_sql, serialize):
+    """Feed over a current_allocations JOIN current_incidents/current_resources query (aliased ca, i, r)."""
+    def read_all(conn):
+        return [serialize(row) for row in conn.execute(f'{select_sql} ORDER BY ca.allocation_id')]
+
+    def read_delta(conn, since):
+        params = {"since": since}
+        upserts = [serialize(row) for row in conn.execute(
+            f'{select_sql} WHERE {ALLOCATIONS_CHANGED_SINCE} ORDER BY ca.allocation_id', params)]
+        orphaned = [row[0] for row in conn.execute(ALLOCATIONS_ORPHANED_SINCE, params)]
+        deleted = set(orphaned) | set(deleted_ids(conn, 'current_allocations', since))
+        return upserts, sorted(deleted)
+
+    return Feed(name, ['current_allocations', 'current_incidents', 'current_resources'], read_all, read_delta)
+
+# Feeds behind the GET endpoints (and the map's change stream)
+INCIDENTS_FEED = _table_feed('incidents', 'current_incidents', 'incident_id', dict)
+RESOURCES_FEED = _table_feed('resources', 'current_resources', 'resource_id', dict)
+ALLOCATIONS_FEED = _allocation_feed('allocations', '''
+    SELECT ca.*, i.type as incident_type, r.type as resource_type
+    FROM current_allocations ca
+    JOIN current_incidents i ON ca.incident_id = i.incident_id
+    JOIN current_resources r ON ca.resource_id = r.resource_id
+''', dict)
+
+MAP_INCIDENTS_FEED = _table_feed('map-incidents', 'current_incidents', 'incident_id', lambda incident: {
+    'incident_id': incident['incident_id'],
+    'location_latitude': incident['location_latitude'],
+    'location_longitude': incident['location_longitude'],
+    'severity': incident['severity'],
+    'type': incident['type']
+})
+# Units that leave 'available' show up in a delta's deleted list
+MAP_RESOURCES_FEED = _table_feed('map-resources', 'current_resources', 'resource_id', lambda r: {
+    'resource_id': r['resource_id'],
+    'current_latitude': r['current_latitude'],
+    'current_longitude': r['current_longitude'],
+    'type': r['type'],
+    'status': r['status']
+}, where="status = 'available'")
+ROUTEPAIR_FEED = _allocation_feed('routepair', """
+    SELECT
+        ca.allocation_id as allocation_id,
+        i.incident_id as incident_id,
+        i.location_latitude as incident_lat,
+        i.location_longitude as incident_lng,
+        r.resource_id as resource_id,
+        r.current_latitude as resource_lat,
+        r.current_longitude as resource_lng,
+        r.type as resource_type,
+        r.status as resource_status
+    FROM current_allocations ca
+    JOIN current_incidents i ON ca.incident_id = i.incident_id
+    JOIN current_resources r ON ca.resource_id = r.resource_id
+""", lambda route_data: {
+    "allocation_id": route_data["allocation_id"],
+    "incident": {
+        "lat": route_data["incident_lat"],
+        "lng": route_data["incident_lng"],
+        "incident_id": route_data["incident_id"]
+    },
+    "resource": {
+        "lat": route_data["resource_lat"],
+        "lng": route_data["resource_lng"],
+        "resource_id": route_data["resource_id"],
+        "type": route_data["resource_type"],
+        "status": route_data["resource_status"]
+    }
+})
+
+@contextmanager
+def _read_snapshot():
+    """Pooled connection inside a read transaction, for use outside a request."""
+    with storage.get_pool(DATABASE).connection() as conn, storage.transaction(conn, immediate=False):
+        yield conn
+
+# Pushes the map feeds to every /api/stream client; write handlers call notify()
+change_stream = ChangeStream({
+    'incidents': MAP_INCIDENTS_FEED,
+    'resources': MAP_RESOURCES_FEED,
+    'routepair': ROUTEPAIR_FEED,
+}, _read_snapshot)
+
+# Serialized /api/map_state payload for the current change version
+map_state_cache = VersionedCache()
+
+def _publish_changes():
+    """Called by every write handler after it commits."""
+    map_state_cache.invalidate()
+    change_stream.notify()
+
+@app.route('/api/stream', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events stream of map changes.
+
+    The first events are a full snapshot of each feed, or only the changes
+    after ?cursor= / Last-Event-ID when resuming. After that an event is
+    pushed whenever a write handler commits.
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    return Response(change_stream.stream(cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Don't let nginx buffer the stream
+    })
+
 # --- Incident Endpoints (CRD) ---
 
 @app.route('/incidents', methods=['POST'])
@@ -59,29 +315,55 @@ def create_incident():
         return jsonify({"error": "Missing required fields"}), 400
 
     try:
-        incident_id = execute_db(
-            'INSERT INTO all_incidents (location_latitude, location_longitude, severity, type) VALUES (?, ?, ?, ?)',
-            [data['location_latitude'], data['location_longitude'], data['severity'], data['type']]
-        )
+        with storage.transaction(get_db()):
+            execute_db(
+                'INSERT INTO all_incidents (location_latitude, location_longitude, severity, type) VALUES (?, ?, ?, ?)',
+                [data['location_latitude'], data['location_longitude'], data['severity'], data['type']]
+            )
+            incident_id = execute_db(
+                'INSERT INTO current_incidents (location_latitude, location_longitude, severity, type) VALUES (?, ?, ?, ?)',
+                [data['location_latitude'], data['location_longitude'], data['severity'], data['type']]
+            )
+        new_incident = query_db('SELECT * FROM current_incidents WHERE incident_id = ?', [incident_id], one=True)
+        allocation_trigger.notify('incident', incident_id)
+        _publish_changes()
+        return jsonify(dict(new_incident)), 201
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
+@app.route('/incidents/batch', methods=['POST'])
+def create_incidents_batch():
+    """Creates many incidents in one transaction and returns their IDs."""
+    items, error = _parse_batch_body('incidents')
+    if error:
+        return jsonify({"error": error}), 400
+
+    columns = ('location_latitude', 'location_longitude', 'severity', 'type')
+    errors = [pos for pos, item in enumerate(items)
+              if not isinstance(item, dict) or not all(k in item for k in columns)]
+    if errors:
+        return jsonify({"error": "Missing required fields", "invalid_indices": errors[:100]}), 400
+    if not items:
+        return jsonify({"created": 0, "incident_ids": []}), 201
+
+    rows = [tuple(item[k] for k in columns) for item in items]
+    conn = get_db()
     try:
-        incident_id = execute_db(
-            'INSERT INTO current_incidents (location_latitude, location_longitude, severity, type) VALUES (?, ?, ?, ?)',
-            [data['location_latitude'], data['location_longitude'], data['severity'], data['type']]
-        )
-        new_incident = query_db('SELECT * FROM current_incidents WHERE incident_id = ?', [incident_id], one=True)
-        return jsonify(dict(new_incident)), 201
+        with storage.transaction(conn):
+            incident_ids = _bulk_insert(conn, ('all_incidents', 'current_incidents'), columns, rows)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
+    for incident_id in incident_ids:
+        allocation_trigger.notify('incident', incident_id)
+    _publish_changes()
+    return jsonify({"created": len(incident_ids), "incident_ids": incident_ids}), 201
+
 @app.route('/incidents', methods=['GET'])
 def get_incidents():
-    """Retrieves all incidents."""
+    """Retrieves all incidents, or the changes since ?since=<cursor>."""
     try:
-        incidents = query_db('SELECT * FROM current_incidents')
-        return jsonify([dict(ix) for ix in incidents]), 200
+        return _serve_feed(INCIDENTS_FEED)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
@@ -106,6 +388,8 @@ def delete_incident(incident_id):
             return jsonify({"error": "Incident not found"}), 404
 
         execute_db('DELETE FROM current_incidents WHERE incident_id = ?', [incident_id])
+        allocation_trigger.forget_incident(incident_id)
+        _publish_changes()
         # Consider deleting related allocations as well, or handle foreign key constraints
         # execute_db('DELETE FROM current_allocations WHERE incident_id = ?', [incident_id])
         return jsonify({"message": "Incident deleted successfully"}), 200
@@ -125,29 +409,60 @@ def create_resource():
          return jsonify({"error": "Invalid status value"}), 400
 
     try:
-        resource_id = execute_db(
-            'INSERT INTO all_resources (type, current_latitude, current_longitude, status) VALUES (?, ?, ?, ?)',
-            [data['type'], data['current_latitude'], data['current_longitude'], data['status']]
-        )
-    except sqlite3.Error as e:
-        return jsonify({"error": f"Database error: {e}"}), 500
-
-    try:
-        resource_id = execute_db(
-            'INSERT INTO current_resources (type, current_latitude, current_longitude, status) VALUES (?, ?, ?, ?)',
-            [data['type'], data['current_latitude'], data['current_longitude'], data['status']]
-        )
+        with storage.transaction(get_db()):
+            execute_db(
+                'INSERT INTO all_resources (type, current_latitude, current_longitude, status) VALUES (?, ?, ?, ?)',
+                [data['type'], data['current_latitude'], data['current_longitude'], data['status']]
+            )
+            resource_id = execute_db(
+                'INSERT INTO current_resources (type, current_latitude, current_longitude, status) VALUES (?, ?, ?, ?)',
+                [data['type'], data['current_latitude'], data['current_longitude'], data['status']]
+            )
         new_resource = query_db('SELECT * FROM current_resources WHERE resource_id = ?', [resource_id], one=True)
+        get_resource_index().add(resource_id, new_resource['type'],
+                                 new_resource['current_latitude'], new_resource['current_longitude'])
+        allocation_trigger.notify('resource', resource_id)
+        _publish_changes()
         return jsonify(dict(new_resource)), 201
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
       
+@app.route('/resources/batch', methods=['POST'])
+def create_resources_batch():
+    """Creates many resources in one transaction and returns their IDs."""
+    items, error = _parse_batch_body('resources')
+    if error:
+        return jsonify({"error": error}), 400
+
+    columns = ('type', 'current_latitude', 'current_longitude', 'status')
+    errors = [pos for pos, item in enumerate(items)
+              if not isinstance(item, dict) or not all(k in item for k in columns)
+              or item.get('status') not in ('available', 'en_route', 'occupied')]
+    if errors:
+        return jsonify({"error": "Missing required fields or invalid status", "invalid_indices": errors[:100]}), 400
+    if not items:
+        return jsonify({"created": 0, "resource_ids": []}), 201
+
+    rows = [tuple(item[k] for k in columns) for item in items]
+    conn = get_db()
+    try:
+        with storage.transaction(conn):
+            resource_ids = _bulk_insert(conn, ('all_resources', 'current_resources'), columns, rows)
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+    index = get_resource_index()
+    for resource_id, (resource_type, lat, lon, _) in zip(resource_ids, rows):
+        index.add(resource_id, resource_type, lat, lon)
+        allocation_trigger.notify('resource', resource_id)
+    _publish_changes()
+    return jsonify({"created": len(resource_ids), "resource_ids": resource_ids}), 201
+
 @app.route('/resources', methods=['GET'])
 def get_resources():
-    """Retrieves all resources."""
+    """Retrieves all resources, or the changes since ?since=<cursor>."""
     try:
-        resources = query_db('SELECT * FROM current_resources')
-        return jsonify([dict(res) for res in resources]), 200
+        return _serve_feed(RESOURCES_FEED)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
@@ -162,6 +477,38 @@ def get_resource(resource_id):
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
+@app.route('/resources/nearest', methods=['POST'])
+def get_nearest_resources():
+    """Returns the k nearest unallocated resources of the requested types for each query point.
+
+    Expects {"k": 5, "queries": [{"incident_id": 1, "latitude": ..., "longitude": ..., "types": ["Ambulance"]}]}.
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('queries'), list):
+        return jsonify({"error": "Missing required field (queries)"}), 400
+    try:
+        k = int(data.get('k', 5))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    try:
+        allocated = {row['resource_id'] for row in query_db('SELECT resource_id FROM current_allocations')}
+        index = get_resource_index()
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+    results = []
+    for q in data['queries']:
+        try:
+            nearest = index.nearest(q['latitude'], q['longitude'], q.get('types', []), k, exclude=allocated)
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Each query needs latitude, longitude and types"}), 400
+        results.append({
+            "incident_id": q.get('incident_id'),
+            "candidates": [{"resource_id": rid, "distance": dist} for rid, dist in nearest]
+        })
+    return jsonify(results), 200
+
 @app.route('/resources/<int:resource_id>', methods=['PUT'])
 def update_resource(resource_id):
     """Updates an existing resource."""
@@ -195,6 +542,9 @@ def update_resource(resource_id):
 
         execute_db(query, values)
         updated_resource = query_db('SELECT * FROM current_resources WHERE resource_id = ?', [resource_id], one=True)
+        get_resource_index().add(resource_id, updated_resource['type'],
+                                 updated_resource['current_latitude'], updated_resource['current_longitude'])
+        _publish_changes()
         return jsonify(dict(updated_resource)), 200
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
@@ -209,10 +559,13 @@ def delete_resource(resource_id):
         if resource is None:
             return jsonify({"error": "Resource not found"}), 404
 
-        # Delete related allocations first due to foreign key constraints
-        execute_db('DELETE FROM current_allocations WHERE resource_id = ?', [resource_id])
-        # Then delete the resource
-        execute_db('DELETE FROM current_resources WHERE resource_id = ?', [resource_id])
+        with storage.transaction(get_db()):
+            # Delete related allocations first due to foreign key constraints
+            execute_db('DELETE FROM current_allocations WHERE resource_id = ?', [resource_id])
+            # Then delete the resource
+            execute_db('DELETE FROM current_resources WHERE resource_id = ?', [resource_id])
+        get_resource_index().remove(resource_id)
+        _publish_changes()
         return jsonify({"message": "Resource and related allocations deleted successfully"}), 200
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
@@ -231,32 +584,36 @@ def create_allocation():
     predicted_time = data.get('predicted_response_time') # Can be None
 
     try:
-        # Check if incident and resource exist
-        incident = query_db('SELECT 1 FROM current_incidents WHERE incident_id = ?', [data['incident_id']], one=True)
-        resource = query_db('SELECT 1 FROM current_resources WHERE resource_id = ?', [data['resource_id']], one=True)
-        if not incident:
-            return jsonify({"error": f"Incident with ID {data['incident_id']} not found"}), 404
-        if not resource:
-            return jsonify({"error": f"Resource with ID {data['resource_id']} not found"}), 404
-
-        # Check for UNIQUE constraint on incident_id (only one allocation per incident)
-        existing_allocation = query_db('SELECT 1 FROM current_allocations WHERE incident_id = ?', [data['incident_id']], one=True)
-        if existing_allocation:
-             return jsonify({"error": f"Incident {data['incident_id']} already has an allocation"}), 409 # Conflict
-
-        execute_db(
-            'INSERT INTO all_allocations (incident_id, resource_id, predicted_response_time) VALUES (?, ?, ?)',
-            [data['incident_id'], data['resource_id'], predicted_time]
-        )
-
-        allocation_id = execute_db(
-            'INSERT INTO current_allocations (incident_id, resource_id, predicted_response_time) VALUES (?, ?, ?)',
-            [data['incident_id'], data['resource_id'], predicted_time]
-        )
-        new_allocation = query_db('SELECT * FROM current_allocations WHERE allocation_id = ?', [allocation_id], one=True)
-
-        # Optionally update resource status to 'en_route' upon allocation
-        execute_db('UPDATE current_resources SET status = ? WHERE resource_id = ?', ['en_route', data['resource_id']])
+        # Checks and writes share one transaction so a concurrent cycle can't claim the incident in between
+        with storage.transaction(get_db()):
+            # Check if incident and resource exist
+            incident = query_db('SELECT 1 FROM current_incidents WHERE incident_id = ?', [data['incident_id']], one=True)
+            resource = query_db('SELECT 1 FROM current_resources WHERE resource_id = ?', [data['resource_id']], one=True)
+            if not incident:
+                return jsonify({"error": f"Incident with ID {data['incident_id']} not found"}), 404
+            if not resource:
+                return jsonify({"error": f"Resource with ID {data['resource_id']} not found"}), 404
+
+            # Check for UNIQUE constraint on incident_id (only one allocation per incident)
+            existing_allocation = query_db('SELECT 1 FROM current_allocations WHERE incident_id = ?', [data['incident_id']], one=True)
+            if existing_allocation:
+                 return jsonify({"error": f"Incident {data['incident_id']} already has an allocation"}), 409 # Conflict
+
+            execute_db(
+                'INSERT INTO all_allocations (incident_id, resource_id, predicted_response_time) VALUES (?, ?, ?)',
+                [data['incident_id'], data['resource_id'], predicted_time]
+            )
+
+            allocation_id = execute_db(
+                'INSERT INTO current_allocations (incident_id, resource_id, predicted_response_time) VALUES (?, ?, ?)',
+                [data['incident_id'], data['resource_id'], predicted_time]
+            )
+            new_allocation = query_db('SELECT * FROM current_allocations WHERE allocation_id = ?', [allocation_id], one=True)
+
+            # Optionally update resource status to 'en_route' upon allocation
+            execute_db('UPDATE current_resources SET status = ? WHERE resource_id = ?', ['en_route', data['resource_id']])
+        allocation_trigger.allocation_made(data['incident_id'])
+        _publish_changes()
 
         return jsonify(dict(new_allocation)), 201
     except sqlite3.IntegrityError as e:
@@ -265,20 +622,101 @@ def create_allocation():
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
+# SQLite's default limit on bound parameters is 999 on older builds
+SQL_IN_CHUNK = 500
+
+def _select_in(conn, query, ids):
+    """Runs `query` (with a {} placeholder for the IN list) over ids in chunks, yielding the rows."""
+    ids = list(ids)
+    for start in range(0, len(ids), SQL_IN_CHUNK):
+        chunk = ids[start:start + SQL_IN_CHUNK]
+        yield from conn.execute(query.format(', '.join('?' * len(chunk))), chunk)
+
+def _ids_present(conn, query, ids):
+    """Returns the set of IDs matched by a single-column `_select_in` query."""
+    return {row[0] for row in _select_in(conn, query, ids)}
+
+@app.route('/allocations/batch', methods=['POST'])
+def create_allocations_batch():
+    """Validates and creates a whole cycle's allocations in a single transaction.
+
+    Accepts {"allocations": [{"incident_id", "resource_id", "predicted_response_time"}, ...]}
+    and returns a result per item: created, conflict, not_found or invalid.
+    """
+    data = request.get_json()
+    items = data.get('allocations') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return jsonify({"error": "Missing required field (allocations)"}), 400
+
+    results = [None] * len(items)
+    parsed = []
+    for pos, item in enumerate(items):
+        try:
+            parsed.append((pos, int(item['incident_id']), int(item['resource_id']), item.get('predicted_response_time')))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            results[pos] = {"status": "invalid", "error": "Missing or invalid incident_id/resource_id"}
+
+    conn = get_db()
+    try:
+        # BEGIN IMMEDIATE takes the write lock up front so validation and inserts see the same state
+        with storage.transaction(conn):
+            incident_ids = {incident_id for _, incident_id, _, _ in parsed}
+            resource_ids = {resource_id for _, _, resource_id, _ in parsed}
+            known_incidents = _ids_present(conn, 'SELECT incident_id FROM current_incidents WHERE incident_id IN ({})', incident_ids)
+            known_resources = _ids_present(conn, 'SELECT resource_id FROM current_resources WHERE resource_id IN ({})', resource_ids)
+            # all_allocations also has UNIQUE(incident_id), so history counts as taken too
+            taken_incidents = _ids_present(conn, 'SELECT incident_id FROM current_allocations WHERE incident_id IN ({})', incident_ids)
+            taken_incidents |= _ids_present(conn, 'SELECT incident_id FROM all_allocations WHERE incident_id IN ({})', incident_ids)
+            busy_resources = _ids_present(conn, 'SELECT resource_id FROM current_allocations WHERE resource_id IN ({})', resource_ids)
+
+            rows = []
+            for pos, incident_id, resource_id, predicted_time in parsed:
+                result = {"incident_id": incident_id, "resource_id": resource_id}
+                if incident_id not in known_incidents:
+                    result.update(status="not_found", error=f"Incident with ID {incident_id} not found")
+                elif resource_id not in known_resources:
+                    result.update(status="not_found", error=f"Resource with ID {resource_id} not found")
+                elif incident_id in taken_incidents:
+                    result.update(status="conflict", error=f"Incident {incident_id} already has an allocation")
+                elif resource_id in busy_resources:
+                    result.update(status="conflict", error=f"Resource {resource_id} is already allocated")
+                else:
+                    result["status"] = "created"
+                    # Later items in the same batch can't reuse this incident or resource
+                    taken_incidents.add(incident_id)
+                    busy_resources.add(resource_id)
+                    rows.append((incident_id, resource_id, predicted_time))
+                results[pos] = result
+
+            if rows:
+                conn.executemany(
+                    'INSERT INTO all_allocations (incident_id, resource_id, predicted_response_time) VALUES (?, ?, ?)', rows)
+                conn.executemany(
+                    'INSERT INTO current_allocations (incident_id, resource_id, predicted_response_time) VALUES (?, ?, ?)', rows)
+                conn.executemany(
+                    'UPDATE current_resources SET status = ? WHERE resource_id = ?', [('en_route', r[1]) for r in rows])
+            allocation_ids = dict(_select_in(
+                conn, 'SELECT incident_id, allocation_id FROM current_allocations WHERE incident_id IN ({})',
+                [r[0] for r in rows]))
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+    for result in results:
+        if result.get("status") == "created":
+            result["allocation_id"] = allocation_ids.get(result["incident_id"])
+            allocation_trigger.allocation_made(result["incident_id"])
+    _publish_changes()
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return jsonify({"results": results, "summary": summary}), 200
+
 @app.route('/allocations', methods=['GET'])
 def get_allocations():
-    """Retrieves all allocation records."""
+    """Retrieves all allocation records, or the changes since ?since=<cursor>."""
     try:
-        # Join with incidents and resources for more context (optional)
-        allocations = query_db('''
-            SELECT a.*, i.type as incident_type, r.type as resource_type
-            FROM current_allocations a
-            JOIN current_incidents i ON a.incident_id = i.incident_id
-            JOIN current_resources r ON a.resource_id = r.resource_id
-        ''')
-        # If you only want allocation table data:
-        # allocations = query_db('SELECT * FROM current_allocations')
-        return jsonify([dict(alloc) for alloc in allocations]), 200
+        return _serve_feed(ALLOCATIONS_FEED)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
@@ -303,6 +741,7 @@ def delete_allocation(allocation_id):
             return jsonify({"error": "Allocation not found"}), 404
 
         execute_db('DELETE FROM current_allocations WHERE allocation_id = ?', [allocation_id])
+        _publish_changes()
 
         # Optionally update the previously allocated resource status back to 'available'
         # Be careful: Only do this if the resource isn't immediately re-allocated or occupied
@@ -324,89 +763,69 @@ def show_map():
 
 @app.route('/api/incidents', methods=['GET'])
 def get_incidents_for_map():
-    """Fetches incidents for the map API."""
+    """Fetches incidents for the map API (supports ?since=<cursor>)."""
     try:
-        incidents = query_db('SELECT * FROM current_incidents') # Changed 'incidents' to 'current_incidents'
-        return jsonify([
-            {
-                'incident_id': incident['incident_id'], # Added incident_id
-                'location_latitude': incident['location_latitude'],
-                'location_longitude': incident['location_longitude'],
-                'severity': incident['severity'],
-                'type': incident['type']
-            }
-            for incident in incidents
-        ]), 200
+        return _serve_feed(MAP_INCIDENTS_FEED)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
 @app.route('/api/resources', methods=['GET'])
 def get_resources_for_map():
-    """Fetches a limited number of resources with offset for rotation."""
+    """Fetches available resources for the map (supports ?since=<cursor>)."""
     try:
-        resources = query_db('SELECT * FROM current_resources WHERE status = "available"') # Changed 'resources' to 'current_resources'
-        return jsonify([
-            {
-                'resource_id': r['resource_id'], # Added resource_id
-                'current_latitude': r['current_latitude'],
-                'current_longitude': r['current_longitude'],
-                'type': r['type'],
-                'status': r['status']
-            }
-            for r in resources
-        ]), 200
+        return _serve_feed(MAP_RESOURCES_FEED)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
 
 @app.route('/api/routepair', methods=['GET'])
 def get_route_pair():
-    """Fetches all current allocated incident and resource coordinates for routing on the map."""
+    """Fetches all current allocated incident and resource coordinates for routing on the map (supports ?since=<cursor>)."""
     try:
-        query = """
-            SELECT
-                ca.allocation_id as allocation_id, 
-                i.incident_id as incident_id,
-                i.location_latitude as incident_lat,
-                i.location_longitude as incident_lng,
-                r.resource_id as resource_id,
-                r.current_latitude as resource_lat,
-                r.current_longitude as resource_lng,
-                r.type as resource_type,         
-                r.status as resource_status      
-            FROM current_allocations ca
-            JOIN current_incidents i ON ca.incident_id = i.incident_id
-            JOIN current_resources r ON ca.resource_id = r.resource_id;
-        """
-        route_data_list = query_db(query) 
-
-        if route_data_list:
-            allocations = []
-            for route_data in route_data_list:
-                allocations.append({
-                    "allocation_id": route_data["allocation_id"], 
-                    "incident": {
-                        "lat": route_data["incident_lat"],
-                        "lng": route_data["incident_lng"],
-                        "incident_id": route_data["incident_id"]
-                    },
-                    "resource": {
-                        "lat": route_data["resource_lat"],
-                        "lng": route_data["resource_lng"],
-                        "resource_id": route_data["resource_id"],
-                        "type": route_data["resource_type"],      
-                        "status": route_data["resource_status"]    
-                    }
-                })
-            return jsonify(allocations), 200
-        else:
-            # Return an empty list if no allocations are found.
-            return jsonify([]), 200
+        return _serve_feed(ROUTEPAIR_FEED)
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {e}"}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
 
+@app.route('/api/map_state', methods=['GET'])
+def get_map_state():
+    """Incidents, available resources and route pairs from one consistent snapshot.
+
+    The JSON is built once per change version and shared by every client
+    polling that version; unchanged polls with If-None-Match get a 304.
+    """
+    try:
+        conn = get_db()
+        with storage.transaction(conn, immediate=False):
+            state = SyncState(conn, change_stream.tables)
+            etag = state.etag('map-state', None)
+            if request.if_none_match.contains(etag):
+                return _sync_headers(app.response_class(status=304), state, etag)
+            payload = map_state_cache.get_or_build(state.cursor, lambda: json.dumps({
+                "cursor": state.cursor,
+                "incidents": MAP_INCIDENTS_FEED.read_all(conn),
+                "resources": MAP_RESOURCES_FEED.read_all(conn),
+                "routepairs": ROUTEPAIR_FEED.read_all(conn),
+            }, separators=(',', ':')))
+        return _sync_headers(app.response_class(payload, mimetype='application/json'), state, etag)
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+COMPLETED_ALLOCATION_INSERT = """
+INSERT INTO completed_allocations (
+    allocation_id, incident_id, resource_id, incident_type, resource_type, severity,
+    incident_latitude, incident_longitude, resource_latitude, resource_longitude,
+    resource_status, assignment_epoch, predicted_response_time)
+SELECT ca.allocation_id, ca.incident_id, ca.resource_id, i.type, r.type, i.severity,
+       i.location_latitude, i.location_longitude, r.current_latitude, r.current_longitude,
+       r.status, ca.assignment_epoch, ca.predicted_response_time
+FROM current_allocations ca
+JOIN current_incidents i ON ca.incident_id = i.incident_id
+JOIN current_resources r ON ca.resource_id = r.resource_id
+WHERE ca.allocation_id = ?
+"""
+
 @app.route('/api/allocation/complete/<int:allocation_id>', methods=['POST'])
 def complete_allocation(allocation_id):
     """Marks an allocation as complete and deletes associated incident and resource."""
@@ -419,24 +838,56 @@ def complete_allocation(allocation_id):
         incident_id = allocation_details['incident_id']
         resource_id = allocation_details['resource_id']
 
-        # Delete the allocation
-        execute_db('DELETE FROM current_allocations WHERE allocation_id = ?', [allocation_id])
-        
-        # Delete the incident
-        execute_db('DELETE FROM current_incidents WHERE incident_id = ?', [incident_id,])
-        
-        # Delete the resource
-        execute_db('DELETE FROM current_resources WHERE resource_id = ?', [resource_id,])
+        # The training row and all three deletes commit together or not at all
+        with storage.transaction(get_db()):
+            # Keep what the online learner needs before the rows are gone
+            execute_db(COMPLETED_ALLOCATION_INSERT, [allocation_id])
+
+            # Delete the allocation
+            execute_db('DELETE FROM current_allocations WHERE allocation_id = ?', [allocation_id])
+
+            # Delete the incident
+            execute_db('DELETE FROM current_incidents WHERE incident_id = ?', [incident_id,])
+
+            # Delete the resource
+            execute_db('DELETE FROM current_resources WHERE resource_id = ?', [resource_id,])
+        get_resource_index().remove(resource_id)
+        _publish_changes()
 
         return jsonify({"message": f"Allocation {allocation_id} completed and associated data deleted."}), 200
 
     except sqlite3.Error as e:
-        conn.rollback() # Rollback in case of error
         return jsonify({"error": f"Database error during completion: {e}"}), 500
     except Exception as e:
-        conn.rollback() # Rollback in case of error
         return jsonify({"error": f"An unexpected error occurred during completion: {str(e)}"}), 500
 
+# Page size limit for /api/completed_allocations
+MAX_COMPLETED_PAGE = 5000
+
+@app.route('/api/completed_allocations', methods=['GET'])
+def get_completed_allocations():
+    """Completed allocations in completion order, for the online model learner.
+
+    ?after=<completion_seq> returns only rows completed after that one;
+    ?limit= caps the page (default and max 5000). Returns
+    {"items": [...], "last_seq": completion_seq of the last item, or after}.
+    """
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', MAX_COMPLETED_PAGE))
+    except ValueError:
+        return jsonify({"error": "after and limit must be integers"}), 400
+    if not 1 <= limit <= MAX_COMPLETED_PAGE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_COMPLETED_PAGE}"}), 400
+
+    try:
+        rows = query_db('SELECT * FROM completed_allocations WHERE completion_seq > ? ORDER BY completion_seq LIMIT ?',
+                        [after, limit])
+        items = [dict(row) for row in rows]
+        return jsonify({"items": items, "last_seq": items[-1]['completion_seq'] if items else after}), 200
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
 # --- Main Application Runner ---
 if __name__ == '__main__':
     app.run(debug=True) # debug=True is helpful for development
@@ -444,12 +895,196 @@ if __name__ == '__main__':
 # Global event for graceful shutdown
 shutdown_event = threading.Event()
 
+@app.route('/api/dispatch_latency', methods=['GET'])
+def get_dispatch_latency():
+    """Histogram of time from an incident being reported to it being allocated."""
+    return jsonify(allocation_trigger.latency.snapshot()), 200
+
+@app.route('/api/model_status', methods=['GET'])
+def get_model_status():
+    """Published model version with its training duration and metrics, and the latest training run.
+
+    "serving" is the version the in-process allocator is actually using; it
+    is null when the allocator runs in another process.
+    """
+    status = model_versions.model_status(DATA_DIR)
+    allocator = sys.modules.get('alloting_resources')
+    status["serving"] = allocator.model_status() if allocator else None
+    return jsonify(status), 200
+
+# Feature fields of a /predict row (alloting_resources.FEATURE_COLUMNS)
+PREDICT_TEXT_FIELDS = ('incident_type', 'resource_type')
+PREDICT_NUMBER_FIELDS = ('severity', 'distance', 'traffic_factor', 'resource_status')
+
+# Rows accepted in one /predict request
+MAX_PREDICT_ROWS = 10000
+
+def _predict_rows(rows):
+    """One model call for a micro-batch of /predict rows, with the allocator's served model."""
+    import alloting_resources  # Loaded once; shared with the in-process allocator thread
+    model, pipeline = alloting_resources.serving_model()
+    if model is None:
+        raise LookupError("No trained model has been published yet.")
+    columns = {name: [row[name] for row in rows] for name in PREDICT_TEXT_FIELDS + PREDICT_NUMBER_FIELDS}
+    return alloting_resources.predict_response_times(model, pipeline, columns)
+
+prediction_batcher = PredictionBatcher(_predict_rows)
+
+def _invalid_predict_row(row):
+    if not isinstance(row, dict):
+        return "must be an object"
+    for field in PREDICT_TEXT_FIELDS:
+        if not isinstance(row.get(field), str):
+            return f"{field} must be a string"
+    for field in PREDICT_NUMBER_FIELDS:
+        if isinstance(row.get(field), bool) or not isinstance(row.get(field), (int, float)):
+            return f"{field} must be a number"
+    return None
+
+@app.route('/predict', methods=['POST'])
+def predict_response_time():
+    """Predicted response time (minutes) for one incident-resource pair or many.
+
+    Body: one row, or {"rows": [...]} with up to 10000. A row has
+    incident_type, resource_type, severity, distance (km), traffic_factor
+    and resource_status (1 if available). Returns
+    {"predicted_response_time": ...} or {"predictions": [...]}. Concurrent
+    requests are answered from shared micro-batches.
+    """
+    data = request.get_json(silent=True)
+    bulk = isinstance(data, dict) and 'rows' in data
+    rows = data['rows'] if bulk else [data]
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "rows must be a non-empty list"}), 400
+    if len(rows) > MAX_PREDICT_ROWS:
+        return jsonify({"error": f"At most {MAX_PREDICT_ROWS} rows per request"}), 400
+    errors = [{"index": i, "error": error} for i, error in enumerate(map(_invalid_predict_row, rows)) if error]
+    if errors:
+        return jsonify({"error": "Invalid feature rows", "invalid_rows": errors[:100]}), 400
+
+    try:
+        predictions = prediction_batcher.predict(rows)
+    except (LookupError, TimeoutError) as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+    if bulk:
+        return jsonify({"predictions": predictions}), 200
+    return jsonify({"predicted_response_time": predictions[0]}), 200
+
+@app.route('/predict/metrics', methods=['GET'])
+def get_predict_metrics():
+    """Throughput, micro-batch sizes and latency histograms of /predict."""
+    return jsonify(prediction_batcher.snapshot()), 200
+
 @app.route('/api/kpi_data', methods=['GET'])
 def get_kpi_data():
     """Retrieves KPI data."""
     kpi_data = KPI.get_kpi_data()
     return jsonify(kpi_data), 200
 
+def _parse_list(name, default, parse=str):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return tuple(parse(item) for item in value.split(',') if item)
+
+@app.route('/api/kpi/rollups', methods=['GET'])
+def get_kpi_rollups():
+    """Windowed KPI percentiles from the per-minute rollups.
+
+    Query parameters:
+      window    5m, 1h or 1d ending at `end` (default 1h), or explicit start
+      start/end epoch seconds (end defaults to now)
+      metric    comma list of allocation, predicted (default both)
+      group_by  comma list of type, severity (default none)
+      quantiles comma list in (0, 1) (default 0.5,0.9,0.99)
+    """
+    try:
+        end = int(request.args.get('end', time.time()))
+        if 'start' in request.args:
+            start = int(request.args['start'])
+        else:
+            window = request.args.get('window', '1h')
+            if window not in kpi_rollups.WINDOWS:
+                return jsonify({"error": f"window must be one of {', '.join(kpi_rollups.WINDOWS)}"}), 400
+            start = end - kpi_rollups.WINDOWS[window]
+        metrics = _parse_list('metric', kpi_rollups.METRICS)
+        group_by = _parse_list('group_by', ())
+        quantiles = _parse_list('quantiles', kpi_rollups.DEFAULT_QUANTILES, float)
+    except ValueError:
+        return jsonify({"error": "start, end and quantiles must be numbers"}), 400
+    if start > end:
+        return jsonify({"error": "start must not be after end"}), 400
+    if any(m not in kpi_rollups.METRICS for m in metrics):
+        return jsonify({"error": f"metric must be among {', '.join(kpi_rollups.METRICS)}"}), 400
+    if any(g not in kpi_rollups.GROUP_COLUMNS for g in group_by):
+        return jsonify({"error": f"group_by must be among {', '.join(kpi_rollups.GROUP_COLUMNS)}"}), 400
+    if any(not 0 < q < 1 for q in quantiles):
+        return jsonify({"error": "quantiles must be between 0 and 1"}), 400
+
+    try:
+        conn = get_db()
+        with storage.transaction(conn, immediate=False):
+            results = {m: kpi_rollups.query_kpis(conn, m, start, end, group_by, quantiles) for m in metrics}
+        return jsonify({"start": start, "end": end, "group_by": list(group_by), "metrics": results}), 200
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+# Page size limits for /api/kpi/history
+DEFAULT_HISTORY_PAGE = 100
+MAX_HISTORY_PAGE = 1000
+
+@app.route('/api/kpi/history', methods=['GET'])
+def get_kpi_history():
+    """One keyset page of the allocation history, oldest first.
+
+    Query parameters: limit (default 100, max 1000), after (the previous
+    page's "next" cursor) and the filters incident_type, resource_type,
+    severity, start and end (assignment time, epoch seconds).
+    Returns {"items": [...], "next": cursor or null}.
+    """
+    try:
+        filters = KPI.parse_history_filters(request.args)
+        limit = int(request.args.get('limit', DEFAULT_HISTORY_PAGE))
+        after = request.args.get('after')
+        after = KPI.parse_history_cursor(after) if after else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit, cursor or filter value"}), 400
+    if not 1 <= limit <= MAX_HISTORY_PAGE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_HISTORY_PAGE}"}), 400
+
+    try:
+        items, next_cursor = KPI.get_allocation_history_page(get_db(), filters, after, limit)
+        return jsonify({"items": items, "next": next_cursor}), 200
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Database error: {e}"}), 500
+
+@app.route('/api/kpi/history.ndjson', methods=['GET'])
+def stream_kpi_history():
+    """The filtered allocation history as newline-delimited JSON, one allocation per line.
+
+    Takes the same filters as /api/kpi/history (and optionally after).
+    Rows are read in chunks from one read transaction and written as they
+    are read, so neither side holds the whole history in memory.
+    """
+    try:
+        filters = KPI.parse_history_filters(request.args)
+        after = request.args.get('after')
+        after = KPI.parse_history_cursor(after) if after else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or filter value"}), 400
+
+    def generate():
+        with _read_snapshot() as conn:
+            for detail in KPI.iter_allocation_history(conn, filters, after):
+                yield json.dumps(detail, separators=(',', ':')) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
 import os
 @app.route('/api/shutdown', methods=['POST'])
 def shutdown():
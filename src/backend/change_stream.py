@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+
+from .delta_sync import SyncState
+
+# Events buffered per client. A client that falls further behind (slow
+# network, paused tab) has its queue dropped and is caught up from the
+# database in one delta instead, so it never holds back the others.
+MAX_QUEUED_EVENTS = 64
+
+# Comment line sent on idle connections so proxies keep them open and
+# disconnected clients are noticed
+HEARTBEAT_SECONDS = 15
+
+# How long the producer lets a burst of writes land before reading the changes
+DEFAULT_MAX_WAIT_SECONDS = 0.05
+
+# Reconnect delay suggested to EventSource clients (ms)
+RETRY_MS = 3000
+
+
+def _is_newer(cursor, than):
+    """True unless `cursor` is from the same database generation and not past `than`."""
+    generation, seq = cursor.split('.')
+    than_generation, than_seq = than.split('.')
+    return generation != than_generation or int(seq) > int(than_seq)
+
+
+def format_event(cursor, name, body):
+    """Serializes one Server-Sent Event. The id lets the browser resume via Last-Event-ID."""
+    return f"id: {cursor}\nevent: {name}\ndata: {json.dumps(body, separators=(',', ':'))}\n\n"
+
+
+class _Subscriber:
+    def __init__(self):
+        self.events = []      # (cursor, text) waiting to be written
+        self.overflowed = False
+        self.cursor = None    # last cursor this client has been sent
+        self.wakeup = threading.Event()
+
+
+class ChangeStream:
+    """Fans the map's change feed out to every connected client.
+
+    Write handlers call notify() after they commit. One producer thread then
+    reads the delta since the last published cursor, once for all clients,
+    and hands the pre-serialized events to each subscriber's queue.
+    """
+
+    def __init__(self, feeds, snapshot, max_wait=DEFAULT_MAX_WAIT_SECONDS):
+        self.feeds = feeds          # event name -> delta_sync.Feed
+        self.tables = sorted({table for feed in feeds.values() for table in feed.tables})
+        self._snapshot = snapshot   # () -> context manager yielding a connection in a read transaction
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._cursor = None         # what the last published batch ran up to
+        self._pending = threading.Event()
+        self._thread = None
+
+    def notify(self):
+        """Signals that a write committed. Cheap enough to call from every write handler."""
+        self._pending.set()
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _read_events(self, cursor):
+        """Events that bring a client at `cursor` up to date, plus the new cursor.
+
+        A missing or unusable cursor yields a full snapshot of every feed.
+        """
+        with self._snapshot() as conn:
+            state = SyncState(conn, self.tables)
+            since = state.parse_since(cursor) if cursor else None
+            if since is not None and since == state.version:
+                return [], state.cursor
+            events = []
+            for name, feed in self.feeds.items():
+                if since is None:
+                    body = {"cursor": state.cursor, "reset": True, "upserts": feed.read_all(conn), "deleted": []}
+                else:
+                    upserts, deleted = feed.read_delta(conn, since)
+                    if not upserts and not deleted:
+                        continue
+                    body = {"cursor": state.cursor, "reset": False, "upserts": upserts, "deleted": deleted}
+                events.append((state.cursor, format_event(state.cursor, name, body)))
+            return events, state.cursor
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            time.sleep(self.max_wait)  # Coalesce a burst of writes into one read
+            self._pending.clear()
+            with self._lock:
+                if not self._subscribers:
+                    self._cursor = None  # Re-anchored by the next subscriber
+                    continue
+                cursor = self._cursor
+            try:
+                events, new_cursor = self._read_events(cursor)
+            except sqlite3.Error as e:
+                print(f"Change stream could not read changes: {e}")
+                continue
+            with self._lock:
+                self._cursor = new_cursor
+                for subscriber in self._subscribers:
+                    self._push(subscriber, events)
+
+    @staticmethod
+    def _push(subscriber, events):
+        if not events or subscriber.overflowed:
+            return
+        if len(subscriber.events) + len(events) > MAX_QUEUED_EVENTS:
+            subscriber.events.clear()
+            subscriber.overflowed = True
+        else:
+            subscriber.events.extend(events)
+        subscriber.wakeup.set()
+
+    def _subscribe(self):
+        subscriber = _Subscriber()
+        with self._lock:
+            if self._cursor is None:
+                # Anchor the producer before the client's catch-up read, so
+                # nothing committed in between can fall through the gap
+                with self._snapshot() as conn:
+                    self._cursor = SyncState(conn, self.tables).cursor
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="change-stream", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def stream(self, cursor=None):
+        """Generator of SSE text for one client, resuming after `cursor` if given."""
+        subscriber = self._subscribe()
+        try:
+            events, subscriber.cursor = self._read_events(cursor)
+            yield f"retry: {RETRY_MS}\n\n"
+            for _, text in events:
+                yield text
+
+            while True:
+                woke = subscriber.wakeup.wait(HEARTBEAT_SECONDS)
+                with self._lock:
+                    subscriber.wakeup.clear()
+                    events, subscriber.events = subscriber.events, []
+                    overflowed, subscriber.overflowed = subscriber.overflowed, False
+
+                if overflowed:
+                    events, subscriber.cursor = self._read_events(subscriber.cursor)
+                elif events:
+                    # Skip what the catch-up read already covered
+                    events = [e for e in events if _is_newer(e[0], subscriber.cursor)]
+                    if events:
+                        subscriber.cursor = events[-1][0]
+
+                if not events and not woke:
+                    yield ": keep-alive\n\n"
+                for _, text in events:
+                    yield text
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
@@ -1,5 +1,5 @@
-import sqlite3
 import random
+import sys
 import time
 import requests
 import os
@@ -8,12 +8,13 @@ import threading
 # Get the absolute path to the database
 DATABASE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'database', 'database.db'))
 
+if os.path.dirname(DATABASE) not in sys.path:
+    sys.path.insert(0, os.path.dirname(DATABASE))
+import storage
+
 def get_random_data_from_db():
     """Get random incident and resource data from the database."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    
-    try:
+    with storage.get_pool(DATABASE).connection() as conn:
         # Get random incident data
         incidents = conn.execute('SELECT location_latitude, location_longitude, severity, type FROM incidents').fetchall()
         
@@ -21,8 +22,6 @@ def get_random_data_from_db():
         resources = conn.execute('SELECT type, current_latitude, current_longitude FROM resources').fetchall()
         
         return incidents, resources
-    finally:
-        conn.close()
 
 def generate_resources():
     """Generate random resources in a separate thread."""
@@ -30,23 +29,25 @@ def generate_resources():
         incidents, resources = get_random_data_from_db()
         num_resources = random.randint(1, 3)
         
+        batch = []
         for _ in range(num_resources):
             resource = random.choice(resources)
-            resource_data = {
+            batch.append({
                 'type': resource['type'],
                 'current_latitude': resource['current_latitude'],
                 'current_longitude': resource['current_longitude'],
                 'status': 'available'
-            }
-            
-            try:
-                response = requests.post('http://localhost:5000/resources', json=resource_data)
-                if response.status_code == 201:
-                    print(f"Created resource: {response.json()}")
-                else:
-                    print(f"Failed to create resource: {response.text}")
-            except requests.exceptions.RequestException as e:
-                print(f"Error creating resource: {e}")
+            })
+        
+        try:
+            # One request and one transaction for the whole batch
+            response = requests.post('http://localhost:5000/resources/batch', json={'resources': batch})
+            if response.status_code == 201:
+                print(f"Created resources: {response.json()['resource_ids']}")
+            else:
+                print(f"Failed to create resources: {response.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"Error creating resources: {e}")
         
         time.sleep(15)
 
@@ -56,23 +57,25 @@ def generate_incidents():
         incidents, resources = get_random_data_from_db()
         num_incidents = random.randint(1, 3)
         
+        batch = []
         for _ in range(num_incidents):
             incident = random.choice(incidents)
-            incident_data = {
+            batch.append({
                 'location_latitude': incident['location_latitude'],
                 'location_longitude': incident['location_longitude'],
                 'severity': incident['severity'],
                 'type': incident['type']
-            }
-            
-            try:
-                response = requests.post('http://localhost:5000/incidents', json=incident_data)
-                if response.status_code == 201:
-                    print(f"Created incident: {response.json()}")
-                else:
-                    print(f"Failed to create incident: {response.text}")
-            except requests.exceptions.RequestException as e:
-                print(f"Error creating incident: {e}")
+            })
+        
+        try:
+            # One request and one transaction for the whole batch
+            response = requests.post('http://localhost:5000/incidents/batch', json={'incidents': batch})
+            if response.status_code == 201:
+                print(f"Created incidents: {response.json()['incident_ids']}")
+            else:
+                print(f"Failed to create incidents: {response.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"Error creating incidents: {e}")
         
         time.sleep(15)
 
@@ -0,0 +1,109 @@
+# Windowed KPI queries over the per-minute rollups (migration 5 in create_db.py).
+#
+# Every allocation adds to one minute bucket per metric, keyed by incident
+# type and severity: count/total/min/max plus a histogram over log-spaced
+# bins. Histograms merge by adding counts per bin, so any window and
+# grouping is answered from the buckets alone, never from all_allocations.
+
+# Named windows accepted by /api/kpi/rollups, in seconds
+WINDOWS = {"5m": 300, "1h": 3600, "1d": 86400}
+
+# group_by names -> rollup columns
+GROUP_COLUMNS = {"type": "incident_type", "severity": "severity"}
+
+METRICS = ("allocation", "predicted")
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+BUCKET_SECONDS = 60
+
+
+class QuantileSketch:
+    """Merged bin counts for one group."""
+
+    def __init__(self, bin_values):
+        self.bin_values = bin_values  # bin -> representative value
+        self.counts = {}
+        self.total = 0
+
+    def add(self, bin_index, count):
+        self.counts[bin_index] = self.counts.get(bin_index, 0) + count
+        self.total += count
+
+    def merge(self, other):
+        for bin_index, count in other.counts.items():
+            self.add(bin_index, count)
+
+    def quantile(self, q):
+        """Value at rank q * (n - 1), accurate to the bin width. None when empty."""
+        if not self.total:
+            return None
+        rank = q * (self.total - 1)
+        seen = 0
+        for bin_index in sorted(self.counts):
+            seen += self.counts[bin_index]
+            if seen > rank:
+                return self.bin_values[bin_index]
+        return self.bin_values[max(self.counts)]
+
+
+def bucket_range(start, end):
+    """Minute buckets [first, last) covering start..end, the current partial minute included."""
+    last = end // BUCKET_SECONDS * BUCKET_SECONDS + BUCKET_SECONDS
+    first = start // BUCKET_SECONDS * BUCKET_SECONDS
+    return first, last
+
+
+def query_kpis(conn, metric, start, end, group_by=(), quantiles=DEFAULT_QUANTILES):
+    """Count, mean, min, max and quantiles of `metric` for allocations made between start and end.
+
+    Times are epoch seconds, rounded out to whole minutes. Returns one dict
+    per group (a single dict without group_by), ordered by the group columns.
+    Call it inside a read transaction so the two queries see the same data.
+    """
+    columns = [GROUP_COLUMNS[name] for name in group_by]
+    keys = "".join(f"{column}, " for column in columns)
+    group_clause = f"GROUP BY {', '.join(columns)}" if columns else ""
+    first, last = bucket_range(start, end)
+    params = [metric, first, last]
+
+    summaries = conn.execute(f"""
+        SELECT {keys}SUM(count), SUM(total), MIN(min_value), MAX(max_value)
+        FROM kpi_rollups
+        WHERE metric = ? AND minute_epoch >= ? AND minute_epoch < ?
+        {group_clause}
+        ORDER BY {', '.join(columns) or 1}
+    """, params).fetchall()
+
+    bin_values = dict(conn.execute("SELECT bin, value FROM kpi_sketch_bins").fetchall())
+    sketches = {}
+    for row in conn.execute(f"""
+        SELECT {keys}bin, SUM(count)
+        FROM kpi_sketches
+        WHERE metric = ? AND minute_epoch >= ? AND minute_epoch < ?
+        GROUP BY {keys}bin
+    """, params):
+        key = tuple(row[:len(columns)])
+        sketch = sketches.setdefault(key, QuantileSketch(bin_values))
+        sketch.add(row[-2], row[-1])
+
+    groups = []
+    for row in summaries:
+        key = tuple(row[:len(columns)])
+        count, total, min_value, max_value = row[len(columns):]
+        if not count:
+            continue  # The ungrouped aggregate returns one NULL row for an empty window
+        group = dict(zip(columns, key))
+        group.update({
+            "count": count,
+            "mean": round(total / count, 2),
+            "min": round(min_value, 2),
+            "max": round(max_value, 2),
+        })
+        sketch = sketches.get(key, QuantileSketch(bin_values))
+        for q in quantiles:
+            # Clamp to the exact extremes; the bin estimate can overshoot them
+            value = min(max(sketch.quantile(q), min_value), max_value)
+            group[f"p{q * 100:g}"] = round(value, 2)
+        groups.append(group)
+    return groups
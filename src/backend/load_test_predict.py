@@ -0,0 +1,86 @@
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+
+# Incident types and the unit type that serves each (alloting_resources.VALID_PAIRINGS)
+PAIRINGS = {
+    'fire': 'Fire Truck',
+    'accident': 'Ambulance',
+    'medical': 'Ambulance',
+    'crime': 'Police Car',
+}
+
+
+def random_row(rng):
+    incident_type = rng.choice(list(PAIRINGS))
+    return {
+        'incident_type': incident_type,
+        'resource_type': PAIRINGS[incident_type],
+        'severity': rng.randint(1, 5),
+        'distance': round(rng.uniform(0, 15), 3),
+        'traffic_factor': round(rng.uniform(1, 10), 3),
+        'resource_status': 1,
+    }
+
+
+def run_client(url, rows_per_request, deadline, seed, latencies, errors):
+    """Sends /predict requests back to back until the deadline, recording each latency."""
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        rows = [random_row(rng) for _ in range(rows_per_request)]
+        body = rows[0] if rows_per_request == 1 else {'rows': rows}
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}/predict", json=body)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the micro-batched /predict endpoint.")
+    parser.add_argument('--url', default="http://localhost:5000", help="API base URL.")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32],
+                        help="Concurrent clients; one run per value.")
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=10, help="Duration of each run.")
+    args = parser.parse_args()
+
+    print(f"{'Clients':>7} {'Requests':>9} {'Req/s':>8} {'Rows/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'Avg batch':>10} {'Errors':>7}")
+    print("-" * 76)
+    for clients in args.clients:
+        before = requests.get(f"{args.url}/predict/metrics").json()
+        latencies, errors = [], []
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=run_client,
+                                    args=(args.url, args.rows_per_request, deadline, i, latencies, errors))
+                   for i in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        after = requests.get(f"{args.url}/predict/metrics").json()
+
+        # Server-side batching over just this run
+        batches = after['batches'] - before['batches']
+        average_batch = (after['rows'] - before['rows']) / batches if batches else 0
+        p50, p99 = (np.percentile(latencies, [50, 99]) * 1000) if latencies else (float('nan'),) * 2
+        print(f"{clients:>7} {len(latencies):>9} {len(latencies) / elapsed:>8.1f} "
+              f"{len(latencies) * args.rows_per_request / elapsed:>8.1f} {p50:>9.2f} {p99:>9.2f} "
+              f"{average_batch:>10.1f} {len(errors):>7}")
+        if errors:
+            print(f"  first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from .allocation_trigger import LatencyHistogram
+
+# A batch is sent to the model once it has this many rows...
+DEFAULT_MAX_BATCH_ROWS = 1024
+
+# ...or this long after its first request arrived, whichever comes first
+DEFAULT_MAX_WAIT_SECONDS = 0.002
+
+# Upper bounds (seconds) of the request latency and model call histograms
+PREDICT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# A request waiting longer than this for its batch gives up
+REQUEST_TIMEOUT_SECONDS = 30
+
+
+class _Request:
+    def __init__(self, rows):
+        self.rows = rows
+        self.submitted_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionBatcher:
+    """Coalesces concurrent /predict requests into micro-batches.
+
+    Handler threads call predict() and block. One worker thread waits for
+    the first request, keeps collecting until the batch holds max_batch_rows
+    rows or max_wait seconds have passed, then makes one vectorized model
+    call for all of them and hands each request its slice of the result.
+    """
+
+    def __init__(self, predict_rows, max_batch_rows=DEFAULT_MAX_BATCH_ROWS, max_wait=DEFAULT_MAX_WAIT_SECONDS):
+        self._predict_rows = predict_rows  # list of feature dicts -> sequence of predictions
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self._queue = []
+        self._queued_rows = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._started_at = time.monotonic()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._rows = 0
+        self._batches = 0
+        self._errors = 0
+        self._largest_batch = 0
+        self.request_latency = LatencyHistogram(PREDICT_LATENCY_BUCKETS)
+        self.model_latency = LatencyHistogram(PREDICT_LATENCY_BUCKETS)
+
+    def predict(self, rows):
+        """Predictions for `rows` (a list of feature dicts), computed in a shared batch.
+
+        Raises whatever the model call raised for the batch, or TimeoutError.
+        """
+        request = _Request(rows)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+                self._thread.start()
+            self._queue.append(request)
+            self._queued_rows += len(rows)
+            self._condition.notify_all()
+        if not request.done.wait(REQUEST_TIMEOUT_SECONDS):
+            raise TimeoutError("Prediction timed out waiting for the model.")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            window_end = self._queue[0].submitted_at + self.max_wait
+            while self._queued_rows < self.max_batch_rows:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            # Whole requests only; one larger than max_batch_rows goes alone
+            batch, rows = [], 0
+            while self._queue and (not batch or rows + len(self._queue[0].rows) <= self.max_batch_rows):
+                request = self._queue.pop(0)
+                batch.append(request)
+                rows += len(request.rows)
+            self._queued_rows -= rows
+            return batch, rows
+
+    def _run(self):
+        while True:
+            batch, n_rows = self._next_batch()
+            rows = [row for request in batch for row in request.rows]
+            start = time.monotonic()
+            try:
+                predictions = self._predict_rows(rows)
+                error = None
+            except Exception as e:
+                predictions, error = None, e
+            finished = time.monotonic()
+
+            offset = 0
+            for request in batch:
+                if error is None:
+                    request.result = [float(p) for p in predictions[offset:offset + len(request.rows)]]
+                else:
+                    request.error = error
+                offset += len(request.rows)
+                request.done.set()
+                self.request_latency.observe(finished - request.submitted_at)
+            self.model_latency.observe(finished - start)
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._rows += n_rows
+                self._batches += 1
+                self._errors += len(batch) if error is not None else 0
+                self._largest_batch = max(self._largest_batch, n_rows)
+
+    def snapshot(self):
+        """Throughput, batching and latency figures as a JSON-friendly dict."""
+        uptime = time.monotonic() - self._started_at
+        with self._stats_lock:
+            requests, rows, batches, errors = self._requests, self._rows, self._batches, self._errors
+            largest_batch = self._largest_batch
+        with self._condition:
+            queued = len(self._queue)
+        return {
+            "requests": requests,
+            "rows": rows,
+            "batches": batches,
+            "errors": errors,
+            "queued_requests": queued,
+            "uptime_seconds": round(uptime, 3),
+            "rows_per_second": round(rows / uptime, 3) if uptime else None,
+            "average_batch_rows": round(rows / batches, 3) if batches else None,
+            "largest_batch_rows": largest_batch,
+            "max_batch_rows": self.max_batch_rows,
+            "max_wait_seconds": self.max_wait,
+            "request_latency": self.request_latency.snapshot(),
+            "model_latency": self.model_latency.snapshot(),
+        }
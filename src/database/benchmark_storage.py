@@ -0,0 +1,127 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from create_db import initialize_database
+import storage
+
+INIT_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "init.sql")
+
+# Same statements the API issues for POST /incidents and GET /incidents
+INSERT_CURRENT = 'INSERT INTO current_incidents (location_latitude, location_longitude, severity, type) VALUES (?, ?, ?, ?)'
+INSERT_ALL = 'INSERT INTO all_incidents (incident_id, location_latitude, location_longitude, severity, type) VALUES (?, ?, ?, ?, ?)'
+READ_QUERY = 'SELECT * FROM current_incidents ORDER BY incident_id DESC LIMIT 200'
+
+
+def seed(db_path, rows):
+    initialize_database(db_path, INIT_SQL)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for _ in range(rows):
+            values = random_incident()
+            incident_id = conn.execute(INSERT_CURRENT, values).lastrowid
+            conn.execute(INSERT_ALL, (incident_id, *values))
+    conn.close()
+
+
+def random_incident():
+    return (random.uniform(12.88, 13.03), random.uniform(77.58, 77.68), random.randint(1, 5),
+            random.choice(['crime', 'fire', 'medical', 'accident']))
+
+
+class Baseline:
+    """The old access pattern: a fresh default connection per operation, commit per statement."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def read(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(READ_QUERY).fetchall()
+        finally:
+            conn.close()
+
+    def write(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            values = random_incident()
+            incident_id = conn.execute(INSERT_CURRENT, values).lastrowid
+            conn.commit()
+            conn.execute(INSERT_ALL, (incident_id, *values))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class Tuned:
+    """The storage layer: pooled WAL connections, cached statements, one transaction per write."""
+
+    def __init__(self, db_path):
+        self.pool = storage.ConnectionPool(db_path)
+
+    def read(self):
+        with self.pool.connection() as conn:
+            conn.execute(READ_QUERY).fetchall()
+
+    def write(self):
+        with self.pool.connection() as conn, storage.transaction(conn):
+            values = random_incident()
+            incident_id = conn.execute(INSERT_CURRENT, values).lastrowid
+            conn.execute(INSERT_ALL, (incident_id, *values))
+
+
+def run(backend, readers, writers, duration):
+    """Runs reader and writer threads for duration seconds; returns (reads, writes, errors)."""
+    counts = {"read": 0, "write": 0, "error": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def worker(op):
+        done = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                getattr(backend, op)()
+                done += 1
+            except sqlite3.OperationalError:  # "database is locked"
+                errors += 1
+        with lock:
+            counts[op] += done
+            counts["error"] += errors
+
+    threads = [threading.Thread(target=worker, args=('read',)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write',)) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts["read"], counts["write"], counts["error"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent SQLite reads/writes with and without the storage layer.")
+    parser.add_argument('--readers', type=int, default=8, help="Concurrent reader threads.")
+    parser.add_argument('--writers', type=int, default=2, help="Concurrent writer threads.")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per run.")
+    parser.add_argument('--rows', type=int, default=5000, help="Incidents seeded before each run.")
+    args = parser.parse_args()
+
+    print(f"{'Mode':>9} {'Reads/s':>10} {'Writes/s':>10} {'Lock errors':>12}")
+    print("-" * 44)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, backend_cls in (('baseline', Baseline), ('tuned', Tuned)):
+            db_path = os.path.join(tmp, f"{name}.db")
+            seed(db_path, args.rows)
+            backend = backend_cls(db_path)
+            reads, writes, errors = run(backend, args.readers, args.writers, args.duration)
+            if isinstance(backend, Tuned):
+                backend.pool.close_all()
+            print(f"{name:>9} {reads / args.duration:>10.0f} {writes / args.duration:>10.0f} {errors:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+from create_db import initialize_database
+
+INIT_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "init.sql")
+
+# (description, query, parameters, index names any of which the plan must use)
+HOT_QUERIES = (
+    ("delete_resource: drop the unit's allocations",
+     "DELETE FROM current_allocations WHERE resource_id = ?", [1],
+     ("idx_current_allocations_resource",)),
+    ("create_allocation: incident already allocated?",
+     "SELECT 1 FROM current_allocations WHERE incident_id = ?", [1],
+     ("sqlite_autoindex_current_allocations_1",)),
+    ("allocations/batch: incident in allocation history?",
+     "SELECT incident_id FROM all_allocations WHERE incident_id IN (?, ?, ?)", [1, 2, 3],
+     ("sqlite_autoindex_all_allocations_1",)),
+    ("allocations/batch: units already allocated",
+     "SELECT resource_id FROM current_allocations WHERE resource_id IN (?, ?, ?)", [1, 2, 3],
+     ("idx_current_allocations_resource",)),
+    ("/api/resources: available units",
+     "SELECT * FROM current_resources WHERE status = 'available'", [],
+     ("idx_current_resources_status",)),
+    ("/api/routepair: allocation -> incident/resource join",
+     """SELECT ca.allocation_id, i.location_latitude, r.current_latitude
+        FROM current_allocations ca
+        JOIN current_incidents i ON ca.incident_id = i.incident_id
+        JOIN current_resources r ON ca.resource_id = r.resource_id""", [],
+     ("INTEGER PRIMARY KEY", "sqlite_autoindex_current_allocations_1", "idx_current_allocations_resource")),
+    ("/api/kpi/history: next keyset page",
+     """SELECT ca.allocation_id, ca.assignment_epoch - ci.report_epoch
+        FROM all_allocations ca
+        JOIN all_incidents ci ON ca.incident_id = ci.incident_id
+        JOIN all_resources cr ON ca.resource_id = cr.resource_id
+        WHERE (ca.assignment_epoch, ca.allocation_id) > (?, ?)
+        ORDER BY ca.assignment_epoch, ca.allocation_id
+        LIMIT ?""", [0, 0, 100],
+     ("idx_all_allocations_assignment",)),
+    ("/api/kpi/rollups: minute buckets in the window",
+     """SELECT incident_type, SUM(count), SUM(total) FROM kpi_rollups
+        WHERE metric = ? AND minute_epoch >= ? AND minute_epoch < ? GROUP BY incident_type""",
+     ["allocation", 0, 3600], ("PRIMARY KEY (metric=? AND minute_epoch>? AND minute_epoch<?)",)),
+    ("/api/kpi/rollups: sketch bins in the window",
+     """SELECT incident_type, bin, SUM(count) FROM kpi_sketches
+        WHERE metric = ? AND minute_epoch >= ? AND minute_epoch < ? GROUP BY incident_type, bin""",
+     ["allocation", 0, 3600], ("PRIMARY KEY (metric=? AND minute_epoch>? AND minute_epoch<?)",)),
+    ("/api/completed_allocations: rows after the learner's cursor",
+     "SELECT * FROM completed_allocations WHERE completion_seq > ? ORDER BY completion_seq LIMIT ?", [0, 256],
+     ("INTEGER PRIMARY KEY",)),
+    ("allocation rollup trigger: sketch bin lookup",
+     "SELECT bin FROM kpi_sketch_bins WHERE lower_bound <= ? ORDER BY lower_bound DESC LIMIT 1", [12.5],
+     ("sqlite_autoindex_kpi_sketch_bins_1",)),
+)
+
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def main():
+    """Builds a fresh database and checks that every hot query is served by an index."""
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "plans.db")
+        initialize_database(db_path, INIT_SQL)
+        conn = sqlite3.connect(db_path)
+        # Give the planner realistic statistics rather than empty-table guesses
+        conn.execute("ANALYZE")
+        for description, query, params, expected in HOT_QUERIES:
+            plan = query_plan(conn, query, params)
+            ok = any(name in step for step in plan for name in expected)
+            failures += not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {description}")
+            for step in plan:
+                print(f"       {step}")
+        conn.close()
+
+    if failures:
+        print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} not using an index.")
+        sys.exit(1)
+    print("\nAll hot queries use an index.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,397 @@
 import sqlite3
 import os # Import the os module
 
+# --- Schema migrations ---
+# init.sql builds the version 1 schema. Each later version is applied in
+# order and recorded in PRAGMA user_version, so an existing database only
+# runs the migrations it hasn't seen yet.
+BASELINE_VERSION = 1
+
+# Epoch seconds derived from the TEXT timestamps ('YYYY-MM-DD HH:MM:SS', UTC).
+# Stored generated columns stay in sync with every insert and update, and
+# the existing TEXT columns are kept for the API and the frontend.
+REPORT_EPOCH = "report_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', report_time) AS INTEGER)) STORED"
+ASSIGNMENT_EPOCH = "assignment_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', assignment_time) AS INTEGER)) STORED"
+
+INCIDENT_COLUMNS = f"""
+    incident_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_latitude REAL NOT NULL,
+    location_longitude REAL NOT NULL,
+    severity INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    report_time TEXT DEFAULT CURRENT_TIMESTAMP,
+    {REPORT_EPOCH}"""
+
+RESOURCE_COLUMNS = """
+    resource_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    current_latitude REAL NOT NULL,
+    current_longitude REAL NOT NULL,
+    status TEXT NOT NULL CHECK(status IN ('available', 'en_route', 'occupied'))"""
+
+def _allocation_columns(incidents, resources):
+    return f"""
+    allocation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    incident_id INTEGER NOT NULL,
+    resource_id INTEGER NOT NULL,
+    assignment_time TEXT DEFAULT CURRENT_TIMESTAMP,
+    {ASSIGNMENT_EPOCH},
+    predicted_response_time REAL,
+    FOREIGN KEY (incident_id) REFERENCES {incidents}(incident_id),
+    FOREIGN KEY (resource_id) REFERENCES {resources}(resource_id),
+    UNIQUE (incident_id)"""
+
+# Version 2 table definitions. STRICT makes SQLite reject values of the wrong
+# type (e.g. a non-numeric severity) instead of silently storing them.
+STRICT_TABLES = {
+    "incidents": f"""
+    incident_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_latitude REAL NOT NULL,
+    location_longitude REAL NOT NULL,
+    address TEXT,
+    pincode TEXT,
+    severity INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    report_time TEXT DEFAULT CURRENT_TIMESTAMP,
+    {REPORT_EPOCH}""",
+    "resources": RESOURCE_COLUMNS,
+    "allocations": _allocation_columns("incidents", "resources"),
+    "current_incidents": INCIDENT_COLUMNS,
+    "current_resources": RESOURCE_COLUMNS,
+    "current_allocations": _allocation_columns("current_incidents", "current_resources"),
+    "all_incidents": INCIDENT_COLUMNS,
+    "all_resources": RESOURCE_COLUMNS,
+    # History rows outlive the current_* rows, so they reference the all_* tables
+    "all_allocations": _allocation_columns("all_incidents", "all_resources"),
+}
+
+# Secondary indexes for the hot paths (see check_query_plans.py).
+# all_allocations.incident_id and current_allocations.incident_id are
+# already covered by the automatic index behind UNIQUE (incident_id).
+INDEXES = (
+    # delete_resource, batch allocation busy check
+    "CREATE INDEX IF NOT EXISTS idx_current_allocations_resource ON current_allocations(resource_id)",
+    # /api/resources and the allocator's available-unit filter
+    "CREATE INDEX IF NOT EXISTS idx_current_resources_status ON current_resources(status, type)",
+    # KPI join ordered by assignment time, simulation length
+    "CREATE INDEX IF NOT EXISTS idx_all_allocations_assignment ON all_allocations(assignment_epoch)",
+    "CREATE INDEX IF NOT EXISTS idx_all_incidents_report ON all_incidents(report_epoch)",
+)
+
+def _rebuild_table(cursor, table, columns_sql):
+    """Recreates `table` with a new definition, keeping its rows and AUTOINCREMENT counter."""
+    old_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    seq = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", [table]).fetchone()
+
+    cursor.execute(f"CREATE TABLE {table}_new ({columns_sql}\n) STRICT")
+    column_list = ", ".join(old_columns)
+    cursor.execute(f"INSERT INTO {table}_new ({column_list}) SELECT {column_list} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+    # Deleted rows can leave the counter above MAX(id); don't hand those IDs out again
+    if seq is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", [seq[0], table])
+        if cursor.rowcount == 0:  # Empty table: the copy didn't create a counter row
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", [table, seq[0]])
+
+def _migrate_to_v2(cursor):
+    """STRICT tables, epoch-integer timestamp columns and hot-path indexes."""
+    for table, columns_sql in STRICT_TABLES.items():
+        _rebuild_table(cursor, table, columns_sql)
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+# Tables the API serves as delta feeds, with their primary keys
+SYNC_TABLES = {
+    "current_incidents": "incident_id",
+    "current_resources": "resource_id",
+    "current_allocations": "allocation_id",
+}
+
+# Tombstones older than this many changes are pruned; clients whose cursor
+# falls behind the pruned range get a full resync instead of a delta.
+TOMBSTONE_RETENTION = 10000
+
+def _migrate_to_v3(cursor):
+    """Change sequence and tombstones on the current_* tables for delta sync.
+
+    sync_state holds the global change counter, a random generation that
+    changes whenever the database is rebuilt (so old cursors and ETags stop
+    matching), and each table's tombstone pruning horizon. Triggers stamp
+    every insert and update with the next sequence number and record
+    deletes as tombstones.
+    """
+    cursor.execute("""CREATE TABLE sync_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) STRICT, WITHOUT ROWID""")
+    cursor.execute("""CREATE TABLE sync_tombstones (
+    table_name TEXT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    change_seq INTEGER NOT NULL,
+    PRIMARY KEY (table_name, entity_id)
+) STRICT, WITHOUT ROWID""")
+    cursor.execute("CREATE INDEX idx_sync_tombstones_seq ON sync_tombstones(table_name, change_seq)")
+    cursor.execute("INSERT INTO sync_state (key, value) VALUES ('seq', 1), ('generation', abs(random()))")
+
+    next_seq = "UPDATE sync_state SET value = value + 1 WHERE key = 'seq'"
+    current_seq = "(SELECT value FROM sync_state WHERE key = 'seq')"
+    for table, pk in SYNC_TABLES.items():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+        cursor.execute(f"CREATE INDEX idx_{table}_change_seq ON {table}(change_seq)")
+        cursor.execute("INSERT INTO sync_state (key, value) VALUES (?, 0)", [f"pruned:{table}"])
+        # Rows that predate the migration all belong to change 1
+        cursor.execute(f"UPDATE {table} SET change_seq = 1")
+
+        # Only data columns fire the update trigger, so stamping change_seq doesn't recurse
+        data_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")
+                        if row[1] not in (pk, "change_seq")]
+        cursor.execute(f"""CREATE TRIGGER {table}_sync_insert AFTER INSERT ON {table} BEGIN
+    {next_seq};
+    UPDATE {table} SET change_seq = {current_seq} WHERE {pk} = NEW.{pk};
+    DELETE FROM sync_tombstones WHERE table_name = '{table}' AND entity_id = NEW.{pk};
+END""")
+        cursor.execute(f"""CREATE TRIGGER {table}_sync_update AFTER UPDATE OF {', '.join(data_columns)} ON {table} BEGIN
+    {next_seq};
+    UPDATE {table} SET change_seq = {current_seq} WHERE {pk} = NEW.{pk};
+END""")
+        cursor.execute(f"""CREATE TRIGGER {table}_sync_delete AFTER DELETE ON {table} BEGIN
+    {next_seq};
+    UPDATE sync_state SET value = MAX(value, {current_seq} - {TOMBSTONE_RETENTION}) WHERE key = 'pruned:{table}';
+    DELETE FROM sync_tombstones WHERE table_name = '{table}'
+        AND change_seq <= (SELECT value FROM sync_state WHERE key = 'pruned:{table}');
+    INSERT OR REPLACE INTO sync_tombstones (table_name, entity_id, change_seq) VALUES ('{table}', OLD.{pk}, {current_seq});
+END""")
+
+def _migrate_to_v4(cursor):
+    """Running KPI aggregates maintained by triggers on the history tables.
+
+    kpi_totals holds the allocation count, the allocation latency sum/count
+    and the first/last report time; kpi_type_counts holds allocations per
+    incident and resource type. KPI.py reads these instead of rescanning
+    the whole history on every request.
+    """
+    cursor.execute("""CREATE TABLE kpi_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    allocation_count INTEGER NOT NULL DEFAULT 0,
+    latency_sum INTEGER NOT NULL DEFAULT 0,
+    latency_count INTEGER NOT NULL DEFAULT 0,
+    first_report_epoch INTEGER,
+    last_report_epoch INTEGER
+) STRICT""")
+    cursor.execute("""CREATE TABLE kpi_type_counts (
+    category TEXT NOT NULL CHECK (category IN ('incident', 'resource')),
+    type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (category, type)
+) STRICT, WITHOUT ROWID""")
+
+    # Backfill from existing history. Only allocations whose incident and
+    # resource are both in the history count, like the KPI join did.
+    cursor.execute("""INSERT INTO kpi_totals (id, allocation_count, latency_sum, latency_count, first_report_epoch, last_report_epoch)
+SELECT 1, COUNT(*), COALESCE(SUM(a.assignment_epoch - i.report_epoch), 0), COUNT(a.assignment_epoch - i.report_epoch),
+       (SELECT MIN(report_epoch) FROM all_incidents), (SELECT MAX(report_epoch) FROM all_incidents)
+FROM all_allocations a
+JOIN all_incidents i ON a.incident_id = i.incident_id
+JOIN all_resources r ON a.resource_id = r.resource_id""")
+    for category, table, key in (("incident", "all_incidents", "incident_id"), ("resource", "all_resources", "resource_id")):
+        cursor.execute(f"""INSERT INTO kpi_type_counts (category, type, count)
+SELECT '{category}', t.type, COUNT(*)
+FROM all_allocations a
+JOIN all_incidents i ON a.incident_id = i.incident_id
+JOIN all_resources r ON a.resource_id = r.resource_id
+JOIN {table} t ON a.{key} = t.{key}
+GROUP BY t.type""")
+
+    incident_report = "(SELECT report_epoch FROM all_incidents WHERE incident_id = NEW.incident_id)"
+    cursor.execute(f"""CREATE TRIGGER all_allocations_kpi AFTER INSERT ON all_allocations
+WHEN EXISTS (SELECT 1 FROM all_incidents WHERE incident_id = NEW.incident_id)
+ AND EXISTS (SELECT 1 FROM all_resources WHERE resource_id = NEW.resource_id)
+BEGIN
+    UPDATE kpi_totals SET
+        allocation_count = allocation_count + 1,
+        latency_sum = latency_sum + COALESCE(NEW.assignment_epoch - {incident_report}, 0),
+        latency_count = latency_count + (NEW.assignment_epoch - {incident_report} IS NOT NULL)
+    WHERE id = 1;
+    INSERT INTO kpi_type_counts (category, type, count)
+        SELECT 'incident', type, 1 FROM all_incidents WHERE incident_id = NEW.incident_id
+        ON CONFLICT (category, type) DO UPDATE SET count = count + 1;
+    INSERT INTO kpi_type_counts (category, type, count)
+        SELECT 'resource', type, 1 FROM all_resources WHERE resource_id = NEW.resource_id
+        ON CONFLICT (category, type) DO UPDATE SET count = count + 1;
+END""")
+    cursor.execute("""CREATE TRIGGER all_incidents_kpi AFTER INSERT ON all_incidents
+WHEN NEW.report_epoch IS NOT NULL
+BEGIN
+    UPDATE kpi_totals SET
+        first_report_epoch = MIN(COALESCE(first_report_epoch, NEW.report_epoch), NEW.report_epoch),
+        last_report_epoch = MAX(COALESCE(last_report_epoch, NEW.report_epoch), NEW.report_epoch)
+    WHERE id = 1;
+END""")
+    # Simulation length now comes from kpi_totals, so nothing reads this index any more
+    cursor.execute("DROP INDEX IF EXISTS idx_all_incidents_report")
+
+# Latency sketches: log-spaced bins whose width is a fixed fraction of their
+# value, so any quantile read back from bin counts is within
+# SKETCH_RELATIVE_ACCURACY of the exact one. Values below SKETCH_MIN_VALUE
+# (including zero and clock-skew negatives) share bin 0; values above
+# SKETCH_MAX_VALUE land in the last bin.
+SKETCH_RELATIVE_ACCURACY = 0.02
+SKETCH_MIN_VALUE = 0.01          # seconds
+SKETCH_MAX_VALUE = 7 * 24 * 3600 # seconds
+
+# Metrics rolled up per allocation: value expression over the allocation
+# row ({a}) and its incident (i). Rows where it is NULL are skipped.
+ROLLUP_METRICS = {
+    "allocation": "{a}.assignment_epoch - i.report_epoch",
+    "predicted": "{a}.predicted_response_time",
+}
+
+def _sketch_bins():
+    """(bin, lower_bound, representative value) for every sketch bin."""
+    gamma = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    bins = [(0, 0.0, 0.0)]
+    lower = SKETCH_MIN_VALUE
+    while lower < SKETCH_MAX_VALUE:
+        # Midpoint in relative terms: equally far (in %) from both edges
+        bins.append((len(bins), lower, 2 * lower * gamma / (1 + gamma)))
+        lower *= gamma
+    return bins
+
+def _rollup_inserts(source, alloc):
+    """Statements adding the allocations selected by `source` to the rollups.
+
+    `source` is a FROM ... WHERE clause that binds the allocation as `alloc`
+    and its incident as i; the trigger and the backfill share these.
+    """
+    find_bin = "(SELECT bin FROM kpi_sketch_bins WHERE lower_bound <= metric_value ORDER BY lower_bound DESC LIMIT 1)"
+    statements = []
+    for metric, expression in ROLLUP_METRICS.items():
+        value = expression.format(a=alloc)
+        values = f"""SELECT {alloc}.assignment_epoch / 60 * 60 AS minute_epoch, i.type AS incident_type,
+               i.severity AS severity, {value} AS metric_value
+        {source} AND {alloc}.assignment_epoch IS NOT NULL AND {value} IS NOT NULL"""
+        statements.append(f"""INSERT INTO kpi_rollups (metric, minute_epoch, incident_type, severity, count, total, min_value, max_value)
+    SELECT '{metric}', minute_epoch, incident_type, severity, COUNT(*), SUM(metric_value), MIN(metric_value), MAX(metric_value)
+    FROM ({values})
+    GROUP BY minute_epoch, incident_type, severity
+    ON CONFLICT (metric, minute_epoch, incident_type, severity) DO UPDATE SET
+        count = count + excluded.count,
+        total = total + excluded.total,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value)""")
+        statements.append(f"""INSERT INTO kpi_sketches (metric, minute_epoch, incident_type, severity, bin, count)
+    SELECT '{metric}', minute_epoch, incident_type, severity, COALESCE({find_bin}, 0), COUNT(*)
+    FROM ({values})
+    GROUP BY 2, 3, 4, 5
+    ON CONFLICT (metric, minute_epoch, incident_type, severity, bin) DO UPDATE SET
+        count = count + excluded.count""")
+    return statements
+
+def _migrate_to_v5(cursor):
+    """Per-minute KPI rollups with mergeable latency sketches.
+
+    Each allocation adds to one bucket per metric, keyed by its assignment
+    minute, incident type and severity: kpi_rollups holds count, total,
+    min and max, and kpi_sketches the bucket's histogram over the bins in
+    kpi_sketch_bins. Windowed percentiles are answered by summing these
+    buckets (see backend/kpi_rollups.py) instead of scanning all_allocations.
+    """
+    cursor.execute("""CREATE TABLE kpi_sketch_bins (
+    bin INTEGER PRIMARY KEY,
+    lower_bound REAL NOT NULL UNIQUE,
+    value REAL NOT NULL
+) STRICT""")
+    cursor.executemany("INSERT INTO kpi_sketch_bins (bin, lower_bound, value) VALUES (?, ?, ?)", _sketch_bins())
+    cursor.execute("""CREATE TABLE kpi_rollups (
+    metric TEXT NOT NULL,
+    minute_epoch INTEGER NOT NULL,
+    incident_type TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    PRIMARY KEY (metric, minute_epoch, incident_type, severity)
+) STRICT, WITHOUT ROWID""")
+    cursor.execute("""CREATE TABLE kpi_sketches (
+    metric TEXT NOT NULL,
+    minute_epoch INTEGER NOT NULL,
+    incident_type TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (metric, minute_epoch, incident_type, severity, bin)
+) STRICT, WITHOUT ROWID""")
+
+    for statement in _rollup_inserts("FROM all_allocations a JOIN all_incidents i ON i.incident_id = a.incident_id WHERE 1", "a"):
+        cursor.execute(statement)
+    trigger_body = ";\n    ".join(_rollup_inserts("FROM all_incidents i WHERE i.incident_id = NEW.incident_id", "NEW"))
+    cursor.execute(f"""CREATE TRIGGER all_allocations_rollup AFTER INSERT ON all_allocations BEGIN
+    {trigger_body};
+END""")
+
+def _migrate_to_v6(cursor):
+    """Training rows for allocations completed through /api/allocation/complete.
+
+    complete_allocation copies what the model needs (types, severity, both
+    positions, the assignment time) before it deletes the current_* rows;
+    completed_epoch is stamped on insert. completion_seq orders the rows so
+    the online learner (model/online_model.py) can consume them
+    incrementally.
+    """
+    cursor.execute("""CREATE TABLE completed_allocations (
+    completion_seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    allocation_id INTEGER NOT NULL UNIQUE,
+    incident_id INTEGER NOT NULL,
+    resource_id INTEGER NOT NULL,
+    incident_type TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    incident_latitude REAL NOT NULL,
+    incident_longitude REAL NOT NULL,
+    resource_latitude REAL NOT NULL,
+    resource_longitude REAL NOT NULL,
+    resource_status TEXT NOT NULL,
+    assignment_epoch INTEGER,
+    predicted_response_time REAL,
+    completed_time TEXT DEFAULT CURRENT_TIMESTAMP,
+    completed_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', completed_time) AS INTEGER)) STORED
+) STRICT""")
+
+MIGRATIONS = (
+    (2, _migrate_to_v2),
+    (3, _migrate_to_v3),
+    (4, _migrate_to_v4),
+    (5, _migrate_to_v5),
+    (6, _migrate_to_v6),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate_database(conn):
+    """Applies every migration newer than the database's user_version, each in its own transaction."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    # Table rebuilds drop tables that others reference, so foreign keys must be off
+    conn.execute("PRAGMA foreign_keys = OFF")
+    for target, migration in MIGRATIONS:
+        if version >= target:
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"Migrated database to schema version {target}.")
+        version = target
+    return version
+
 def initialize_database(db_file, init_sql_file):
-    """Connects to an SQLite database and executes the SQL commands from the init file."""
+    """Connects to an SQLite database, executes the SQL commands from the init file and migrates it."""
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
 
@@ -11,7 +400,10 @@ def initialize_database(db_file, init_sql_file):
         with open(init_sql_file, "r") as f:
             sql_script = f.read()
             cursor.executescript(sql_script)
+        # init.sql drops and recreates every table, so the schema is back at the baseline
+        cursor.execute(f"PRAGMA user_version = {BASELINE_VERSION}")
         conn.commit()
+        migrate_database(conn)
         print(f"Database '{db_file}' initialized successfully from '{init_sql_file}'.")
     except FileNotFoundError:
         print(f"Error: The file '{init_sql_file}' was not found.")
@@ -30,4 +422,4 @@ if __name__ == "__main__":
     database_file = os.path.join(script_dir, "database.db")
     # Construct the absolute path to the init.sql file
     initialization_sql_file = os.path.join(script_dir, "init.sql")
-    initialize_database(database_file, initialization_sql_file)
\ No newline at end of file
+    initialize_database(database_file, initialization_sql_file)
@@ -8,6 +8,15 @@ DROP TABLE IF EXISTS current_allocations;
 DROP TABLE IF EXISTS all_incidents;
 DROP TABLE IF EXISTS all_resources;
 DROP TABLE IF EXISTS all_allocations;
+-- Tables added by the migrations in create_db.py
+DROP TABLE IF EXISTS sync_state;
+DROP TABLE IF EXISTS sync_tombstones;
+DROP TABLE IF EXISTS kpi_totals;
+DROP TABLE IF EXISTS kpi_type_counts;
+DROP TABLE IF EXISTS kpi_sketch_bins;
+DROP TABLE IF EXISTS kpi_rollups;
+DROP TABLE IF EXISTS kpi_sketches;
+DROP TABLE IF EXISTS completed_allocations;
 
 -- Create the incidents table
 CREATE TABLE incidents (
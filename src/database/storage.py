@@ -0,0 +1,138 @@
+# storage.py
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db")
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer; synchronous=NORMAL is durable across application crashes under WAL
+# and only risks the last transactions on power loss.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",        # ms to wait on a locked database instead of failing
+    "PRAGMA mmap_size = 268435456",      # 256 MB of the file read through the page cache
+    "PRAGMA cache_size = -65536",        # 64 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+)
+
+# sqlite3 keeps this many compiled statements per connection, so the fixed
+# queries the API repeats are prepared once and reused.
+STATEMENT_CACHE_SIZE = 256
+DEFAULT_POOL_SIZE = 8
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that knows whether it is inside transaction()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transaction_depth = 0
+
+    @property
+    def in_explicit_transaction(self):
+        return self.transaction_depth > 0
+
+
+def connect(db_path=None):
+    """Opens a new tuned connection. Prefer get_pool(...).acquire() for repeated use."""
+    conn = sqlite3.connect(
+        db_path or DATABASE_PATH,
+        factory=PooledConnection,
+        check_same_thread=False,  # Pooled connections move between request threads
+        cached_statements=STATEMENT_CACHE_SIZE,
+        timeout=5.0,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Small LIFO pool of tuned connections to one database file.
+
+    Connections are created on demand up to max_size idle ones; extra
+    connections released while the pool is full are simply closed.
+    """
+
+    def __init__(self, db_path, max_size=DEFAULT_POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=max_size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect(self.db_path)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()  # Never hand out a connection with half a transaction on it
+        conn.transaction_depth = 0
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of a with-block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path=None):
+    """Returns the shared pool for db_path (one per database file per process)."""
+    db_path = os.path.abspath(db_path or DATABASE_PATH)
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+
+@contextmanager
+def transaction(conn, immediate=True):
+    """Groups writes into one transaction: commits on success, rolls back on error.
+
+    BEGIN IMMEDIATE takes the write lock up front so checks made inside the
+    block can't be invalidated by another writer. Nested blocks join the
+    outermost transaction.
+    """
+    if conn.transaction_depth:
+        conn.transaction_depth += 1
+        try:
+            yield conn
+        finally:
+            conn.transaction_depth -= 1
+        return
+
+    if conn.in_transaction:
+        conn.commit()  # Close any implicit transaction the sqlite3 module opened
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    conn.transaction_depth = 1
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.transaction_depth = 0
@@ -1,11 +1,15 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { Cell, Legend, Pie, PieChart, ResponsiveContainer, Tooltip } from 'recharts';
-import { KPIData } from '../types'; 
+import { AllocationDetails, AllocationHistoryPage, KPIData } from '../types'; 
 
 const COLORS = ["#0088FE", "#00C49F", "#FFBB28", "#FF8042", "#8884d8"];
+const HISTORY_API_URL = '/api/kpi/history';
+const HISTORY_PAGE_SIZE = 1000;
 
 const Dashboard: React.FC = () => {
   const [apiData, setApiData] = useState<KPIData | null>(null); 
+  const [allocationDetails, setAllocationDetails] = useState<AllocationDetails[]>([]);
+  const [historyLoaded, setHistoryLoaded] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const hasFetchedData = useRef(false);
 
@@ -26,7 +30,24 @@ const Dashboard: React.FC = () => {
         const data: KPIData = await response.json(); 
         setApiData(data);
 
-        // Call shutdown API after successfully fetching and setting KPI data
+        // Page through the allocation history, rendering each page as it arrives
+        let after: string | null = null;
+        do {
+          const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) });
+          if (after) {
+            params.set('after', after);
+          }
+          const historyResponse = await fetch(`${HISTORY_API_URL}?${params}`);
+          if (!historyResponse.ok) {
+            throw new Error(`HTTP error! status: ${historyResponse.status}`);
+          }
+          const page: AllocationHistoryPage = await historyResponse.json();
+          setAllocationDetails(prev => prev.concat(page.items));
+          after = page.next;
+        } while (after);
+        setHistoryLoaded(true);
+
+        // Call shutdown API after successfully fetching the KPI data and history
         try {
           const shutdownResponse = await fetch('/api/shutdown', { method: 'POST' });
           if (!shutdownResponse.ok) {
@@ -66,8 +87,7 @@ const Dashboard: React.FC = () => {
     average_allocation_time,
     simulation_length,
     incident_distribution,
-    resource_distribution,
-    allocation_details 
+    resource_distribution
   } = apiData;
 
   // Prepare chart data from apiData properties
@@ -184,7 +204,11 @@ const Dashboard: React.FC = () => {
         <div className="card table-card">
           <div className="card-header">
             <h5>Resource Allocation Data</h5>
-            <p className="card-description">Complete list of all resource allocations</p>
+            <p className="card-description">
+              {historyLoaded
+                ? 'Complete list of all resource allocations'
+                : `Loading allocations… ${allocationDetails.length} of ${total_allocations}`}
+            </p>
           </div>
           <div className="card-content">
             <div className="table-container">
@@ -199,7 +223,7 @@ const Dashboard: React.FC = () => {
                   </tr>
                 </thead>
                 <tbody>
-                  {allocation_details.map((row) => (
+                  {allocationDetails.map((row) => (
                     <tr key={row.allocation_id}>
                       <td>{row.allocation_id}</td>
                       <td>{row.resource_type}</td>
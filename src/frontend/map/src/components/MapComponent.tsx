@@ -6,17 +6,28 @@ import IncidentMarkers from './IncidentMarkers';
 import ResourceMarkers from './ResourceMarkers';
 import TrafficLayer from './TrafficLayer';
 import AllocationRouting from './AllocationRouting';
-import { ApiIncident, ApiResource, TrafficRoad, ApiRoutePair, RouteDetails } from '../types';
+import { ApiIncident, ApiResource, TrafficRoad, ApiRoutePair, RouteDetails, DeltaResponse, ApiMapState } from '../types';
 
 // Bangalore coordinates
 const initialCenter: L.LatLngTuple = [12.9716, 77.5946];
 const initialZoom = 13;
 
 // URLs - adjust if not using proxy or if backend is elsewhere
-const INCIDENTS_API_URL = '/api/incidents';
-const RESOURCES_API_URL = '/api/resources'; // Removed limit, timestamp added in fetch
 const TRAFFIC_API_URL = '/data/bangaloretrafficcoord.json'; // Path relative to the public folder
-const ACTIVE_ALLOCATIONS_API_URL = '/api/routepair'; // Changed name for clarity, points to the modified endpoint
+// Incidents, available resources and route pairs from one consistent snapshot
+const MAP_STATE_API_URL = '/api/map_state';
+const STREAM_API_URL = '/api/stream'; // Server-Sent Events: pushes deltas of the same three lists
+
+// Merges a delta into a list; returns the same array when nothing changed
+function applyDelta<T>(current: T[], delta: DeltaResponse<T>, getId: (item: T) => number): T[] {
+  if (delta.reset) return delta.upserts;
+  if (delta.upserts.length === 0 && delta.deleted.length === 0) return current;
+
+  const byId = new Map(current.map(item => [getId(item), item] as [number, T]));
+  delta.deleted.forEach(id => byId.delete(id));
+  delta.upserts.forEach(item => byId.set(getId(item), item));
+  return Array.from(byId.values()).sort((a, b) => getId(a) - getId(b));
+}
 
 const MapComponent: React.FC = () => {
   const [incidents, setIncidents] = useState<ApiIncident[]>([]);
@@ -25,64 +36,99 @@ const MapComponent: React.FC = () => {
   const [activeAllocations, setActiveAllocations] = useState<ApiRoutePair[]>([]);
   const [etas, setEtas] = useState<Record<number, string | null>>({});
   const completedAllocationIds = useRef<Set<number>>(new Set()); // Use useRef for a mutable set
+  const incidentsRef = useRef<ApiIncident[]>([]);
+  const resourcesRef = useRef<ApiResource[]>([]);
+  const allocationsRef = useRef<ApiRoutePair[]>([]);
 
-  const fetchData = useCallback(async () => {
-    try {
-      // Fetch Incidents
-      const incidentsRes = await fetch(`${INCIDENTS_API_URL}?t=${new Date().getTime()}`); // Added cache buster
-      if (!incidentsRes.ok) throw new Error(`Failed to fetch incidents: ${incidentsRes.status}`);
-      const incidentsData: ApiIncident[] = await incidentsRes.json();
-      setIncidents(incidentsData);
-      console.log(`Fetched ${incidentsData.length} incidents.`);
-
-      // Fetch Resources
-      const resourcesRes = await fetch(`${RESOURCES_API_URL}?t=${new Date().getTime()}`); // Added cache buster
-      if (!resourcesRes.ok) throw new Error(`Failed to fetch resources: ${resourcesRes.status}`);
-      const resourcesData: ApiResource[] = await resourcesRes.json();
-      setResources(resourcesData);
-      console.log(`Fetched ${resourcesData.length} resources.`);
-
-      // Fetch Traffic Data (only once or less frequently if it's static)
-      if (trafficData.length === 0) {
-        const trafficRes = await fetch(TRAFFIC_API_URL);
-        if (!trafficRes.ok) throw new Error(`Failed to fetch traffic data: ${trafficRes.status}`);
-        const trafficJsonData: TrafficRoad[] = await trafficRes.json();
-        setTrafficData(trafficJsonData);
-      }
+  const updateAllocations = useCallback((syncedAllocations: ApiRoutePair[]) => {
+    if (syncedAllocations === allocationsRef.current) return; // Nothing changed since the last update
+    allocationsRef.current = syncedAllocations;
+
+    // Filter out allocations that have been locally marked as complete
+    const activeAllocationsData = syncedAllocations.filter(
+      (alloc) => !completedAllocationIds.current.has(alloc.allocation_id)
+    );
 
-      // Fetch Active Allocations
-      const activeAllocationsRes = await fetch(ACTIVE_ALLOCATIONS_API_URL);
-      if (!activeAllocationsRes.ok) throw new Error(`Failed to fetch active allocations: ${activeAllocationsRes.status}`);
-      let activeAllocationsData: ApiRoutePair[] = await activeAllocationsRes.json();
-
-      // Filter out allocations that have been locally marked as complete
-      activeAllocationsData = activeAllocationsData.filter(
-        (alloc) => !completedAllocationIds.current.has(alloc.allocation_id)
-      );
-
-      setActiveAllocations(activeAllocationsData);
-
-      // Clear ETAs for allocations that no longer exist
-      setEtas(prevEtas => {
-        const newEtas: Record<number, string | null> = {};
-        activeAllocationsData.forEach(alloc => {
-          if (prevEtas[alloc.allocation_id]) {
-            newEtas[alloc.allocation_id] = prevEtas[alloc.allocation_id];
-          }
-        });
-        return newEtas;
+    setActiveAllocations(activeAllocationsData);
+
+    // Clear ETAs for allocations that no longer exist
+    setEtas(prevEtas => {
+      const newEtas: Record<number, string | null> = {};
+      activeAllocationsData.forEach(alloc => {
+        if (prevEtas[alloc.allocation_id]) {
+          newEtas[alloc.allocation_id] = prevEtas[alloc.allocation_id];
+        }
       });
+      return newEtas;
+    });
+  }, []);
+
+  const lastMapStateCursor = useRef<string | null>(null);
+
+  const fetchData = useCallback(async () => {
+    try {
+      // One request for all three lists; the backend answers unchanged polls
+      // with 304 (revalidated via ETag) and the browser reuses its cached copy
+      const res = await fetch(MAP_STATE_API_URL, { cache: 'no-cache' });
+      if (!res.ok) throw new Error(`Failed to fetch map state: ${res.status}`);
+      const mapState: ApiMapState = await res.json();
+      if (mapState.cursor === lastMapStateCursor.current) return;
+      lastMapStateCursor.current = mapState.cursor;
+
+      incidentsRef.current = mapState.incidents;
+      setIncidents(mapState.incidents);
+      resourcesRef.current = mapState.resources;
+      setResources(mapState.resources);
+      updateAllocations(mapState.routepairs);
+      console.log(`Fetched ${mapState.incidents.length} incidents and ${mapState.resources.length} resources.`);
 
     } catch (error) {
       console.error("Error fetching map data:", error);
     }
-  }, [trafficData.length]);
+  }, [updateAllocations]);
 
   useEffect(() => {
-    fetchData(); // Initial fetch
-    const interval = setInterval(fetchData, 5000); // Refresh every 5 seconds
-    return () => clearInterval(interval);
-  }, [fetchData]);
+    // Fallback for browsers without EventSource: poll the map snapshot
+    if (typeof EventSource === 'undefined') {
+      fetchData(); // Initial fetch
+      const interval = setInterval(fetchData, 5000); // Refresh every 5 seconds
+      return () => clearInterval(interval);
+    }
+
+    // The stream opens with a full snapshot of each feed and then pushes
+    // deltas as they are written. On reconnect the browser sends the last
+    // event id and the backend resumes from there.
+    const source = new EventSource(STREAM_API_URL);
+    source.addEventListener('incidents', (event) => {
+      const data = applyDelta(incidentsRef.current, JSON.parse((event as MessageEvent).data), (i: ApiIncident) => i.incident_id);
+      if (data === incidentsRef.current) return;
+      incidentsRef.current = data;
+      setIncidents(data);
+    });
+    source.addEventListener('resources', (event) => {
+      const data = applyDelta(resourcesRef.current, JSON.parse((event as MessageEvent).data), (r: ApiResource) => r.resource_id);
+      if (data === resourcesRef.current) return;
+      resourcesRef.current = data;
+      setResources(data);
+    });
+    source.addEventListener('routepair', (event) => {
+      updateAllocations(applyDelta(allocationsRef.current, JSON.parse((event as MessageEvent).data), (a: ApiRoutePair) => a.allocation_id));
+    });
+    source.onerror = () => console.warn('Map change stream interrupted, reconnecting...');
+    return () => source.close();
+  }, [fetchData, updateAllocations]);
+
+  useEffect(() => {
+    // Traffic data is static, so it's fetched once whichever sync path is used
+    if (trafficData.length > 0) return;
+    fetch(TRAFFIC_API_URL)
+      .then(res => {
+        if (!res.ok) throw new Error(`Failed to fetch traffic data: ${res.status}`);
+        return res.json();
+      })
+      .then((trafficJsonData: TrafficRoad[]) => setTrafficData(trafficJsonData))
+      .catch(error => console.error("Error fetching traffic data:", error));
+  }, [trafficData.length]);
 
   const handleRouteFound = useCallback((allocationId: number, details: RouteDetails) => {
     console.log(`Route found for allocation ${allocationId}:`, details);
@@ -47,6 +47,23 @@ export interface ApiRoutePair {
   predicted_eta_seconds?: number; // Estimated time from routing or DB
 }
 
+// Body of a GET with ?since=<cursor>: only what changed after the cursor.
+// reset means the cursor was too old and upserts holds the full list.
+export interface DeltaResponse<T> {
+  cursor: string;
+  reset: boolean;
+  upserts: T[];
+  deleted: number[];
+}
+
+// GET /api/map_state
+export interface ApiMapState {
+  cursor: string;
+  incidents: ApiIncident[];
+  resources: ApiResource[];
+  routepairs: ApiRoutePair[];
+}
+
 export interface RouteDetails {
   coordinates: L.LatLngTuple[];
   totalTimeSeconds: number;
@@ -60,7 +77,6 @@ export interface KPIData {
   average_allocation_time : string;
   simulation_length : string;
   total_allocations : number;
-  allocation_details : AllocationDetails[];
 }
 export interface DistributionDataItem {
   name: string;
@@ -72,8 +88,16 @@ export type ResourceDistribution = DistributionDataItem[];
 
 export interface AllocationDetails {
   allocation_id : number;
+  assignment_epoch : number;
   allocation_time_seconds : string; 
   incident_type : string;
   resource_type : string;
   severity : number;
-}
\ No newline at end of file
+}
+
+// GET /api/kpi/history: one page, oldest first. Pass next as ?after= for the
+// following page; null on the last page.
+export interface AllocationHistoryPage {
+  items : AllocationDetails[];
+  next : string | null;
+}
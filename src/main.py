@@ -9,7 +9,19 @@ SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Define paths to the scripts
 CREATE_DB_SCRIPT = os.path.join(SRC_DIR, "database", "create_db.py")
-MODEL_SCRIPT = os.path.join(SRC_DIR, "model", "alloting_resources.py")
+MODEL_DIR = os.path.join(SRC_DIR, "model")
+MODEL_SCRIPT = os.path.join(MODEL_DIR, "alloting_resources.py")
+
+# "warm" keeps one allocator alive in this process; "subprocess" starts a new interpreter per cycle
+ALLOCATOR_MODE = os.environ.get("ALLOCATOR_MODE", "warm")
+
+# After the first new incident/resource, wait this long for more before running a cycle
+ALLOCATION_MAX_WAIT_SECONDS = float(os.environ.get("ALLOCATION_MAX_WAIT_SECONDS", "0.2"))
+
+# /predict answers concurrent requests from one model call once this many rows
+# are queued or the first has waited this long
+PREDICT_MAX_BATCH_ROWS = int(os.environ.get("PREDICT_MAX_BATCH_ROWS", "1024"))
+PREDICT_MAX_WAIT_SECONDS = float(os.environ.get("PREDICT_MAX_WAIT_SECONDS", "0.002"))
 
 # Define the data directory where CSV files are located
 # DATA_DIR will be c:/Code/ResponSync/data/
@@ -54,13 +66,51 @@ def run_generator():
         print(f"Error running incident generator: {e}")
 
 def run_model():
-    """Runs the resource assignment model in a separate thread."""
+    """Runs the resource assignment model in a separate thread.
+
+    By default the allocator is imported once and called in-process, so the
+    interpreter, pandas/sklearn imports, the loaded model and the traffic
+    lookup all stay warm between cycles, and cycles are triggered by the API
+    as soon as new incidents or resources are reported. Set ALLOCATOR_MODE=subprocess to
+    go back to a fresh interpreter per cycle (e.g. to compare cycle times).
+    """
+    if ALLOCATOR_MODE == "subprocess":
+        run_model_subprocess()
+        return
+
+    if MODEL_DIR not in sys.path:
+        sys.path.insert(0, MODEL_DIR)
+    try:
+        import alloting_resources
+    except Exception as e:
+        print(f"Failed to import resource assignment model: {e}")
+        return
+
+    # New incidents/resources wake the allocator straight away; the interval
+    # is only a fallback sweep for incidents that couldn't be served earlier.
+    from backend.allocation_trigger import allocation_trigger
+    allocation_trigger.max_wait = ALLOCATION_MAX_WAIT_SECONDS
+
+    while True:
+        try:
+            print("\nRunning resource assignment model (warm, in-process)...")
+            alloting_resources.run_allocation_cycle()
+            batch = allocation_trigger.wait_for_batch(alloting_resources.ALLOCATION_INTERVAL_SECONDS)
+            if batch:
+                print(f"Allocator woken by {len(batch)} new incident/resource event(s).")
+        except Exception as e:
+            print(f"Failed to run resource assignment model: {e}")
+            time.sleep(5)  # Wait a bit before retrying on error
+
+def run_model_subprocess():
+    """Runs the resource assignment model as a new Python process every cycle."""
     while True:
         try:
             print("\nRunning resource assignment model...")
             print(f"Model script '{MODEL_SCRIPT}' will be run with CWD set to '{DATA_DIR}'.")
+            start = time.perf_counter()
             execute_script(MODEL_SCRIPT, cwd=DATA_DIR)
-            print(f"Resource assignment model script finished successfully.")
+            print(f"Resource assignment model script finished successfully in {time.perf_counter() - start:.3f} s (including interpreter startup).")
             time.sleep(15)  # Wait for 15 seconds before next run
         except Exception as e:
             print(f"Failed to run resource assignment model: {e}")
@@ -86,7 +136,9 @@ def main():
         if SRC_DIR not in sys.path:
             sys.path.insert(0, SRC_DIR)
 
-        from backend.api import app as flask_app
+        from backend.api import app as flask_app, prediction_batcher
+        prediction_batcher.max_batch_rows = PREDICT_MAX_BATCH_ROWS
+        prediction_batcher.max_wait = PREDICT_MAX_WAIT_SECONDS
 
         print("Flask API imported. Starting server on http://127.0.0.1:5000/ (or http://0.0.0.0:5000/)")
         print("The server will run indefinitely. Press CTRL+C to stop.")
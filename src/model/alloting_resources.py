@@ -1,14 +1,21 @@
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, VotingRegressor
-from sklearn.linear_model import LinearRegression
-# sklearn.model_selection.train_test_split is not directly used in load_and_train_model
 import os
+import subprocess
+import sys
+import threading
 import requests
 import time
 import joblib  # Added for saving/loading model
-import json    # Added for saving metadata
+from distance_matrix import distance_matrix
+from assignment import min_cost_assignment, severity_weights
+from traffic_factors import get_traffic_lookup
+from columnar_cache import get_table
+from online_model import ONLINE_MODEL_FILENAME, get_online_model
+from feature_pipeline import FeaturePipeline
+from compiled_model import HybridPredictor, load_compiled
+from prediction_cache import PredictionCache
+import model_versions
 
 # --- Configuration ---
 
@@ -16,133 +23,261 @@ API_BASE_URL = "http://localhost:5000"
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
 
 # --- Model Persistence Configuration ---
-MODEL_FILENAME = "trained_voting_model.joblib"
-MODEL_METADATA_FILENAME = "model_metadata.json"
-MODEL_SAVE_PATH = os.path.join(DATA_DIR, MODEL_FILENAME)
-METADATA_SAVE_PATH = os.path.join(DATA_DIR, MODEL_METADATA_FILENAME)
+# model_trainer.py writes versioned models under data/models/ and points
+# current.json at the newest validated one
+MODELS_DIR = model_versions.models_dir(DATA_DIR)
+MODEL_TRAINER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_trainer.py')
+ONLINE_MODEL_PATH = os.path.join(DATA_DIR, ONLINE_MODEL_FILENAME)
 
 
-# Global variables to store the trained model, columns, and last data timestamp
+# Training data columns
+FEATURE_COLUMNS = ['incident_type', 'resource_type', 'severity', 'distance', 'traffic_factor', 'resource_status']
+CATEGORICAL_COLUMNS = ['incident_type', 'resource_type']
+TARGET_COLUMN = 'actual_response_time'
+
+# Global variables to store the served model, its feature pipeline, version and the training data it was fitted on
 trained_model = None
-model_columns = None
-_last_loaded_csv_mtime = None # Stores the mtime of the CSV used for the current in-memory 'trained_model'
+feature_pipeline = None
+model_version = None
+model_training_seconds = None
+_last_loaded_data_hash = None # Content hash of the CSV used for the current in-memory 'trained_model'
+_rejected_version = None      # Published version that failed validation here; not retried
+_trainer_process = None
+_model_lock = threading.Lock()  # The allocator and /predict threads both swap versions
+
+# Predictions for pairs seen in earlier cycles, cleared when the model changes
+prediction_cache = PredictionCache()
+
+def _swap_to_published_version():
+    """Switches to the version current.json points at, if it is new and passes validation.
+
+    Returns True if the served model changed. A version that can't be
+    loaded or predicts non-finite values is skipped and the previous model
+    keeps serving.
+    """
+    global trained_model, feature_pipeline, model_version, model_training_seconds, _last_loaded_data_hash, _rejected_version
+
+    version = model_versions.read_current(MODELS_DIR)
+    if version is None or version == model_version or version == _rejected_version:
+        return False
+    try:
+        metadata = model_versions.read_metadata(MODELS_DIR, version)
+        path = model_versions.version_dir(MODELS_DIR, version)
+        # Memory-mapped: large arrays come from the page cache, shared with other processes
+        model = joblib.load(os.path.join(path, model_versions.MODEL_ARTIFACT), mmap_mode='r')
+        compiled_path = os.path.join(path, model_versions.COMPILED_ARTIFACT)
+        if os.path.isdir(compiled_path):
+            # Small batches skip sklearn's per-call overhead
+            model = HybridPredictor(load_compiled(compiled_path), model)
+        pipeline_path = os.path.join(path, model_versions.PIPELINE_ARTIFACT)
+        if os.path.exists(pipeline_path):
+            pipeline = joblib.load(pipeline_path)
+        else:  # Saved before pipelines were; rebuild it from the get_dummies column list
+            pipeline = FeaturePipeline.from_columns(metadata['model_columns'], CATEGORICAL_COLUMNS)
+        if pipeline.columns != metadata['model_columns']:
+            raise ValueError("feature pipeline doesn't match the model's columns")
+        if not np.all(np.isfinite(model.predict(np.zeros((1, pipeline.n_features), dtype=np.float32)))):
+            raise ValueError("non-finite predictions")
+    except Exception as e:
+        print(f"Model version {version} failed validation ({e}). Still serving version {model_version}.")
+        _rejected_version = version
+        return False
+
+    trained_model = model
+    feature_pipeline = pipeline
+    model_version = version
+    model_training_seconds = metadata.get('training_seconds')
+    _last_loaded_data_hash = metadata.get('data_hash')
+    print(f"Now serving model version {version} (trained in {model_training_seconds or 0:.1f} s).")
+    return True
+
+def start_background_training(data_hash):
+    """Starts model_trainer.py in its own process, unless one is running or already handled this data."""
+    global _trainer_process
+    if _trainer_process is not None and _trainer_process.poll() is None:
+        return
+    if model_versions.training_in_progress(MODELS_DIR):
+        return
+    status = model_versions.read_training_status(MODELS_DIR)
+    if status and status.get('data_hash') == data_hash and status.get('state') != 'running':
+        # Published (swapped in on the next check) or rejected/failed; don't retry every cycle.
+        # A rejection from before the first version was always published is retried.
+        if not (status.get('state') == 'rejected' and model_versions.read_current(MODELS_DIR) is None):
+            return
+    print("Training data changed. Training a new model in the background...")
+    _trainer_process = subprocess.Popen([sys.executable, MODEL_TRAINER_SCRIPT, '--data-dir', DATA_DIR])
 
 def load_and_train_model():
     """
-    Loads a pre-trained model if available and the underlying data hasn't changed.
-    Otherwise, trains a new model, saves it, and returns it.
-    """
-    global trained_model, model_columns, _last_loaded_csv_mtime
+    Returns the model to serve this cycle and the feature pipeline it was trained with.
 
+    Training never runs here, so it can't hold up dispatch: when the
+    training data's content differs from the served model's, a background
+    trainer is started and the current model keeps serving until the
+    trainer publishes a new version and it validates here. Returns
+    (None, None) until a first version exists.
+    """
+    model, pipeline = serving_model()
     allocations_csv_path = os.path.join(DATA_DIR, 'final_allocations.csv')
 
     if not os.path.exists(allocations_csv_path):
         print(f"Error: Training data CSV file not found at {allocations_csv_path}")
-        return None, None
+        return model, pipeline
 
-    current_csv_mtime = None
     try:
-        current_csv_mtime = os.path.getmtime(allocations_csv_path)
-    except OSError as e:
-        print(f"Warning: Could not get modification time for {allocations_csv_path}: {e}.")
-        print("Will attempt to train a new model or load if an existing model file is found (without mtime check).")
-
-    # 1. Check in-memory cache (if this function were called multiple times in one process run)
-    if trained_model is not None and model_columns is not None and \
-       _last_loaded_csv_mtime == current_csv_mtime and current_csv_mtime is not None:
-        print("Using in-memory cached model (data unchanged).")
-        return trained_model, model_columns
-
-    # 2. Try to load from disk
-    if os.path.exists(MODEL_SAVE_PATH) and os.path.exists(METADATA_SAVE_PATH):
-        try:
-            with open(METADATA_SAVE_PATH, 'r') as f:
-                metadata = json.load(f)
-            saved_csv_mtime = metadata.get('csv_mtime')
-            saved_model_columns = metadata.get('model_columns')
-
-            # Only load if CSV mtime matches (and mtime is available) or if current_csv_mtime is None (cannot verify)
-            # and saved_model_columns exist.
-            if saved_model_columns and (current_csv_mtime is None or saved_csv_mtime == current_csv_mtime):
-                if current_csv_mtime is not None:
-                    print(f"Loading pre-trained model from {MODEL_SAVE_PATH} (CSV data appears unchanged).")
-                else:
-                    print(f"Loading pre-trained model from {MODEL_SAVE_PATH} (CSV mtime check skipped due to error).")
-                
-                loaded_model = joblib.load(MODEL_SAVE_PATH)
-                print("Model loaded successfully from disk.")
-                
-                # Update globals
-                trained_model = loaded_model
-                model_columns = saved_model_columns
-                _last_loaded_csv_mtime = saved_csv_mtime # Use saved_csv_mtime from metadata
-                return trained_model, model_columns
-            elif current_csv_mtime is not None and saved_csv_mtime != current_csv_mtime:
-                print(f"Training data CSV ({allocations_csv_path}) has changed. Retraining model.")
-            elif not saved_model_columns:
-                print("Metadata is incomplete (missing model columns). Retraining model.")
-            # If we reach here, retraining is needed.
-        except Exception as e:
-            print(f"Error loading model/metadata from disk: {e}. Retraining model.")
-    else:
-        if not os.path.exists(MODEL_SAVE_PATH):
-            print(f"No saved model found at {MODEL_SAVE_PATH}.")
-        if not os.path.exists(METADATA_SAVE_PATH):
-            print(f"No model metadata found at {METADATA_SAVE_PATH}.")
-        print("Proceeding to train a new model.")
+        # A stat call, plus a hash only if the file was touched
+        current_data_hash = get_table(allocations_csv_path, CATEGORICAL_COLUMNS).content_hash
+    except Exception as e:
+        print(f"Error reading training data from {allocations_csv_path}: {e}")
+        return model, pipeline
 
-    # 3. Train a new model
-    try:
-        print(f"Loading training data from {allocations_csv_path} for new training...")
-        training_df = pd.read_csv(allocations_csv_path)
-        print(f"Loaded {len(training_df)} training samples from CSV.")
-
-        training_df = training_df.dropna(subset=['actual_response_time'])
-        print(f"After cleaning NaNs in target 'actual_response_time': {len(training_df)} samples.")
-
-        if training_df.empty:
-            print("No training data available after cleaning. Cannot train model.")
-            return None, None
-
-        print("Training Voting Regressor model...")
-        feature_cols = ['incident_type', 'resource_type', 'severity', 'distance', 'traffic_factor', 'resource_status']
-        X_train = training_df[feature_cols].copy() # Renamed to X_train to avoid confusion
-        X_train = pd.get_dummies(X_train, columns=['incident_type', 'resource_type'], dummy_na=False)
-        y_train = training_df['actual_response_time'] # Renamed to y_train
-
-        rf = RandomForestRegressor(random_state=42)
-        gb = GradientBoostingRegressor(random_state=42)
-        lr = LinearRegression()
-        newly_trained_model = VotingRegressor(estimators=[('rf', rf), ('gb', gb), ('lr', lr)])
-        newly_trained_model.fit(X_train, y_train)
-        print("Model training completed.")
-
-        # Save the newly trained model and metadata
-        joblib.dump(newly_trained_model, MODEL_SAVE_PATH)
-        print(f"Model saved to {MODEL_SAVE_PATH}")
-        
-        current_model_columns = X_train.columns.tolist()
-        metadata_to_save = {
-            'csv_mtime': current_csv_mtime, # This might be None if os.path.getmtime failed
-            'model_columns': current_model_columns
+    if current_data_hash != _last_loaded_data_hash:
+        start_background_training(current_data_hash)
+    return model, pipeline
+
+def serving_model():
+    """The published model and its feature pipeline, as a consistent pair, without checking the training data."""
+    with _model_lock:
+        _swap_to_published_version()
+        return trained_model, feature_pipeline
+
+def predict_response_times(model, pipeline, rows):
+    """Predicted response times (minutes) for feature rows (a DataFrame or dict of columns).
+
+    Shared by the allocation cycle and the API's /predict: applies the
+    latest online correction and goes through the prediction cache.
+    """
+    # Prefer the version online_learner.py has updated from completed allocations
+    model = get_online_model(model, _last_loaded_data_hash, pipeline.columns, ONLINE_MODEL_PATH)
+    return prediction_cache.predict(model, pipeline, rows, (model_version, getattr(model, 'version', None)))
+
+def model_status():
+    """The model this process is serving, for /api/model_status."""
+    return {
+        "version": model_version,
+        "training_seconds": model_training_seconds,
+        "data_hash": _last_loaded_data_hash,
+        "prediction_cache": prediction_cache.stats(),
+    }
+
+VALID_PAIRINGS = {
+    'fire': ['Fire Truck'],
+    'accident': ['Ambulance'],
+    'medical': ['Ambulance'],
+    'crime': ['Police Car']
+}
+
+# How many nearest compatible units to score per incident. Anything further
+# away can't realistically win, so there's no point running predict on it.
+CANDIDATES_PER_INCIDENT = 5
+
+def prepare_incidents(incidents_df, traffic_lookup):
+    """Drops incidents with unusable coordinates or no traffic prediction and attaches traffic_factor."""
+    incident_lat = pd.to_numeric(incidents_df['location_latitude'], errors='coerce')
+    incident_lon = pd.to_numeric(incidents_df['location_longitude'], errors='coerce')
+    incidents_df = incidents_df[incident_lat.notna() & incident_lon.notna()].copy()
+    incidents_df['location_latitude'] = incidents_df['location_latitude'].astype(float)
+    incidents_df['location_longitude'] = incidents_df['location_longitude'].astype(float)
+
+    # Incidents without a traffic prediction are skipped, as before
+    traffic_factors, found = traffic_lookup.lookup(incidents_df['incident_id'].to_numpy())
+    incidents_df['traffic_factor'] = traffic_factors
+    return incidents_df[found]
+
+def prepare_resources(resources_df, allocated_resources):
+    """Drops allocated resources and those with unusable coordinates."""
+    resources_df = resources_df[~resources_df['resource_id'].isin(allocated_resources)]
+    resource_lat = pd.to_numeric(resources_df['current_latitude'], errors='coerce')
+    resource_lon = pd.to_numeric(resources_df['current_longitude'], errors='coerce')
+    resources_df = resources_df[resource_lat.notna() & resource_lon.notna()].copy()
+    resources_df['current_latitude'] = resources_df['current_latitude'].astype(float)
+    resources_df['current_longitude'] = resources_df['current_longitude'].astype(float)
+    return resources_df
+
+def fetch_nearest_candidates(incidents_df, k=CANDIDATES_PER_INCIDENT):
+    """Asks the API's spatial index for the k nearest compatible, unallocated units per incident.
+
+    Returns {incident_id: [(resource_id, distance_km), ...]}, or None if the
+    lookup failed and the caller should fall back to scoring every pair.
+    """
+    queries = [
+        {
+            "incident_id": int(incident_id),
+            "latitude": lat,
+            "longitude": lon,
+            "types": VALID_PAIRINGS.get(str(incident_type).lower(), [])
         }
-        with open(METADATA_SAVE_PATH, 'w') as f:
-            json.dump(metadata_to_save, f)
-        print(f"Metadata saved to {METADATA_SAVE_PATH}")
-
-        # Update globals
-        trained_model = newly_trained_model
-        model_columns = current_model_columns
-        _last_loaded_csv_mtime = current_csv_mtime
-        return trained_model, model_columns
-
-    except FileNotFoundError:
-        print(f"Error: Training data CSV file not found at {allocations_csv_path} during training attempt.")
-        return None, None
-    except Exception as e:
-        print(f"An error occurred during model training or saving: {e}")
-        # Potentially clean up partially saved files if necessary, though omitted for brevity
-        return None, None
+        for incident_id, lat, lon, incident_type in zip(
+            incidents_df['incident_id'], incidents_df['location_latitude'],
+            incidents_df['location_longitude'], incidents_df['type'])
+    ]
+    try:
+        response = requests.post(f"{API_BASE_URL}/resources/nearest", json={"k": k, "queries": queries})
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Nearest-resource lookup failed ({e}). Scoring all incident-resource pairs instead.")
+        return None
+    return {
+        item['incident_id']: [(c['resource_id'], c['distance']) for c in item['candidates']]
+        for item in response.json()
+    }
+
+def build_candidate_pairs(incidents_df, resources_df, candidates=None):
+    """Builds the feature frame for every compatible incident-resource pair to be scored.
+
+    With `candidates` (from fetch_nearest_candidates) only those pairs are
+    kept; otherwise all compatible pairs are scored, with distances from one
+    batched distance-matrix call.
+    """
+    if incidents_df.empty or resources_df.empty:
+        return pd.DataFrame()
+
+    resource_types = resources_df['type'].to_numpy()
+    if candidates is not None:
+        incident_pos = {incident_id: i for i, incident_id in enumerate(incidents_df['incident_id'])}
+        resource_pos = {resource_id: j for j, resource_id in enumerate(resources_df['resource_id'])}
+        inc_idx, res_idx, distances = [], [], []
+        for incident_id, pairs in candidates.items():
+            i = incident_pos.get(incident_id)
+            if i is None:
+                continue
+            for resource_id, distance in pairs:
+                j = resource_pos.get(resource_id)
+                if j is None:  # Created or allocated since resources were fetched
+                    continue
+                inc_idx.append(i)
+                res_idx.append(j)
+                distances.append(distance)
+        inc_idx = np.asarray(inc_idx, dtype=np.intp)
+        res_idx = np.asarray(res_idx, dtype=np.intp)
+        distances = np.asarray(distances, dtype=np.float32)
+    else:
+        # One mask per distinct incident type, then broadcast to every incident of that type
+        incident_types = incidents_df['type'].astype(str).str.lower().to_numpy()
+        type_names, type_codes = np.unique(incident_types, return_inverse=True)
+        type_masks = np.array([np.isin(resource_types, VALID_PAIRINGS.get(t, [])) for t in type_names])
+        compatible = type_masks[type_codes]
+
+        matrix = distance_matrix(
+            incidents_df['location_latitude'], incidents_df['location_longitude'],
+            resources_df['current_latitude'], resources_df['current_longitude']
+        )
+        inc_idx, res_idx = np.nonzero(compatible)
+        distances = matrix[inc_idx, res_idx]
+
+    resource_status = (resources_df.get('status', pd.Series('', index=resources_df.index))
+                       .astype(str).str.lower().eq('available').astype(int).to_numpy())
+
+    return pd.DataFrame({
+        'incident_id': incidents_df['incident_id'].to_numpy()[inc_idx],
+        'resource_id': resources_df['resource_id'].to_numpy()[res_idx],
+        'incident_type': incidents_df['type'].to_numpy()[inc_idx],
+        'resource_type': resource_types[res_idx],
+        'severity': incidents_df['severity'].to_numpy()[inc_idx],
+        'distance': distances,
+        'traffic_factor': incidents_df['traffic_factor'].to_numpy()[inc_idx],
+        'resource_status': resource_status[res_idx]
+    })
 
 def process_allocations():
     """Process current incidents and make allocations."""
@@ -151,18 +286,15 @@ def process_allocations():
     
     # Ensure model_data and the model itself are not None
     if not model_data or model_data[0] is None:
-        print("Failed to load or train the model. Exiting allocation process.")
+        print("No trained model available yet (training runs in the background). Exiting allocation process.")
         return
     
-    current_model, current_training_columns = model_data
+    current_model, pipeline = model_data
 
-    # Ensure current_training_columns is not None before using it
-    if current_training_columns is None:
-        print("Model columns are not available. Exiting allocation process.")
+    if pipeline is None:
+        print("Model feature pipeline is not available. Exiting allocation process.")
         return
 
-    feature_cols = ['incident_type', 'resource_type', 'severity', 'distance', 'traffic_factor', 'resource_status']
-
     print("Fetching current data from API...")
     try:
         incidents_response = requests.get(f"{API_BASE_URL}/incidents")
@@ -207,11 +339,8 @@ def process_allocations():
             print("No unallocated incidents to process.")
             return
 
-        predictions_csv_path = os.path.join(DATA_DIR, 'final_incident_predictions.csv')
-        predictions_df = pd.read_csv(predictions_csv_path)
-        predictions_df.columns = predictions_df.columns.str.strip().str.lower().str.replace(' ', '_')
-        if 's.no.' in predictions_df.columns:
-            predictions_df.drop(columns=['s.no.'], inplace=True)
+        # Parsed once and cached across cycles; only reloaded when the file's content changes
+        traffic_lookup = get_traffic_lookup(os.path.join(DATA_DIR, 'final_incident_predictions.csv'))
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from API: {e}")
@@ -221,105 +350,74 @@ def process_allocations():
         return
 
     print("Preparing current data for predictions...")
-    rows = []
-    for _, incident in incidents_df.iterrows(): # incidents_df is now filtered
-        for _, resource in resources_df.iterrows():
-            try:
-                # Skip if resource is already allocated
-                if resource['resource_id'] in allocated_resources:
-                    continue
-
-                incident_lat = float(incident['location_latitude'])
-                incident_lon = float(incident['location_longitude'])
-                resource_lat = float(resource['current_latitude'])
-                resource_lon = float(resource['current_longitude'])
-
-                distance = geodesic((incident_lat, incident_lon), (resource_lat, resource_lon)).km
-
-                traffic_factor = predictions_df[
-                    predictions_df['incident_id'] == incident['incident_id']
-                ]['predicted_traffic_factor'].iloc[0] if not predictions_df.empty else 50
-
-                rows.append({
-                    'incident_id': incident['incident_id'],
-                    'resource_id': resource['resource_id'],
-                    'incident_type': incident['type'],
-                    'resource_type': resource['type'],
-                    'severity': incident['severity'],
-                    'distance': distance,
-                    'traffic_factor': traffic_factor,
-                    'resource_status': 1 if str(resource.get('status', '')).lower() == 'available' else 0
-                })
-            except (ValueError, TypeError, KeyError, IndexError):
-                continue
-
-    if not rows:
-        print("No valid incident-resource pairs generated.")
-        return
-
-    current_df = pd.DataFrame(rows)
-
-    valid_pairings = {
-        'fire': ['Fire Truck'],
-        'accident': ['Ambulance'],
-        'medical': ['Ambulance'],
-        'crime': ['Police Car']
-    }
-
-    current_df = current_df[current_df.apply(
-        lambda row: row.get('resource_type', '') in valid_pairings.get(str(row.get('incident_type', '')).lower(), []),
-        axis=1
-    )]
+    incidents_df = prepare_incidents(incidents_df, traffic_lookup)
+    resources_df = prepare_resources(resources_df, allocated_resources)
+    candidates = fetch_nearest_candidates(incidents_df) if not incidents_df.empty else None
+    current_df = build_candidate_pairs(incidents_df, resources_df, candidates)
 
     if current_df.empty:
         print("No valid pairings after filtering by type.")
         return
 
     print("Making predictions for current incidents...")
-    X_current = current_df[feature_cols].copy()
-    X_current = pd.get_dummies(X_current, columns=['incident_type', 'resource_type'], dummy_na=False)
-
-    # Align columns with the ones used during training
-    for col in current_training_columns:
-        if col not in X_current.columns:
-            X_current[col] = 0
-    X_current = X_current[current_training_columns] # Ensure order and presence of all training columns
-
-    current_df['predicted_response_time'] = current_model.predict(X_current)
+    hits, misses = prediction_cache.hits, prediction_cache.misses
+    current_df['predicted_response_time'] = predict_response_times(current_model, pipeline, current_df)
+    print(f"Prediction cache: {prediction_cache.hits - hits} hits, {prediction_cache.misses - misses} misses "
+          f"(hit rate {prediction_cache.stats()['hit_rate']:.0%} overall).")
 
     print("Determining best allocations...")
-    best_allocs_indices = current_df.groupby('incident_id')['predicted_response_time'].idxmin()
-    best_allocs = current_df.loc[best_allocs_indices].copy()
+    # Solve the whole cycle at once so no two incidents are given the same unit
+    chosen = min_cost_assignment(
+        current_df['incident_id'].to_numpy(),
+        current_df['resource_id'].to_numpy(),
+        current_df['predicted_response_time'].to_numpy(),
+        weights=severity_weights(pd.to_numeric(current_df['severity'], errors='coerce').to_numpy())
+    )
+    best_allocs = current_df.iloc[chosen].copy()
+    unassigned = current_df['incident_id'].nunique() - len(best_allocs)
+    if unassigned:
+        print(f"{unassigned} incidents left unassigned this cycle (not enough compatible units).")
 
     print("Posting allocations to API...")
-    for _, allocation in best_allocs.iterrows():
-        payload = {
-            "incident_id": int(allocation['incident_id']),
-            "resource_id": int(allocation['resource_id']),
-            "predicted_response_time": float(allocation['predicted_response_time'])
-        }
-        try:
-            # Double-check if incident got allocated by another process/thread in the meantime (optional, defensive)
-            # This is less likely if this script is the sole allocator, but good for robustness
-            # if payload['incident_id'] in allocated_incidents:
-            #     print(f"Incident {payload['incident_id']} was allocated concurrently. Skipping.")
-            #     continue
-
-            post_response = requests.post(f"{API_BASE_URL}/allocations", json=payload)
-            if 200 <= post_response.status_code < 300:
-                print(f"Successfully allocated incident {payload['incident_id']} to resource {payload['resource_id']}")
-                allocated_resources.add(payload['resource_id'])  # Mark resource as allocated for this run
-                allocated_incidents.add(payload['incident_id'])  # Mark incident as allocated for this run
-            elif post_response.status_code == 409: # Should be less frequent now with proactive check
-                print(f"Conflict: Incident {payload['incident_id']} already has an allocation (or resource busy).")
+    payload = {
+        "allocations": [
+            {
+                "incident_id": int(allocation['incident_id']),
+                "resource_id": int(allocation['resource_id']),
+                "predicted_response_time": float(allocation['predicted_response_time'])
+            }
+            for _, allocation in best_allocs.iterrows()
+        ]
+    }
+    try:
+        # One round-trip and one transaction for the whole cycle
+        post_response = requests.post(f"{API_BASE_URL}/allocations/batch", json=payload)
+        post_response.raise_for_status()
+        for result in post_response.json()['results']:
+            if result['status'] == 'created':
+                print(f"Successfully allocated incident {result['incident_id']} to resource {result['resource_id']}")
+                allocated_resources.add(result['resource_id'])  # Mark resource as allocated for this run
+                allocated_incidents.add(result['incident_id'])  # Mark incident as allocated for this run
+            elif result['status'] == 'conflict': # Only possible if another process allocated concurrently
+                print(f"Conflict: {result['error']}")
             else:
-                print(f"Error creating allocation for incident {payload['incident_id']} (HTTP {post_response.status_code}): {post_response.text}")
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed for allocation of incident {payload['incident_id']}: {e}")
+                print(f"Error creating allocation for incident {result.get('incident_id')} ({result['status']}): {result.get('error')}")
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed for batch allocation of {len(payload['allocations'])} incidents: {e}")
 
     print("Resource allocation process finished.")
 
+ALLOCATION_INTERVAL_SECONDS = 15
+
+def run_allocation_cycle():
+    """Runs one allocation cycle and returns its wall time in seconds."""
+    start = time.perf_counter()
+    process_allocations()
+    elapsed = time.perf_counter() - start
+    print(f"Allocation cycle took {elapsed:.3f} s.")
+    return elapsed
+
 if __name__ == "__main__":
     while True:
-        process_allocations()
-        time.sleep(15)
+        run_allocation_cycle()
+        time.sleep(ALLOCATION_INTERVAL_SECONDS)
@@ -0,0 +1,91 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+# Cost multiplier per severity level (1 = least severe, 5 = most severe).
+# A severity-5 incident's minute of delay counts double a severity-1's, and
+# when units are scarce the solver serves the severe incidents first.
+SEVERITY_WEIGHTS = {1: 1.0, 2: 1.25, 3: 1.5, 4: 1.75, 5: 2.0}
+
+
+def severity_weights(severity):
+    """Maps an array of severities to cost multipliers (unknown levels count as 1)."""
+    severity = np.asarray(severity)
+    weights = np.ones(severity.shape, dtype=np.float64)
+    for level, weight in SEVERITY_WEIGHTS.items():
+        weights[severity == level] = weight
+    return weights
+
+
+def min_cost_assignment(incident_ids, resource_ids, costs, weights=None):
+    """Solves one allocation cycle as a sparse bipartite min-cost matching.
+
+    The inputs are aligned edge arrays: edge e says incident_ids[e] could be
+    served by resource_ids[e] at costs[e], optionally scaled by weights[e]
+    (e.g. severity). Every resource is used at most once and every incident
+    gets at most one resource. The solver assigns as many incidents as the
+    candidate graph allows. When units are scarce, an incident with a higher
+    weight is always served in preference to a lower-weighted one, however
+    much cheaper the lower-weighted one would be.
+
+    Returns the positions of the chosen edges, sorted.
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    n_edges = costs.size
+    if n_edges == 0:
+        return np.empty(0, dtype=np.intp)
+    weights = np.ones(n_edges) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    incident_keys, inc_codes = np.unique(np.asarray(incident_ids), return_inverse=True)
+    _, res_codes = np.unique(np.asarray(resource_ids), return_inverse=True)
+    inc_codes = inc_codes.ravel()
+    res_codes = res_codes.ravel()
+    n_inc = incident_keys.size
+    n_res = int(res_codes.max()) + 1
+
+    # Shift so every weight is strictly positive; the solver treats zeros as missing edges
+    weighted = (costs - costs.min() + 1.0) * weights
+
+    # Keep only the cheapest edge for any duplicated (incident, resource) pair
+    order = np.lexsort((weighted, res_codes, inc_codes))
+    pair_keys = inc_codes[order].astype(np.int64) * n_res + res_codes[order]
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = pair_keys[1:] != pair_keys[:-1]
+    edges = order[first]
+
+    # Each incident also gets a private "unassigned" column costing the total
+    # of every real edge times the rank of the incident's weight (1 for the
+    # lowest). Any change to a matching trades at most one incident for
+    # another along an alternating path, so one rank step outweighs every
+    # possible cost saving: the solver assigns as many incidents as it can
+    # and drops the lowest-weighted ones first.
+    incident_weight = np.zeros(n_inc)
+    np.maximum.at(incident_weight, inc_codes, weights)
+    _, weight_rank = np.unique(incident_weight, return_inverse=True)
+    penalty = (weighted[edges].sum() + 1.0) * (weight_rank.ravel() + 1)
+
+    rows = np.concatenate([inc_codes[edges], np.arange(n_inc)])
+    cols = np.concatenate([res_codes[edges], n_res + np.arange(n_inc)])
+    data = np.concatenate([weighted[edges], penalty])
+    graph = csr_matrix((data, (rows, cols)), shape=(n_inc, n_res + n_inc))
+
+    row_ind, col_ind = min_weight_full_bipartite_matching(graph)
+    assigned = col_ind < n_res
+
+    # Deduplicated pair keys are already sorted, so map matches back to edges by binary search
+    chosen_keys = row_ind[assigned].astype(np.int64) * n_res + col_ind[assigned]
+    positions = np.searchsorted(pair_keys[first], chosen_keys)
+    return np.sort(edges[positions])
+
+
+def greedy_assignment(incident_ids, costs):
+    """The previous per-incident argmin: each incident takes its cheapest edge, even if shared.
+
+    Kept as the baseline for benchmark_assignment.py. Returns edge positions.
+    """
+    incident_ids = np.asarray(incident_ids)
+    costs = np.asarray(costs, dtype=np.float64)
+    order = np.lexsort((costs, incident_ids))
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = incident_ids[order][1:] != incident_ids[order][:-1]
+    return np.sort(order[first])
@@ -0,0 +1,77 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from alloting_resources import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+from benchmark_online_update import full_retrain, make_history
+from compiled_model import HybridPredictor, check_compiled, compile_model, load_compiled, save_compiled
+from feature_pipeline import FeaturePipeline
+
+
+def time_predict(predict, X, repeats):
+    """Times predict(X), returning the median of several runs in milliseconds."""
+    predict(X)  # Warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled tree-ensemble predictor against VotingRegressor.predict.")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 10000],
+                        help="Rows per predict call.")
+    parser.add_argument('--training-rows', type=int, default=5000, help="Rows the VotingRegressor is trained on.")
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    train_df, train_y = make_history(rng, args.training_rows)
+    pipeline = FeaturePipeline.fit(train_df, FEATURE_COLUMNS, CATEGORICAL_COLUMNS)
+    print(f"Training VotingRegressor on {args.training_rows} rows...")
+    model = full_retrain(pipeline.transform(train_df), train_y)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        model_path = os.path.join(work_dir, 'model.joblib')
+        compiled_path = os.path.join(work_dir, 'compiled')
+        joblib.dump(model, model_path)
+        start = time.perf_counter()
+        save_compiled(compile_model(model, pipeline.n_features), compiled_path)
+        compile_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model = joblib.load(model_path)
+        joblib_load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        compiled = load_compiled(compiled_path)
+        mmap_load_s = time.perf_counter() - start
+        hybrid = HybridPredictor(compiled, model)
+
+        print(f"{compiled.n_trees} trees, {len(compiled.feature)} nodes. Compiled and saved in {compile_s:.2f} s.")
+        print(f"Load: joblib {joblib_load_s * 1000:.1f} ms, compiled (mmap) {mmap_load_s * 1000:.1f} ms")
+        print()
+        print(f"{'Batch':>7} {'sklearn (ms)':>13} {'Compiled (ms)':>14} {'Speedup':>8} {'Hybrid (ms)':>12} {'Max diff':>10}")
+        print("-" * 69)
+        for n in args.batch_sizes:
+            X = pipeline.transform(make_history(rng, n)[0])
+            sklearn_ms = time_predict(model.predict, X, args.repeats)
+            compiled_ms = time_predict(compiled.predict, X, args.repeats)
+            hybrid_ms = time_predict(hybrid.predict, X, args.repeats)
+            difference = check_compiled(compiled, model, X)
+            print(f"{n:>7} {sklearn_ms:>13.2f} {compiled_ms:>14.2f} {sklearn_ms / compiled_ms:>7.1f}x "
+                  f"{hybrid_ms:>12.2f} {difference:>10.1e}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from distance_matrix import distance_matrix
+
+# Bounding box used by generate_resource_statements.py for Bangalore
+LAT_RANGE = (12.8805, 13.0352)
+LON_RANGE = (77.5805, 77.6890)
+
+# The geodesic loop is far too slow to run to completion at 10k x 10k,
+# so it is timed on a sample of pairs and extrapolated.
+GEODESIC_SAMPLE_PAIRS = 20_000
+
+
+def random_points(rng, n):
+    """Returns n random (lat, lon) points inside the city bounding box."""
+    return rng.uniform(*LAT_RANGE, n), rng.uniform(*LON_RANGE, n)
+
+
+def time_geodesic_loop(inc_lat, inc_lon, res_lat, res_lon):
+    """Times the per-pair geodesic loop, returning seconds for the full I x R grid."""
+    n_inc, n_res = len(inc_lat), len(res_lat)
+    total_pairs = n_inc * n_res
+    sample = min(total_pairs, GEODESIC_SAMPLE_PAIRS)
+
+    start = time.perf_counter()
+    done = 0
+    for i in range(n_inc):
+        for j in range(n_res):
+            geodesic((inc_lat[i], inc_lon[i]), (res_lat[j], res_lon[j])).km
+            done += 1
+            if done >= sample:
+                break
+        if done >= sample:
+            break
+    elapsed = time.perf_counter() - start
+    return elapsed * total_pairs / done, done < total_pairs
+
+
+def time_matrix(inc_lat, inc_lon, res_lat, res_lon, ellipsoidal, repeats):
+    """Times distance_matrix, returning the best of several runs in seconds."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        distance_matrix(inc_lat, inc_lon, res_lat, res_lon, ellipsoidal=ellipsoidal)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def max_error_km(inc_lat, inc_lon, res_lat, res_lon, ellipsoidal, n_check=200):
+    """Largest absolute difference against geodesic on a small sub-grid."""
+    k = min(n_check, len(inc_lat))
+    m = min(n_check, len(res_lat))
+    fast = distance_matrix(inc_lat[:k], inc_lon[:k], res_lat[:m], res_lon[:m], ellipsoidal=ellipsoidal)
+    exact = np.array([[geodesic((inc_lat[i], inc_lon[i]), (res_lat[j], res_lon[j])).km
+                       for j in range(m)] for i in range(k)])
+    return float(np.max(np.abs(fast - exact)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized distance matrix against geopy's geodesic loop.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="Number of incidents and resources (each side of the matrix).")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'Size':>8} {'Geodesic loop (s)':>20} {'Haversine (s)':>15} {'Ellipsoidal (s)':>16} {'Speedup':>10}")
+    print("-" * 75)
+    for n in args.sizes:
+        inc_lat, inc_lon = random_points(rng, n)
+        res_lat, res_lon = random_points(rng, n)
+
+        loop_s, extrapolated = time_geodesic_loop(inc_lat, inc_lon, res_lat, res_lon)
+        sphere_s = time_matrix(inc_lat, inc_lon, res_lat, res_lon, False, args.repeats)
+        ellip_s = time_matrix(inc_lat, inc_lon, res_lat, res_lon, True, args.repeats)
+        marker = '*' if extrapolated else ' '
+        print(f"{n:>8} {loop_s:>19.3f}{marker} {sphere_s:>15.4f} {ellip_s:>16.4f} {loop_s / ellip_s:>9.0f}x")
+
+    print("\n* extrapolated from a sample of", GEODESIC_SAMPLE_PAIRS, "pairs")
+
+    inc_lat, inc_lon = random_points(rng, 200)
+    res_lat, res_lon = random_points(rng, 200)
+    print(f"Max error vs geodesic (haversine):   {max_error_km(inc_lat, inc_lon, res_lat, res_lon, False) * 1000:.1f} m")
+    print(f"Max error vs geodesic (ellipsoidal): {max_error_km(inc_lat, inc_lon, res_lat, res_lon, True) * 1000:.3f} m")
+
+
+if __name__ == "__main__":
+    main()
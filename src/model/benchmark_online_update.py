@@ -0,0 +1,84 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, VotingRegressor
+from sklearn.linear_model import LinearRegression
+
+from alloting_resources import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, VALID_PAIRINGS
+from feature_pipeline import FeaturePipeline
+from online_model import OnlineResponseModel, OnlineState
+from online_learner import MINI_BATCH_SIZE
+
+
+def make_history(rng, n, drift=0.0):
+    """Synthetic completed allocations shaped like final_allocations.csv.
+
+    Response time (minutes) grows with distance and traffic; `drift` adds a
+    constant delay, standing in for conditions the base model never saw.
+    """
+    incident_type = rng.choice(list(VALID_PAIRINGS), n)
+    df = pd.DataFrame({
+        'incident_type': incident_type,
+        'resource_type': [VALID_PAIRINGS[t][0] for t in incident_type],
+        'severity': rng.integers(1, 6, n),
+        'distance': rng.uniform(0, 15, n),
+        'traffic_factor': rng.uniform(1, 10, n),
+        'resource_status': 1,
+    })
+    y = df['distance'] * 2 + df['traffic_factor'] + rng.normal(0, 1, n) + drift
+    return df, y.to_numpy()
+
+
+def full_retrain(X, y):
+    model = VotingRegressor(estimators=[
+        ('rf', RandomForestRegressor(random_state=42)),
+        ('gb', GradientBoostingRegressor(random_state=42)),
+        ('lr', LinearRegression()),
+    ])
+    return model.fit(X, y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark an online update from completed allocations against a full retrain.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="Rows of allocation history at each measurement.")
+    parser.add_argument('--base-rows', type=int, default=1000, help="Rows the base model is trained on.")
+    parser.add_argument('--drift', type=float, default=3.0, help="Delay (minutes) in live data the base model never saw.")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base_df, base_y = make_history(rng, args.base_rows)
+    pipeline = FeaturePipeline.fit(base_df, FEATURE_COLUMNS, CATEGORICAL_COLUMNS)
+    base_model = full_retrain(pipeline.transform(base_df), base_y)
+    holdout_df, holdout_y = make_history(rng, 2000, args.drift)
+    X_holdout = pipeline.transform(holdout_df)
+
+    print(f"{'History':>8} {'Full retrain (s)':>17} {'Online update (s)':>18} {'Speedup':>8} {'MAE base':>9} {'MAE online':>11}")
+    print("-" * 76)
+    for n in args.sizes:
+        live_df, live_y = make_history(rng, n, args.drift)
+        X_live = pipeline.transform(live_df)
+
+        start = time.perf_counter()
+        full_retrain(X_live, live_y)
+        full_s = time.perf_counter() - start
+
+        # Learn the whole history in mini-batches, but time only the newest one:
+        # that is what each update costs once the learner has caught up
+        state = OnlineState('benchmark', pipeline.columns)
+        for lo in range(0, n - MINI_BATCH_SIZE, MINI_BATCH_SIZE):
+            state.partial_fit(base_model, X_live[lo:lo + MINI_BATCH_SIZE], live_y[lo:lo + MINI_BATCH_SIZE], lo)
+        start = time.perf_counter()
+        state.partial_fit(base_model, X_live[-MINI_BATCH_SIZE:], live_y[-MINI_BATCH_SIZE:], n)
+        online_s = time.perf_counter() - start
+
+        mae_base = np.abs(base_model.predict(X_holdout) - holdout_y).mean()
+        mae_online = np.abs(OnlineResponseModel(base_model, state).predict(X_holdout) - holdout_y).mean()
+        print(f"{n:>8} {full_s:>17.3f} {online_s:>18.4f} {full_s / online_s:>7.0f}x {mae_base:>9.2f} {mae_online:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from alloting_resources import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+from benchmark_online_update import make_history
+from feature_pipeline import FeaturePipeline
+from model_trainer import fit_voting_model
+
+# Training setups compared; options are build_voting_model arguments
+CONFIGS = {
+    'sequential': {'n_jobs': 1},  # The original: one core, one member at a time
+    'parallel': {'n_jobs': -1},
+    'hist': {'n_jobs': -1, 'booster': 'hist', 'early_stopping': True},
+    'hist-subsample': {'n_jobs': -1, 'booster': 'hist', 'early_stopping': True, 'subsample': 0.1, 'min_samples_leaf': 5},
+}
+
+VALIDATION_ROWS = 20_000
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KiB on Linux
+
+
+def run_worker(config, n_rows, seed):
+    """Fits one configuration on n_rows synthetic allocations; prints the result as JSON."""
+    rng = np.random.default_rng(seed)
+    train_df, train_y = make_history(rng, n_rows)
+    validation_df, validation_y = make_history(rng, VALIDATION_ROWS)
+    pipeline = FeaturePipeline.fit(train_df, FEATURE_COLUMNS, CATEGORICAL_COLUMNS)
+    X, X_validation = pipeline.transform(train_df), pipeline.transform(validation_df)
+    del train_df
+    data_mb = peak_rss_mb()
+
+    start = time.perf_counter()
+    model = fit_voting_model(X, train_y, **CONFIGS[config])
+    fit_s = time.perf_counter() - start
+    mae = float(np.abs(model.predict(X_validation) - validation_y).mean())
+    print(json.dumps({'fit_seconds': fit_s, 'data_mb': data_mb, 'peak_mb': peak_rss_mb(), 'mae': mae}))
+
+
+def full_forest(options):
+    """Whether the configuration grows unrestricted forest trees on every row (memory grows with the data)."""
+    return options.get('subsample', 1.0) == 1.0 and options.get('min_samples_leaf', 1) == 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark training configurations on synthetic final_allocations.csv data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 5_000_000],
+                        help="Training rows per run.")
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--max-full-forest-rows', type=int, default=200_000,
+                        help="Skip configurations with unrestricted forests above this many rows.")
+    parser.add_argument('--timeout', type=float, default=3600, help="Seconds allowed per run.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--worker', nargs=2, metavar=('CONFIG', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], int(args.worker[1]), args.seed)
+        return
+
+    print(f"{os.cpu_count()} cores. Validation on {VALIDATION_ROWS} held-out rows; each run in a fresh process.")
+    print(f"{'Rows':>9} {'Config':>15} {'Fit (s)':>9} {'Data (MB)':>10} {'Peak (MB)':>10} {'MAE':>7}")
+    print("-" * 66)
+    for n_rows in args.sizes:
+        for config in args.configs:
+            if full_forest(CONFIGS[config]) and n_rows > args.max_full_forest_rows:
+                print(f"{n_rows:>9} {config:>15}   skipped (unrestricted forest)")
+                continue
+            try:
+                completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--seed', str(args.seed),
+                                            '--worker', config, str(n_rows)],
+                                           capture_output=True, text=True, timeout=args.timeout)
+            except subprocess.TimeoutExpired:
+                print(f"{n_rows:>9} {config:>15}   timed out after {args.timeout:.0f} s")
+                continue
+            if completed.returncode < 0:
+                print(f"{n_rows:>9} {config:>15}   killed by signal {-completed.returncode} (out of memory?)")
+                continue
+            if completed.returncode != 0:
+                error = (completed.stderr.strip().splitlines() or ['no output'])[-1]
+                print(f"{n_rows:>9} {config:>15}   failed: {error}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{n_rows:>9} {config:>15} {result['fit_seconds']:>9.2f} {result['data_mb']:>10.0f} "
+                  f"{result['peak_mb']:>10.0f} {result['mae']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
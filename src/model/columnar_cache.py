@@ -0,0 +1,195 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Cached tables live next to their CSV in this directory, one subdirectory
+# per CSV content hash: a manifest plus one .npy file per column.
+CACHE_DIRNAME = '.columnar'
+MANIFEST_FILENAME = 'manifest.json'
+
+# Read size when hashing a CSV that isn't parsed
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_content_hash(path):
+    """sha1 of a file's bytes, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    """Writes JSON via a temporary file and rename, so readers never see half a file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _build_entry(frame, entry_dir, content_hash, categorical):
+    """Writes `frame` as one .npy per column plus a manifest into entry_dir."""
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = {}
+    for position, name in enumerate(frame.columns):
+        series = frame[name]
+        filename = f"{position}.npy"
+        # Strings can't be memory-mapped, so they're stored as integer codes
+        if name in categorical or not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)):
+            values = series.astype('category')
+            codes = values.cat.codes.to_numpy()
+            np.save(os.path.join(tmp_dir, filename), codes, allow_pickle=False)
+            columns[name] = {'file': filename, 'kind': 'categorical', 'dtype': str(codes.dtype),
+                             'categories': values.cat.categories.tolist()}
+        else:
+            values = np.ascontiguousarray(series.to_numpy())
+            np.save(os.path.join(tmp_dir, filename), values, allow_pickle=False)
+            columns[name] = {'file': filename, 'kind': 'numeric', 'dtype': str(values.dtype)}
+
+    manifest = {'content_hash': content_hash, 'rows': len(frame), 'columns': columns}
+    _write_json(os.path.join(tmp_dir, MANIFEST_FILENAME), manifest)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another process built the same content first; theirs is identical
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class ColumnarTable:
+    """Typed, lazily loaded columns of a CSV, cached on disk by content hash.
+
+    The first load of a given CSV content parses it once and writes each
+    column as a .npy file (strings as categorical codes). Every later load,
+    in this or any other process, memory-maps only the columns it asks for.
+    Staleness is decided by the content hash, not the mtime: a stat check
+    skips hashing when the file is untouched, and a touched but identical
+    file reuses the existing cache.
+    """
+
+    def __init__(self, csv_path, categorical=()):
+        self.csv_path = os.path.abspath(csv_path)
+        self.categorical = frozenset(categorical)
+        self.cache_dir = os.path.join(os.path.dirname(self.csv_path), CACHE_DIRNAME)
+        self._basename = os.path.basename(self.csv_path)
+        self._index_path = os.path.join(self.cache_dir, f"{self._basename}.index.json")
+        self._lock = threading.Lock()
+        self._stat_signature = None
+        self._content_hash = None
+        self._entry_dir = None
+        self._manifest = None
+        self._columns = {}
+
+    @property
+    def content_hash(self):
+        return self._content_hash
+
+    @property
+    def columns(self):
+        return list(self._manifest['columns']) if self._manifest else []
+
+    @property
+    def num_rows(self):
+        return self._manifest['rows'] if self._manifest else 0
+
+    def _entry_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{self._basename}-{content_hash[:16]}")
+
+    def _read_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self, keep):
+        """Removes cache entries for older contents of this CSV."""
+        prefix = f"{self._basename}-"
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and path != keep and os.path.isdir(path):
+                # Still mapped by another process on Windows? Leave it for next time.
+                shutil.rmtree(path, ignore_errors=True)
+
+    def refresh(self):
+        """Points the table at the CSV's current content. Returns True if that changed."""
+        stat = os.stat(self.csv_path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            # Cheap path: nothing touched the file since the last check
+            if signature == self._stat_signature:
+                return False
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            index = self._read_index()
+            content_hash = None
+            if index and index.get('signature') == signature:
+                content_hash = index['content_hash']  # Same file another process already hashed
+            elif index:
+                content_hash = file_content_hash(self.csv_path)
+
+            entry_dir = self._entry_path(content_hash) if content_hash else None
+            if entry_dir is None or not os.path.exists(os.path.join(entry_dir, MANIFEST_FILENAME)):
+                # Hash and parse the same bytes, so the cache can't mix two versions of the file
+                with open(self.csv_path, 'rb') as f:
+                    raw = f.read()
+                content_hash = hashlib.sha1(raw).hexdigest()
+                entry_dir = self._entry_path(content_hash)
+                if not os.path.exists(os.path.join(entry_dir, MANIFEST_FILENAME)):
+                    print(f"Building columnar cache for {self._basename}...")
+                    _build_entry(pd.read_csv(io.BytesIO(raw)), entry_dir, content_hash, self.categorical)
+                self._prune(keep=entry_dir)
+
+            _write_json(self._index_path, {'signature': signature, 'content_hash': content_hash})
+            self._stat_signature = signature
+            if content_hash == self._content_hash:
+                return False
+            with open(os.path.join(entry_dir, MANIFEST_FILENAME)) as f:
+                self._manifest = json.load(f)
+            self._entry_dir = entry_dir
+            self._content_hash = content_hash
+            self._columns = {}
+            return True
+
+    def column(self, name):
+        """One column: a read-only memory-mapped array, or a pandas Categorical for strings."""
+        with self._lock:
+            values = self._columns.get(name)
+            if values is None:
+                spec = self._manifest['columns'][name]
+                values = np.load(os.path.join(self._entry_dir, spec['file']), mmap_mode='r', allow_pickle=False)
+                if spec['kind'] == 'categorical':
+                    values = pd.Categorical.from_codes(values, categories=spec['categories'])
+                self._columns[name] = values
+            return values
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def to_frame(self, columns=None):
+        """DataFrame of the given columns (all by default), strings as category dtype."""
+        names = self.columns if columns is None else list(columns)
+        return pd.DataFrame({name: self.column(name) for name in names})
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+def get_table(csv_path, categorical=()):
+    """Returns the shared, refreshed columnar table for csv_path (one per file per process)."""
+    csv_path = os.path.abspath(csv_path)
+    with _tables_lock:
+        table = _tables.get(csv_path)
+        if table is None:
+            table = _tables[csv_path] = ColumnarTable(csv_path, categorical)
+    table.refresh()
+    return table
@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+
+import numpy as np
+from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor,
+                              RandomForestRegressor, VotingRegressor)
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+# A compiled model is a directory of arrays (one .npy each) plus manifest.json
+MANIFEST_FILENAME = 'manifest.json'
+NODE_ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots', 'coef', 'missing_right')
+
+# Largest difference from sklearn's predictions (minutes) accepted when compiling.
+# The trees match to rounding error; LinearRegression fitted on float32 features
+# predicts in float32, while the folded linear term is evaluated in float64.
+MAX_PREDICTION_DIFFERENCE = 1e-4
+
+# Above this many rows sklearn's C tree traversal beats the per-level NumPy
+# passes (crossover measured with benchmark_compiled_model.py), so
+# HybridPredictor hands larger batches to the original model
+COMPILED_MAX_ROWS = 300
+
+
+class CompiledEnsemble:
+    """A fitted tree ensemble plus linear term, flattened into contiguous node arrays.
+
+    Every tree of every member is laid end to end. Internal node i splits on
+    feature[i] at threshold[i] and continues at children[2*i] (<=) or
+    children[2*i + 1] (>); a missing (NaN) feature takes the direction sklearn
+    learned for the node, children[2*i + missing_right[i]]. A child or root
+    that is a leaf is stored as ~leaf (negative), and value[leaf] is its output already scaled by its tree's
+    share of the vote. A prediction is the sum of one leaf per tree, plus
+    X @ coef and intercept for the linear members and constant offsets such
+    as gradient boosting's initial estimate.
+
+    predict() walks all (tree, row) pairs down one level at a time as
+    whole-array operations, dropping pairs once they reach a leaf, instead
+    of calling each member's predict and averaging in Python.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, coef, intercept, missing_right=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.coef = coef
+        self.intercept = float(intercept)
+        self.missing_right = missing_right  # None for models compiled before NaN routing was stored
+
+    @property
+    def n_features(self):
+        return len(self.coef)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a matrix with {self.n_features} columns, got shape {X.shape}")
+        n_rows = len(X)
+        # Trees compare float32 features against float64 thresholds, as sklearn does
+        X_flat = np.ascontiguousarray(X, dtype=np.float32).astype(np.float64).ravel()
+        has_missing = bool(np.isnan(X_flat).any())
+        if has_missing and self.missing_right is None:
+            raise ValueError("This compiled model predates missing-value support; recompile it to predict NaN inputs")
+
+        # Tree-major order, so neighbouring pairs read the same tree's nodes
+        node = np.repeat(self.roots, n_rows)
+        pending = np.flatnonzero(node >= 0)
+        current = node[pending]
+        row_offsets = np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)[pending]
+        while len(current):
+            values = X_flat[row_offsets + self.feature[current]]
+            go_right = values > self.threshold[current]
+            if has_missing:
+                missing = np.isnan(values)
+                go_right[missing] = self.missing_right[current[missing]]
+            current = self.children[2 * current + go_right]
+            at_leaf = current < 0
+            if at_leaf.any():
+                node[pending[at_leaf]] = current[at_leaf]
+                descending = ~at_leaf
+                current, pending, row_offsets = current[descending], pending[descending], row_offsets[descending]
+
+        prediction = self.value[~node].reshape(self.n_trees, n_rows).sum(axis=0) + self.intercept
+        if self.coef.any():  # Skipped for tree-only models, where NaN * 0 would still give NaN
+            prediction += X_flat.reshape(n_rows, self.n_features) @ self.coef
+        return prediction
+
+
+class _Builder:
+    """Collects trees and linear terms, each scaled by its share of the final prediction."""
+
+    def __init__(self, n_features):
+        self.n_features = n_features
+        self.trees = []
+        self.coef = np.zeros(n_features, dtype=np.float64)
+        self.intercept = 0.0
+
+    def add(self, estimator, scale):
+        if isinstance(estimator, VotingRegressor):
+            weights = estimator.weights if estimator.weights is not None else [1.0] * len(estimator.estimators)
+            weights = np.array([w for (_, member), w in zip(estimator.estimators, weights) if member != 'drop'],
+                               dtype=np.float64)
+            for member, weight in zip(estimator.estimators_, weights):
+                self.add(member, scale * weight / weights.sum())
+        elif isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+            for tree in estimator.estimators_:
+                self.add(tree, scale / len(estimator.estimators_))
+        elif isinstance(estimator, GradientBoostingRegressor):
+            if estimator.loss not in ('squared_error', 'absolute_error', 'huber', 'quantile'):
+                raise TypeError(f"Can't compile GradientBoostingRegressor with loss={estimator.loss!r}")
+            if estimator.init_ == 'zero':
+                initial = 0.0
+            else:
+                initial = float(np.ravel(estimator.init_.predict(np.zeros((1, self.n_features))))[0])
+            self.intercept += scale * initial
+            for tree in estimator.estimators_[:, 0]:
+                self.add(tree, scale * estimator.learning_rate)
+        elif isinstance(estimator, HistGradientBoostingRegressor):
+            if estimator.loss not in ('squared_error', 'absolute_error', 'quantile'):
+                raise TypeError(f"Can't compile HistGradientBoostingRegressor with loss={estimator.loss!r}")
+            self.intercept += scale * float(np.ravel(estimator._baseline_prediction)[0])
+            for (predictor,) in estimator._predictors:
+                nodes = predictor.nodes
+                if nodes['is_categorical'].any():
+                    raise TypeError("Can't compile categorical splits")
+                # Leaf values already include the learning rate
+                self.trees.append((nodes['feature_idx'], nodes['num_threshold'], nodes['left'], nodes['right'],
+                                   nodes['value'], nodes['is_leaf'].astype(bool), nodes['missing_go_to_left'], scale))
+        elif isinstance(estimator, DecisionTreeRegressor):
+            tree = estimator.tree_
+            # Trees from sklearn < 1.3 reject NaN inputs, so their direction never matters
+            missing_go_to_left = getattr(tree, 'missing_go_to_left', np.ones(tree.node_count, dtype=np.uint8))
+            self.trees.append((tree.feature, tree.threshold, tree.children_left, tree.children_right,
+                               tree.value[:, 0, 0], tree.children_left < 0, missing_go_to_left, scale))
+        elif isinstance(estimator, LinearRegression):
+            self.coef += scale * np.ravel(estimator.coef_)
+            self.intercept += scale * float(np.ravel(estimator.intercept_)[0])
+        else:
+            raise TypeError(f"Can't compile {type(estimator).__name__}")
+
+    def build(self):
+        feature, threshold, children, value, roots, missing_right = [], [], [], [], [], []
+        start = 0
+        for tree_feature, tree_threshold, tree_left, tree_right, tree_value, is_leaf, missing_go_to_left, scale in self.trees:
+            node_count = len(is_leaf)
+            # Global node ids; leaves (and pointers to them) become ~id
+            ids = np.arange(start, start + node_count)
+            ids = np.where(is_leaf, ~ids, ids)
+            pairs = np.empty(2 * node_count, dtype=np.int64)
+            pairs[0::2] = np.where(is_leaf, -1, ids[np.maximum(tree_left, 0)])
+            pairs[1::2] = np.where(is_leaf, -1, ids[np.maximum(tree_right, 0)])
+            feature.append(np.where(is_leaf, 0, tree_feature))
+            threshold.append(tree_threshold)
+            children.append(pairs)
+            value.append(np.where(is_leaf, tree_value * scale, 0.0))
+            roots.append(ids[0])
+            missing_right.append(np.asarray(missing_go_to_left) == 0)
+            start += node_count
+        if start >= np.iinfo(np.int32).max // 2:
+            raise ValueError("Ensemble too large to compile")
+        return CompiledEnsemble(
+            feature=np.concatenate(feature or [[]]).astype(np.int32),
+            threshold=np.concatenate(threshold or [[]]).astype(np.float64),
+            children=np.concatenate(children or [[]]).astype(np.int32),
+            value=np.concatenate(value or [[]]).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            coef=self.coef,
+            intercept=self.intercept,
+            missing_right=np.concatenate(missing_right or [[]]).astype(bool),
+        )
+
+
+class HybridPredictor:
+    """Predicts with the compiled ensemble for small batches and the original model for large ones."""
+
+    def __init__(self, compiled, model, max_compiled_rows=COMPILED_MAX_ROWS):
+        self.compiled = compiled
+        self.model = model
+        self.max_compiled_rows = max_compiled_rows
+
+    def predict(self, X):
+        # Rows with missing values go to sklearn, which raises for members
+        # such as LinearRegression that don't accept NaN
+        if len(X) <= self.max_compiled_rows and not np.isnan(X).any():
+            return self.compiled.predict(X)
+        return self.model.predict(X)
+
+
+def compile_model(model, n_features):
+    """Compiles a fitted VotingRegressor (or a single supported member) for fast prediction.
+
+    Supports random forests, extra trees, gradient boosting (classic and
+    histogram-based), single decision trees and linear regression. Raises TypeError for anything else.
+    """
+    builder = _Builder(n_features)
+    builder.add(model, 1.0)
+    return builder.build()
+
+
+def check_compiled(compiled, model, X, tolerance=MAX_PREDICTION_DIFFERENCE):
+    """Raises ValueError if the compiled model's predictions differ from the model's on X.
+
+    Also compares them on a copy of X with one feature per row set to NaN,
+    unless the model itself rejects missing values.
+    """
+    if not len(X):
+        return 0.0
+    difference = float(np.max(np.abs(compiled.predict(X) - model.predict(X))))
+    X_missing = np.array(X, dtype=np.float32)
+    X_missing[np.arange(len(X)), np.arange(len(X)) % X_missing.shape[1]] = np.nan
+    try:
+        expected = model.predict(X_missing)
+    except ValueError:
+        expected = None
+    if expected is not None:
+        difference = max(difference, float(np.max(np.abs(compiled.predict(X_missing) - expected))))
+    if not difference <= tolerance:
+        raise ValueError(f"Compiled predictions differ from the model's by up to {difference:.3g}")
+    return difference
+
+
+def save_compiled(compiled, path):
+    """Writes the node arrays as .npy files (so they can be memory-mapped) plus a manifest."""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in NODE_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(compiled, name))
+    with open(os.path.join(tmp_path, MANIFEST_FILENAME), 'w') as f:
+        json.dump({'intercept': compiled.intercept, 'n_features': compiled.n_features,
+                   'n_trees': compiled.n_trees, 'n_nodes': len(compiled.feature)}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+
+
+def load_compiled(path, mmap_mode='r'):
+    """Loads a compiled model; with mmap_mode the node arrays are paged in from disk, not copied."""
+    with open(os.path.join(path, MANIFEST_FILENAME)) as f:
+        manifest = json.load(f)
+    # Models compiled before missing_right was stored load without it
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+              for name in NODE_ARRAYS if os.path.exists(os.path.join(path, f"{name}.npy"))}
+    return CompiledEnsemble(intercept=manifest['intercept'], **arrays)
@@ -0,0 +1,97 @@
+import numpy as np
+
+# --- Earth model ---
+
+EARTH_RADIUS_KM = 6371.0088  # IUGG mean radius, what a plain haversine assumes
+WGS84_A_KM = 6378.137        # WGS-84 semi-major axis
+WGS84_B_KM = 6356.752314245  # WGS-84 semi-minor axis
+
+# Upper bound on how many float64 temporaries a single block may allocate.
+# 10k x 10k pairs would otherwise need several GB of intermediates.
+MAX_BLOCK_ELEMENTS = 4_000_000
+
+
+def _as_radians(values):
+    """Converts a sequence of degrees into a flat float64 array of radians."""
+    return np.radians(np.asarray(values, dtype=np.float64).ravel())
+
+
+def _directional_radius_km(lat1, lat2, dlat, dlon):
+    """Effective WGS-84 radius of curvature along the direction of travel.
+
+    Uses the meridional (M) and prime-vertical (N) radii at the mean latitude,
+    weighted by how much of the displacement is north-south vs east-west.
+    Scaling the haversine central angle by this radius removes most of the
+    spherical error (~0.5%) for city-scale distances, bringing it within a
+    few metres of geopy's geodesic.
+    """
+    mean_lat = (lat1 + lat2) * 0.5
+    sin_lat = np.sin(mean_lat)
+    cos_lat = np.cos(mean_lat)
+    e2 = 1.0 - (WGS84_B_KM / WGS84_A_KM) ** 2
+    w = np.sqrt(1.0 - e2 * sin_lat * sin_lat)
+    n = WGS84_A_KM / w
+    m = WGS84_A_KM * (1.0 - e2) / (w * w * w)
+    dy = dlat
+    dx = dlon * cos_lat
+    flat = dx * dx + dy * dy
+    scaled = (n * dx) ** 2 + (m * dy) ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        radius = np.sqrt(scaled / flat)
+    return np.where(flat > 0.0, radius, EARTH_RADIUS_KM)
+
+
+def _haversine_km(lat1, lon1, lat2, lon2, ellipsoidal):
+    """Broadcasting haversine on radian inputs, returns float64 kilometres."""
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = np.sin(dlat * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon * 0.5) ** 2
+    central_angle = 2.0 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+    if ellipsoidal:
+        return central_angle * _directional_radius_km(lat1, lat2, dlat, dlon)
+    return central_angle * EARTH_RADIUS_KM
+
+
+def distance_matrix(src_lats, src_lons, dst_lats, dst_lons, ellipsoidal=True):
+    """Computes all pairwise distances (km) between two sets of coordinates.
+
+    Returns a float32 matrix of shape (len(src), len(dst)) where entry [i, j]
+    is the distance from source i to destination j. Work is done in row
+    blocks so memory stays bounded even for very large inputs.
+    """
+    lat1 = _as_radians(src_lats)
+    lon1 = _as_radians(src_lons)
+    lat2 = _as_radians(dst_lats)
+    lon2 = _as_radians(dst_lons)
+    if lat1.shape != lon1.shape or lat2.shape != lon2.shape:
+        raise ValueError("Latitude and longitude arrays must have the same length.")
+
+    n_src, n_dst = lat1.size, lat2.size
+    result = np.empty((n_src, n_dst), dtype=np.float32)
+    if n_src == 0 or n_dst == 0:
+        return result
+
+    block_rows = max(1, MAX_BLOCK_ELEMENTS // n_dst)
+    for start in range(0, n_src, block_rows):
+        stop = min(start + block_rows, n_src)
+        result[start:stop] = _haversine_km(
+            lat1[start:stop, None], lon1[start:stop, None],
+            lat2[None, :], lon2[None, :],
+            ellipsoidal,
+        )
+    return result
+
+
+def paired_distances(lats1, lons1, lats2, lons2, ellipsoidal=True):
+    """Computes element-wise distances (km) between two equally sized coordinate lists.
+
+    Used when the candidate pairs have already been pruned and a full matrix
+    would be wasteful. Returns a float32 vector.
+    """
+    lat1 = _as_radians(lats1)
+    lon1 = _as_radians(lons1)
+    lat2 = _as_radians(lats2)
+    lon2 = _as_radians(lons2)
+    if not (lat1.shape == lon1.shape == lat2.shape == lon2.shape):
+        raise ValueError("All coordinate arrays must have the same length.")
+    return _haversine_km(lat1, lon1, lat2, lon2, ellipsoidal).astype(np.float32)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+
+class FeaturePipeline:
+    """Fitted encoding of allocation features into the model's input matrix.
+
+    The categorical vocabularies are fixed when the model is trained and
+    saved with it, so encoding a cycle's candidate pairs (or a /predict
+    request) is one pass that writes straight into a preallocated
+    contiguous float32 matrix: numeric columns first, then one indicator
+    column per known category. Categories the model never saw encode as
+    all zeros, as the old get_dummies-and-align path did. Columns are named
+    like pd.get_dummies output, e.g. 'incident_type_fire'.
+    """
+
+    def __init__(self, numeric_columns, vocabularies):
+        self.numeric_columns = list(numeric_columns)
+        self.vocabularies = {column: list(values) for column, values in vocabularies.items()}
+        self._offsets = {}
+        self._positions = {column: {value: i for i, value in enumerate(values)}
+                           for column, values in self.vocabularies.items()}
+        offset = len(self.numeric_columns)
+        for column, values in self.vocabularies.items():
+            self._offsets[column] = offset
+            offset += len(values)
+        self.n_features = offset
+
+    @classmethod
+    def fit(cls, frame, feature_columns, categorical_columns):
+        """Learns each categorical column's vocabulary from the training frame."""
+        vocabularies = {
+            column: sorted({str(value) for value in pd.unique(np.asarray(frame[column], dtype=object)) if not pd.isna(value)})
+            for column in categorical_columns
+        }
+        numeric_columns = [column for column in feature_columns if column not in vocabularies]
+        return cls(numeric_columns, vocabularies)
+
+    @classmethod
+    def from_columns(cls, columns, categorical_columns):
+        """Rebuilds the pipeline from a model's get_dummies column list (versions saved without one)."""
+        vocabularies = {column: [] for column in categorical_columns}
+        numeric_columns = []
+        for name in columns:
+            prefix = next((column for column in categorical_columns if name.startswith(f"{column}_")), None)
+            if prefix is None:
+                numeric_columns.append(name)
+            else:
+                vocabularies[prefix].append(name[len(prefix) + 1:])
+        return cls(numeric_columns, vocabularies)
+
+    @property
+    def columns(self):
+        """Names of the matrix columns, in order."""
+        names = list(self.numeric_columns)
+        for column, values in self.vocabularies.items():
+            names.extend(f"{column}_{value}" for value in values)
+        return names
+
+    def transform(self, rows, out=None):
+        """Encodes `rows` (a DataFrame or a dict of equal-length columns) into a float32 matrix.
+
+        Pass `out`, a C-contiguous float32 array of shape (len(rows), n_features),
+        to reuse a buffer instead of allocating one.
+        """
+        n_rows = len(next(iter(rows.values())) if isinstance(rows, dict) else rows)
+        if out is None:
+            out = np.empty((n_rows, self.n_features), dtype=np.float32)
+        elif out.shape != (n_rows, self.n_features) or out.dtype != np.float32 or not out.flags.c_contiguous:
+            raise ValueError(f"out must be a C-contiguous float32 array of shape {(n_rows, self.n_features)}")
+
+        for j, column in enumerate(self.numeric_columns):
+            out[:, j] = np.asarray(rows[column], dtype=np.float32)
+        out[:, len(self.numeric_columns):] = 0
+        row_index = np.arange(n_rows)
+        for column, positions in self._positions.items():
+            # Look up each distinct value once, then broadcast to the rows
+            row_codes, uniques = pd.factorize(np.asarray(rows[column], dtype=object))
+            unique_codes = np.array([positions.get(str(value), -1) for value in uniques] + [-1], dtype=np.intp)
+            codes = unique_codes[row_codes]  # factorize gives missing values -1, which maps to the trailing -1
+            known = codes >= 0
+            out[row_index[known], self._offsets[column] + codes[known]] = 1
+        return out
@@ -0,0 +1,230 @@
+import argparse
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import (GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor,
+                              VotingRegressor)
+from sklearn.linear_model import LinearRegression
+
+import model_versions
+from alloting_resources import CATEGORICAL_COLUMNS, DATA_DIR, FEATURE_COLUMNS, TARGET_COLUMN
+from columnar_cache import get_table
+from compiled_model import check_compiled, compile_model, save_compiled
+from feature_pipeline import FeaturePipeline
+
+# Share of the training data held back to validate a new model before it is published
+VALIDATION_FRACTION = 0.1
+MIN_VALIDATION_ROWS = 20
+
+# A new model is rejected unless its validation error is below this share of
+# the error from always predicting the training mean. (The serving model
+# isn't a fair yardstick: it was usually trained on the held-out rows.)
+# The first version is published regardless, so the allocator always has a model.
+MAX_ERROR_VS_MEAN = 0.9
+
+# Hex digits of the artifacts' SHA-256 used as the version name
+VERSION_HASH_LENGTH = 16
+
+# 'gb' is the original GradientBoostingRegressor; 'hist' is the histogram-based
+# one, much faster on large data sets
+BOOSTERS = ('gb', 'hist')
+
+# How the background trainer fits the ensemble, overridable from the environment.
+# The defaults reproduce the original model, fitted on every core.
+TRAINING_OPTIONS = {
+    'n_jobs': int(os.environ.get('TRAINING_N_JOBS', '-1')),
+    'booster': os.environ.get('TRAINING_BOOSTER', 'gb'),
+    'subsample': float(os.environ.get('TRAINING_SUBSAMPLE', '1.0')),
+    'early_stopping': os.environ.get('TRAINING_EARLY_STOPPING', '0') == '1',
+    'min_samples_leaf': int(os.environ.get('TRAINING_MIN_SAMPLES_LEAF', '1')),
+}
+
+
+def build_voting_model(n_jobs=-1, booster='gb', subsample=1.0, early_stopping=False, min_samples_leaf=1):
+    """The forest + boosting + linear ensemble, unfitted.
+
+    n_jobs            cores for the forest's trees and for fitting the three members side by side
+    booster           'gb' or 'hist' (see BOOSTERS)
+    subsample         share of rows each forest tree (and each 'gb' stage) is fitted on
+    early_stopping    stop boosting once a held-out 10% of the rows stops improving
+    min_samples_leaf  smallest forest leaf; larger values keep trees on big data sets small
+    """
+    if booster not in BOOSTERS:
+        raise ValueError(f"booster must be one of {', '.join(BOOSTERS)}")
+    if not 0 < subsample <= 1:
+        raise ValueError("subsample must be in (0, 1]")
+    rf = RandomForestRegressor(n_jobs=n_jobs, max_samples=subsample if subsample < 1 else None,
+                               min_samples_leaf=min_samples_leaf, random_state=42)
+    if booster == 'hist':
+        gb = HistGradientBoostingRegressor(early_stopping=early_stopping, random_state=42)
+    else:
+        gb = GradientBoostingRegressor(subsample=subsample, n_iter_no_change=10 if early_stopping else None,
+                                       random_state=42)
+    lr = LinearRegression()
+    return VotingRegressor(estimators=[('rf', rf), ('gb', gb), ('lr', lr)], n_jobs=n_jobs)
+
+
+def fit_voting_model(X, y, **options):
+    """Fits build_voting_model(**options) on X, y.
+
+    Members run in threads rather than worker processes: tree building
+    releases the GIL, and threads share X instead of each getting a copy.
+    """
+    model = build_voting_model(**options)
+    with joblib.parallel_backend('threading'):
+        return model.fit(X, y)
+
+
+def split_holdout(n_rows):
+    """Training and validation row positions; no validation rows for very small data sets."""
+    order = np.random.default_rng(42).permutation(n_rows)
+    n_validation = int(n_rows * VALIDATION_FRACTION)
+    if n_validation < MIN_VALIDATION_ROWS:
+        return order, order[:0]
+    return order[n_validation:], order[:n_validation]
+
+
+def write_version(models_path, model, pipeline, compiled, metadata):
+    """Writes the artifacts and moves them into place under their content hash. Returns the version.
+
+    Arrays are stored uncompressed so joblib can memory-map them on load.
+    Retraining to an identical model reuses the existing version.
+    """
+    tmp_dir = os.path.join(models_path, f"{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    joblib.dump(model, os.path.join(tmp_dir, model_versions.MODEL_ARTIFACT))
+    joblib.dump(pipeline, os.path.join(tmp_dir, model_versions.PIPELINE_ARTIFACT))
+    if compiled is not None:
+        save_compiled(compiled, os.path.join(tmp_dir, model_versions.COMPILED_ARTIFACT))
+
+    version = model_versions.content_hash(tmp_dir)[:VERSION_HASH_LENGTH]
+    final_dir = model_versions.version_dir(models_path, version)
+    if os.path.isdir(final_dir):
+        shutil.rmtree(tmp_dir)
+        return version
+    artifact_bytes = sum(os.path.getsize(os.path.join(root, name))
+                         for root, _, files in os.walk(tmp_dir) for name in files)
+    model_versions.write_json(os.path.join(tmp_dir, model_versions.METADATA_ARTIFACT),
+                              dict(metadata, version=version, artifact_bytes=artifact_bytes))
+    os.rename(tmp_dir, final_dir)
+    return version
+
+
+def train_version(data_dir=DATA_DIR, options=None):
+    """Trains on final_allocations.csv, validates the result and publishes it as a new version.
+
+    `options` are build_voting_model arguments, by default TRAINING_OPTIONS.
+
+    Returns the published version, or None if training was skipped, failed
+    or the new model was rejected (the serving model stays current). Only
+    replacements are gated on MAX_ERROR_VS_MEAN; with nothing published yet
+    the model is published even if it doesn't beat the mean.
+    """
+    models_path = model_versions.models_dir(data_dir)
+    if not model_versions.acquire_training_lock(models_path):
+        print("Another trainer is already running.")
+        return None
+
+    options = dict(TRAINING_OPTIONS, **(options or {}))
+    started_at = time.time()
+    data_hash = None
+    try:
+        table = get_table(os.path.join(data_dir, 'final_allocations.csv'), CATEGORICAL_COLUMNS)
+        data_hash = table.content_hash
+        model_versions.write_training_status(models_path, state='running', data_hash=data_hash,
+                                             started_at=started_at, pid=os.getpid())
+
+        training_df = table.to_frame(FEATURE_COLUMNS + [TARGET_COLUMN]).dropna(subset=[TARGET_COLUMN])
+        if training_df.empty:
+            raise ValueError("No training data available after cleaning.")
+        # The model is fitted on the same float32 matrix the allocator will predict from
+        pipeline = FeaturePipeline.fit(training_df, FEATURE_COLUMNS, CATEGORICAL_COLUMNS)
+        X = pipeline.transform(training_df)
+        y = training_df[TARGET_COLUMN].to_numpy()
+        train_pos, validation_pos = split_holdout(len(X))
+
+        print(f"Training Voting Regressor on {len(train_pos)} rows ({len(validation_pos)} held out) with {options}...")
+        fit_start = time.perf_counter()
+        model = fit_voting_model(X[train_pos], y[train_pos], **options)
+        training_seconds = time.perf_counter() - fit_start
+
+        validation_mae = baseline_mae = None
+        if len(validation_pos):
+            X_validation, y_validation = X[validation_pos], y[validation_pos]
+            predictions = model.predict(X_validation)
+            if not np.all(np.isfinite(predictions)):
+                raise ValueError("Model produced non-finite predictions on the validation rows.")
+            validation_mae = float(np.abs(predictions - y_validation).mean())
+            baseline_mae = float(np.abs(y[train_pos].mean() - y_validation).mean())
+            if validation_mae > baseline_mae * MAX_ERROR_VS_MEAN and model_versions.read_current(models_path) is None:
+                print(f"Validation MAE {validation_mae:.3f} vs {baseline_mae:.3f} for predicting the mean; "
+                      f"publishing anyway as there is no model yet.")
+            elif validation_mae > baseline_mae * MAX_ERROR_VS_MEAN:
+                print(f"Rejected new model: validation MAE {validation_mae:.3f} vs {baseline_mae:.3f} for predicting the mean.")
+                model_versions.write_training_status(
+                    models_path, state='rejected', data_hash=data_hash, started_at=started_at, finished_at=time.time(),
+                    training_seconds=training_seconds, validation_mae=validation_mae, mean_baseline_mae=baseline_mae)
+                return None
+
+        # Serving falls back to the sklearn model if the compiled one isn't exact
+        compiled = None
+        try:
+            compiled = compile_model(model, pipeline.n_features)
+            check_compiled(compiled, model, X[validation_pos] if len(validation_pos) else X[train_pos])
+        except (AttributeError, TypeError, ValueError) as e:
+            print(f"Not compiling this model: {e}")
+            compiled = None
+
+        version = write_version(models_path, model, pipeline, compiled, {
+            'data_hash': data_hash,
+            'model_columns': pipeline.columns,
+            'compiled': compiled is not None,
+            'training_rows': len(train_pos),
+            'validation_rows': len(validation_pos),
+            'validation_mae': validation_mae,
+            'mean_baseline_mae': baseline_mae,
+            'training_seconds': training_seconds,
+            'training_options': options,
+            'trained_at': time.time(),
+        })
+        model_versions.publish(models_path, version)
+        model_versions.write_training_status(
+            models_path, state='published', data_hash=data_hash, started_at=started_at, finished_at=time.time(),
+            training_seconds=training_seconds, validation_mae=validation_mae, version=version)
+        print(f"Published model version {version} (trained in {training_seconds:.1f} s).")
+        removed = model_versions.garbage_collect(models_path)
+        if removed:
+            print(f"Removed {len(removed)} old model versions.")
+        return version
+
+    except Exception as e:
+        print(f"Model training failed: {e}")
+        model_versions.write_training_status(models_path, state='failed', data_hash=data_hash, started_at=started_at,
+                                             finished_at=time.time(), error=str(e))
+        return None
+    finally:
+        model_versions.release_training_lock(models_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train, validate and publish a new response-time model version.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Directory holding final_allocations.csv and models/.")
+    parser.add_argument('--n-jobs', type=int, default=TRAINING_OPTIONS['n_jobs'], help="Cores to use (-1 for all).")
+    parser.add_argument('--booster', choices=BOOSTERS, default=TRAINING_OPTIONS['booster'])
+    parser.add_argument('--subsample', type=float, default=TRAINING_OPTIONS['subsample'],
+                        help="Share of rows per forest tree / boosting stage.")
+    parser.add_argument('--early-stopping', action=argparse.BooleanOptionalAction,
+                        default=TRAINING_OPTIONS['early_stopping'])
+    parser.add_argument('--min-samples-leaf', type=int, default=TRAINING_OPTIONS['min_samples_leaf'])
+    args = parser.parse_args()
+    train_version(args.data_dir, {
+        'n_jobs': args.n_jobs,
+        'booster': args.booster,
+        'subsample': args.subsample,
+        'early_stopping': args.early_stopping,
+        'min_samples_leaf': args.min_samples_leaf,
+    })
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+# Model registry under data/models/. Versions are written by model_trainer.py
+# and named by the hash of their artifacts, so identical models share one:
+#   <version>/model.joblib, <version>/pipeline.joblib, <version>/metadata.json
+#   <version>/compiled/   the model flattened by compiled_model.py, if it compiled
+#   current.json          {"version": ..., "history": [...]}, the version the
+#                         allocator should serve and those published before it
+#   training_status.json  the latest training run (running/published/rejected/failed)
+#   training.lock         held by the one trainer allowed to run at a time
+MODELS_DIRNAME = 'models'
+CURRENT_FILENAME = 'current.json'
+STATUS_FILENAME = 'training_status.json'
+LOCK_FILENAME = 'training.lock'
+MODEL_ARTIFACT = 'model.joblib'
+PIPELINE_ARTIFACT = 'pipeline.joblib'
+COMPILED_ARTIFACT = 'compiled'
+METADATA_ARTIFACT = 'metadata.json'
+
+# Published versions kept on disk by garbage_collect, besides the current one
+KEEP_VERSIONS = 5
+
+# A lock older than this belongs to a trainer that died without cleaning up
+TRAINING_LOCK_STALE_SECONDS = 3600
+
+
+def models_dir(data_dir):
+    return os.path.join(data_dir, MODELS_DIRNAME)
+
+
+def version_dir(models_path, version):
+    return os.path.join(models_path, version)
+
+
+def write_json(path, data):
+    """Writes JSON via a temporary file and rename, so readers see the old or the new file, never half of one."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def content_hash(path, exclude=(METADATA_ARTIFACT,)):
+    """SHA-256 over every file under `path` (relative names and bytes), skipping `exclude`."""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            relative = os.path.relpath(file_path, path)
+            if relative in exclude:
+                continue
+            digest.update(relative.encode() + b'\0')
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_pointer(models_path):
+    return read_json(os.path.join(models_path, CURRENT_FILENAME)) or {}
+
+
+def read_current(models_path):
+    """The version the pointer file names, or None before the first publish."""
+    return _read_pointer(models_path).get('version')
+
+
+def read_history(models_path):
+    """Published versions, oldest first, ending with the current one."""
+    return _read_pointer(models_path).get('history', [])
+
+
+def read_metadata(models_path, version):
+    return read_json(os.path.join(version_dir(models_path, version), METADATA_ARTIFACT))
+
+
+def publish(models_path, version):
+    """Atomically points current.json at `version`."""
+    history = [v for v in read_history(models_path) if v != version] + [version]
+    write_json(os.path.join(models_path, CURRENT_FILENAME), {'version': version, 'history': history})
+
+
+def rollback(models_path, version=None):
+    """Points current.json back at `version`, by default the one published before the current one.
+
+    Versions published after the target are dropped from the history (and
+    so become eligible for garbage collection). Returns the version now
+    current. The allocator switches over on its next cycle; the trainer
+    won't retrain on the same data to replace it.
+    """
+    history = read_history(models_path)
+    if version is None:
+        if len(history) < 2:
+            raise ValueError("No earlier version to roll back to.")
+        version = history[-2]
+    if read_metadata(models_path, version) is None:
+        raise ValueError(f"Model version {version} not found in {models_path}.")
+    if version in history:
+        history = history[:history.index(version) + 1]
+    else:
+        history.append(version)
+    write_json(os.path.join(models_path, CURRENT_FILENAME), {'version': version, 'history': history})
+    return version
+
+
+def list_versions(models_path):
+    """Metadata of every version on disk, oldest first."""
+    try:
+        names = os.listdir(models_path)
+    except OSError:
+        return []
+    versions = [(name, read_metadata(models_path, name)) for name in names if not name.endswith('.tmp')]
+    versions = [dict(metadata, version=name) for name, metadata in versions if metadata]
+    return sorted(versions, key=lambda metadata: metadata.get('trained_at') or 0)
+
+
+def garbage_collect(models_path, keep=KEEP_VERSIONS):
+    """Deletes versions other than the current one and the `keep` most recently published.
+
+    Processes still serving a deleted version are unaffected: its files stay
+    readable through their open handles and memory maps. Returns the
+    deleted versions.
+    """
+    history = read_history(models_path)
+    kept = set(history[-(keep + 1):]) | {read_current(models_path)}
+    removed = []
+    for metadata in list_versions(models_path):
+        if metadata['version'] not in kept:
+            shutil.rmtree(version_dir(models_path, metadata['version']), ignore_errors=True)
+            removed.append(metadata['version'])
+    if not training_in_progress(models_path):
+        for name in os.listdir(models_path):
+            if name.endswith('.tmp') and os.path.isdir(os.path.join(models_path, name)):
+                shutil.rmtree(os.path.join(models_path, name), ignore_errors=True)
+    return removed
+
+
+def read_training_status(models_path):
+    return read_json(os.path.join(models_path, STATUS_FILENAME))
+
+
+def write_training_status(models_path, **status):
+    write_json(os.path.join(models_path, STATUS_FILENAME), status)
+
+
+def acquire_training_lock(models_path):
+    """Takes the trainer lock. Returns False if another live trainer holds it."""
+    os.makedirs(models_path, exist_ok=True)
+    lock_path = os.path.join(models_path, LOCK_FILENAME)
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) < TRAINING_LOCK_STALE_SECONDS:
+                    return False
+                os.remove(lock_path)  # Stale: take it over
+            except OSError:
+                pass
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def release_training_lock(models_path):
+    try:
+        os.remove(os.path.join(models_path, LOCK_FILENAME))
+    except OSError:
+        pass
+
+
+def training_in_progress(models_path):
+    lock_path = os.path.join(models_path, LOCK_FILENAME)
+    try:
+        return time.time() - os.path.getmtime(lock_path) < TRAINING_LOCK_STALE_SECONDS
+    except OSError:
+        return False
+
+
+def model_status(data_dir):
+    """Published version with its metadata, plus the latest training run. Used by /api/model_status."""
+    models_path = models_dir(data_dir)
+    version = read_current(models_path)
+    return {
+        "version": version,
+        "metadata": read_metadata(models_path, version) if version else None,
+        "history": read_history(models_path),
+        "training": read_training_status(models_path),
+        "training_in_progress": training_in_progress(models_path),
+    }
+
+
+def main():
+    from alloting_resources import DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Inspect, roll back and clean up published model versions.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Directory holding models/.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List versions on disk.")
+    rollback_parser = commands.add_parser('rollback', help="Serve an earlier version again.")
+    rollback_parser.add_argument('version', nargs='?', help="Defaults to the version published before the current one.")
+    gc_parser = commands.add_parser('gc', help="Delete old versions.")
+    gc_parser.add_argument('--keep', type=int, default=KEEP_VERSIONS, help="Earlier published versions to keep.")
+    args = parser.parse_args()
+
+    models_path = models_dir(args.data_dir)
+    if args.command == 'list':
+        current = read_current(models_path)
+        for metadata in list_versions(models_path):
+            marker = '*' if metadata['version'] == current else ' '
+            trained_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(metadata.get('trained_at') or 0))
+            print(f"{marker} {metadata['version']}  {trained_at}  rows={metadata.get('training_rows')}  "
+                  f"validation_mae={metadata.get('validation_mae')}")
+    elif args.command == 'rollback':
+        try:
+            print(f"Now serving model version {rollback(models_path, args.version)}.")
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+    else:
+        removed = garbage_collect(models_path, args.keep)
+        print(f"Removed {len(removed)} old model versions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+import alloting_resources as allocator
+from distance_matrix import paired_distances
+from online_model import OnlineState, load_state, publish_state
+from traffic_factors import get_traffic_lookup
+
+# final_allocations.csv records response times in minutes; completions are timed in seconds
+RESPONSE_TIME_UNIT_SECONDS = 60
+
+# Completed allocations per partial_fit call
+MINI_BATCH_SIZE = 256
+
+POLL_INTERVAL_SECONDS = 30
+
+
+def fetch_completed(after, limit):
+    """Completed allocations after completion_seq `after`, in completion order, with the last seq returned."""
+    response = requests.get(f"{allocator.API_BASE_URL}/api/completed_allocations",
+                            params={"after": after, "limit": limit})
+    response.raise_for_status()
+    body = response.json()
+    return body['items'], body['last_seq']
+
+
+def training_rows(items, traffic_lookup):
+    """Feature and target frame for completed allocations, as the allocator would have scored them.
+
+    Rows without a traffic prediction or a usable response time are dropped.
+    """
+    df = pd.DataFrame(items)
+    traffic_factors, found = traffic_lookup.lookup(df['incident_id'].to_numpy())
+    df['traffic_factor'] = traffic_factors
+    df['distance'] = paired_distances(df['incident_latitude'], df['incident_longitude'],
+                                      df['resource_latitude'], df['resource_longitude'])
+    df['resource_status'] = df['resource_status'].astype(str).str.lower().eq('available').astype(int)
+    elapsed = pd.to_numeric(df['completed_epoch'] - df['assignment_epoch'], errors='coerce')
+    df[allocator.TARGET_COLUMN] = elapsed / RESPONSE_TIME_UNIT_SECONDS
+    usable = found & df[allocator.TARGET_COLUMN].notna().to_numpy() & (elapsed >= 0).to_numpy()
+    return df[usable]
+
+
+def current_state(data_hash, columns):
+    """The published state for this base model, or a fresh one if the base was retrained."""
+    state = load_state(allocator.ONLINE_MODEL_PATH)
+    if state is None or state.base_data_hash != data_hash or state.columns != list(columns):
+        if state is not None:
+            print("Base model changed; relearning the correction from all completed allocations.")
+        state = OnlineState(data_hash, columns)
+    return state
+
+
+def update_once():
+    """Learns from every allocation completed since the last published version.
+
+    Returns the number of allocations learned from. Cost grows with the
+    number of new completions, not with the size of the history.
+    """
+    base_model, pipeline = allocator.load_and_train_model()
+    if base_model is None:
+        print("No base model available. Skipping online update.")
+        return 0
+    state = current_state(allocator._last_loaded_data_hash, pipeline.columns)
+    traffic_lookup = get_traffic_lookup(os.path.join(allocator.DATA_DIR, 'final_incident_predictions.csv'))
+
+    learned = 0
+    start_seq = state.last_seq
+    while True:
+        items, last_seq = fetch_completed(state.last_seq, MINI_BATCH_SIZE)
+        if not items:
+            break
+        batch = training_rows(items, traffic_lookup)
+        if batch.empty:
+            state.last_seq = last_seq
+            continue
+        X = pipeline.transform(batch)
+        state.partial_fit(base_model, X, batch[allocator.TARGET_COLUMN].to_numpy(dtype=np.float64), last_seq)
+        learned += len(batch)
+
+    if state.last_seq != start_seq:
+        publish_state(state, allocator.ONLINE_MODEL_PATH)
+        print(f"Published online model version {state.version} "
+              f"({learned} new, {state.samples_seen} total completed allocations).")
+    return learned
+
+
+if __name__ == "__main__":
+    while True:
+        try:
+            update_once()
+        except requests.exceptions.RequestException as e:
+            print(f"Could not fetch completed allocations: {e}")
+        time.sleep(POLL_INTERVAL_SECONDS)
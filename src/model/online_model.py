@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+# Published in data/ by online_learner.py
+ONLINE_MODEL_FILENAME = "online_model.joblib"
+
+
+class OnlineState:
+    """What the online learner publishes: a residual correction for one base model.
+
+    The batch-trained VotingRegressor can't be updated incrementally, so it
+    stays fixed and a linear model learns, by partial_fit, how far its
+    predictions are off on completed allocations. The base is identified by
+    the content hash of the data it was trained on; a retrained base starts
+    a fresh state.
+    """
+
+    def __init__(self, base_data_hash, columns):
+        self.base_data_hash = base_data_hash
+        self.columns = list(columns)
+        self.version = 0
+        self.last_seq = 0          # completion_seq of the last allocation learned from
+        self.samples_seen = 0
+        self.updated_at = None
+        self.scaler = StandardScaler()
+        self.corrector = SGDRegressor(learning_rate='invscaling', eta0=0.01, alpha=1e-4, random_state=42)
+
+    def partial_fit(self, base_model, X, y, last_seq):
+        """Learns from one mini-batch of encoded features X and actual response times y."""
+        residual = np.asarray(y, dtype=np.float64) - base_model.predict(X)
+        X = np.asarray(X, dtype=np.float64)
+        self.scaler.partial_fit(X)
+        self.corrector.partial_fit(self.scaler.transform(X), residual)
+        self.samples_seen += len(X)
+        self.last_seq = last_seq
+
+    def correction(self, X):
+        if not self.samples_seen:
+            return np.zeros(len(X))
+        return self.corrector.predict(self.scaler.transform(np.asarray(X, dtype=np.float64)))
+
+
+class OnlineResponseModel:
+    """Base model plus the published correction; predicts like the VotingRegressor it wraps."""
+
+    def __init__(self, base_model, state):
+        self.base_model = base_model
+        self.state = state
+
+    @property
+    def version(self):
+        return self.state.version
+
+    def predict(self, X):
+        return self.base_model.predict(X) + self.state.correction(X)
+
+
+def publish_state(state, path):
+    """Writes a new version of `state`. Readers see either the old file or the new one, never a partial write."""
+    state.version += 1
+    state.updated_at = time.time()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_state(path):
+    """The published state, or None if nothing has been published yet or it can't be read."""
+    try:
+        return joblib.load(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Could not load online model state from {path}: {e}")
+        return None
+
+
+_cache_lock = threading.Lock()
+_cached_signature = None
+_cached_model = None
+
+def get_online_model(base_model, base_data_hash, columns, path):
+    """The latest published online version of base_model, or base_model itself if none applies.
+
+    The state file is only re-read when it changes on disk, so calling this
+    every allocation cycle costs one stat.
+    """
+    global _cached_signature, _cached_model
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return base_model
+    signature = (stat.st_size, stat.st_mtime_ns, id(base_model))
+    with _cache_lock:
+        if signature != _cached_signature:
+            state = load_state(path)
+            usable = (state is not None and state.base_data_hash == base_data_hash
+                      and state.columns == list(columns) and state.samples_seen)
+            _cached_model = OnlineResponseModel(base_model, state) if usable else None
+            _cached_signature = signature
+            if usable:
+                print(f"Using online model version {state.version} ({state.samples_seen} completed allocations learned).")
+        return _cached_model or base_model
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Optional bucket sizes for the cache key. None keys on the exact value, so
+# a hit returns exactly what the model would; pairs left unallocated keep
+# their distance and traffic factor across cycles and still hit. With a step
+# set, nearby pairs share the entry of whichever pair filled it first.
+DISTANCE_STEP_KM = None
+TRAFFIC_STEP = None
+
+MAX_ENTRIES = 100_000
+
+
+class PredictionCache:
+    """Bounded LRU cache of predicted response times keyed by (optionally quantized) feature tuples.
+
+    Misses are always predicted from the exact feature values; quantization
+    only decides which rows share a cache entry. The cache is cleared
+    whenever the serving model version changes; only the misses of a batch
+    reach model.predict, as one call.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, distance_step=DISTANCE_STEP_KM, traffic_step=TRAFFIC_STEP):
+        self.max_entries = max_entries
+        self.distance_step = distance_step
+        self.traffic_step = traffic_step
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _snap(values, step):
+        return values if step is None else np.round(values / step) * step
+
+    def quantize(self, rows):
+        """Cache key columns of `rows`, snapped to the cache's buckets if it has any, as a dict of arrays."""
+        return {
+            'incident_type': np.asarray(rows['incident_type'], dtype=object).astype(str),
+            'resource_type': np.asarray(rows['resource_type'], dtype=object).astype(str),
+            'severity': np.asarray(rows['severity'], dtype=np.float64),
+            'distance': self._snap(np.asarray(rows['distance'], dtype=np.float64), self.distance_step),
+            'traffic_factor': self._snap(np.asarray(rows['traffic_factor'], dtype=np.float64), self.traffic_step),
+            'resource_status': np.asarray(rows['resource_status'], dtype=np.float64),
+        }
+
+    def predict(self, model, pipeline, rows, version):
+        """Predicted response time for each of `rows` (a DataFrame or dict of feature columns).
+
+        `version` identifies the model; a different one than last call empties the cache.
+        """
+        quantized = self.quantize(rows)
+        keys = list(zip(*quantized.values()))
+        predictions = np.empty(len(keys), dtype=np.float64)
+
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+
+            missing = {}
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    predictions[i] = value
+            self.hits += len(keys) - sum(len(positions) for positions in missing.values())
+            self.misses += sum(len(positions) for positions in missing.values())
+
+        if missing:
+            # Exact keys: one row per distinct key. Buckets: every missing row,
+            # each at its own values, with the first filling the entry.
+            exact = self.distance_step is None and self.traffic_step is None
+            positions = np.array([p for ps in missing.values() for p in (ps[:1] if exact else ps)], dtype=np.intp)
+            values = model.predict(pipeline.transform({name: np.asarray(rows[name])[positions] for name in quantized}))
+            offset = 0
+            with self._lock:
+                for key, key_positions in missing.items():
+                    if exact:
+                        predictions[key_positions] = values[offset]
+                        offset += 1
+                    else:
+                        predictions[key_positions] = values[offset:offset + len(key_positions)]
+                        offset += len(key_positions)
+                    if version == self._version:
+                        self._entries[key] = float(predictions[key_positions[0]])
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return predictions
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,153 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+
+from distance_matrix import paired_distances
+
+# Grid cell size in degrees (~1.1 km of latitude). Small enough that the
+# first ring or two usually holds the k nearest units in a dense city, large
+# enough that sparse types don't need many rings.
+DEFAULT_CELL_SIZE_DEG = 0.01
+
+# Conservative km per degree, used only to bound how far a ring can be
+KM_PER_DEG_LAT = 110.574
+
+
+class ResourceIndex:
+    """Grid-bucket spatial index over resources, partitioned by resource type.
+
+    Each type gets its own dict of grid cells -> {resource_id: (lat, lon)},
+    so a nearest-neighbour query for an incident only ever touches units it
+    could actually be paired with. Updates are O(1) and the index is safe to
+    share between request threads.
+    """
+
+    def __init__(self, cell_size_deg=DEFAULT_CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self._cells = {}       # type -> {(row, col): {resource_id: (lat, lon)}}
+        self._locations = {}   # resource_id -> (type, cell, lat, lon)
+        self._counts = {}      # type -> number of indexed resources
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_records(cls, records, cell_size_deg=DEFAULT_CELL_SIZE_DEG):
+        """Builds an index from dict-like rows with resource_id, type and current coordinates."""
+        index = cls(cell_size_deg)
+        for record in records:
+            index.add(record['resource_id'], record['type'],
+                      record['current_latitude'], record['current_longitude'])
+        return index
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, resource_id):
+        return resource_id in self._locations
+
+    def _cell_for(self, lat, lon):
+        return (math.floor(lat / self.cell_size_deg), math.floor(lon / self.cell_size_deg))
+
+    def add(self, resource_id, resource_type, lat, lon):
+        """Adds a resource, or moves it if it is already indexed."""
+        lat, lon = float(lat), float(lon)
+        cell = self._cell_for(lat, lon)
+        with self._lock:
+            self._discard(resource_id)
+            self._cells.setdefault(resource_type, {}).setdefault(cell, {})[resource_id] = (lat, lon)
+            self._locations[resource_id] = (resource_type, cell, lat, lon)
+            self._counts[resource_type] = self._counts.get(resource_type, 0) + 1
+
+    def update(self, resource_id, resource_type=None, lat=None, lon=None):
+        """Moves and/or retypes an indexed resource. Unknown IDs are ignored."""
+        with self._lock:
+            current = self._locations.get(resource_id)
+            if current is None:
+                return
+            old_type, _, old_lat, old_lon = current
+            self.add(
+                resource_id,
+                old_type if resource_type is None else resource_type,
+                old_lat if lat is None else lat,
+                old_lon if lon is None else lon,
+            )
+
+    def remove(self, resource_id):
+        """Removes a resource from the index if present."""
+        with self._lock:
+            self._discard(resource_id)
+
+    def _discard(self, resource_id):
+        current = self._locations.pop(resource_id, None)
+        if current is None:
+            return
+        resource_type, cell, _, _ = current
+        type_cells = self._cells[resource_type]
+        bucket = type_cells[cell]
+        del bucket[resource_id]
+        self._counts[resource_type] -= 1
+        if not bucket:
+            del type_cells[cell]
+            if not type_cells:
+                del self._cells[resource_type]
+                del self._counts[resource_type]
+
+    def _ring_cells(self, center, radius):
+        """Yields the cells at Chebyshev distance exactly `radius` from center."""
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for dc in range(-radius, radius + 1):
+            yield (row - radius, col + dc)
+            yield (row + radius, col + dc)
+        for dr in range(-radius + 1, radius):
+            yield (row + dr, col - radius)
+            yield (row + dr, col + radius)
+
+    def nearest(self, lat, lon, resource_types, k, exclude=()):
+        """Returns up to k (resource_id, distance_km) of the given types, closest first.
+
+        Grid rings are expanded outwards until k candidates are found and the
+        next ring cannot contain anything closer than the current k-th best.
+        """
+        lat, lon = float(lat), float(lon)
+        if k <= 0:
+            return []
+        center = self._cell_for(lat, lon)
+        # Ring r+1 is at least r cells away in every direction
+        km_per_cell = self.cell_size_deg * KM_PER_DEG_LAT * max(math.cos(math.radians(abs(lat) + self.cell_size_deg)), 0.01)
+
+        with self._lock:
+            types = [t for t in set(resource_types) if t in self._cells]
+            type_cells = [self._cells[t] for t in types]
+            remaining = sum(self._counts[t] for t in types)
+            best = []  # max-heap of (-distance, resource_id)
+            radius = 0
+            while remaining > 0:
+                ids, lats, lons = [], [], []
+                for cell in self._ring_cells(center, radius):
+                    for cells in type_cells:
+                        bucket = cells.get(cell)
+                        if not bucket:
+                            continue
+                        remaining -= len(bucket)
+                        for resource_id, (r_lat, r_lon) in bucket.items():
+                            if resource_id in exclude:
+                                continue
+                            ids.append(resource_id)
+                            lats.append(r_lat)
+                            lons.append(r_lon)
+                if ids:
+                    distances = paired_distances(np.full(len(ids), lat), np.full(len(ids), lon), lats, lons)
+                    for resource_id, distance in zip(ids, distances.tolist()):
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, resource_id))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, resource_id))
+                if len(best) == k and radius * km_per_cell > -best[0][0]:
+                    break
+                radius += 1
+
+        return [(resource_id, -neg) for neg, resource_id in sorted(best, reverse=True)]
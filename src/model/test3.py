@@ -7,6 +7,8 @@ import os
 import requests
 import time
 
+from traffic_factors import get_traffic_lookup
+
 # --- Configuration ---
 API_BASE_URL = "http://localhost:5000"
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
@@ -74,10 +76,7 @@ def process_allocations():
         print(f"Fetched {len(resources_df)} resources from API.")
 
         predictions_csv_path = os.path.join(DATA_DIR, r'data/final_incident_predictions.csv')
-        predictions_df = pd.read_csv(predictions_csv_path)
-        predictions_df.columns = predictions_df.columns.str.strip().str.lower().str.replace(' ', '_')
-        if 's.no.' in predictions_df.columns:
-            predictions_df.drop(columns=['s.no.'], inplace=True)
+        traffic_lookup = get_traffic_lookup(predictions_csv_path)
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from API: {e}")
@@ -98,9 +97,9 @@ def process_allocations():
 
                 distance = geodesic((incident_lat, incident_lon), (resource_lat, resource_lon)).km
 
-                traffic_factor = predictions_df[
-                    predictions_df['incident_id'] == incident['incident_id']
-                ]['predicted_traffic_factor'].iloc[0] if not predictions_df.empty else 50
+                traffic_factor = traffic_lookup.get(incident['incident_id'])
+                if traffic_factor is None:
+                    continue
 
                 rows.append({
                     'incident_id': incident['incident_id'],
@@ -0,0 +1,96 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from columnar_cache import get_table
+
+# Used for every incident when the predictions file has no rows, as before
+DEFAULT_TRAFFIC_FACTOR = 50
+
+
+class TrafficFactorLookup:
+    """Keyed access to predicted_traffic_factor from final_incident_predictions.csv.
+
+    The CSV is read through the columnar cache into a sorted incident_id
+    array with the matching factors, so looking up a whole cycle's incidents
+    is one searchsorted call instead of a boolean scan per incident-resource
+    pair. Only the two columns used are loaded, and only when the file's
+    content hash changes.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self._content_hash = None
+        self._incident_ids = np.empty(0, dtype=np.int64)
+        self._factors = np.empty(0, dtype=np.float64)
+        self._has_rows = False
+
+    @property
+    def content_hash(self):
+        return self._content_hash
+
+    def refresh(self):
+        """Reloads the CSV if its content changed. Returns True if it was (re)loaded."""
+        table = get_table(self.csv_path)
+        with self._lock:
+            if table.content_hash == self._content_hash:
+                return False
+            self._load(table)
+            self._content_hash = table.content_hash
+            return True
+
+    def _load(self, table):
+        # Column names vary in case and spacing between exports
+        columns = {name.strip().lower().replace(' ', '_'): name for name in table.columns}
+        self._has_rows = table.num_rows > 0
+        if 'incident_id' not in columns or 'predicted_traffic_factor' not in columns:
+            self._incident_ids = np.empty(0, dtype=np.int64)
+            self._factors = np.empty(0, dtype=np.float64)
+            return
+        ids = pd.to_numeric(pd.Series(np.asarray(table[columns['incident_id']])), errors='coerce')
+        factors = pd.to_numeric(pd.Series(np.asarray(table[columns['predicted_traffic_factor']])), errors='coerce')
+        valid = ids.notna()
+        ids = ids[valid].astype(np.int64).to_numpy()
+        factors = factors[valid].to_numpy(dtype=np.float64)
+
+        # First row wins for duplicated IDs, matching the old .iloc[0] lookup
+        unique_ids, first_pos = np.unique(ids, return_index=True)
+        self._incident_ids = unique_ids
+        self._factors = factors[first_pos]
+
+    def lookup(self, incident_ids):
+        """Returns (factors, found) arrays aligned with incident_ids.
+
+        If the predictions file has no rows at all, every incident gets
+        DEFAULT_TRAFFIC_FACTOR and counts as found.
+        """
+        incident_ids = np.asarray(incident_ids, dtype=np.int64)
+        if not self._has_rows:
+            return np.full(incident_ids.shape, DEFAULT_TRAFFIC_FACTOR, dtype=np.float64), np.ones(incident_ids.shape, dtype=bool)
+        pos = np.searchsorted(self._incident_ids, incident_ids)
+        pos = np.clip(pos, 0, max(len(self._incident_ids) - 1, 0))
+        found = self._incident_ids[pos] == incident_ids if len(self._incident_ids) else np.zeros(incident_ids.shape, dtype=bool)
+        factors = np.where(found, self._factors[pos] if len(self._factors) else np.nan, np.nan)
+        return factors, found
+
+    def get(self, incident_id, default=None):
+        """Returns the traffic factor for one incident, or default if it has no prediction."""
+        factors, found = self.lookup([incident_id])
+        return float(factors[0]) if found[0] else default
+
+
+_lookups = {}
+_lookups_lock = threading.Lock()
+
+def get_traffic_lookup(csv_path):
+    """Returns the shared, refreshed lookup for csv_path (one per file per process)."""
+    csv_path = os.path.abspath(csv_path)
+    with _lookups_lock:
+        lookup = _lookups.get(csv_path)
+        if lookup is None:
+            lookup = _lookups[csv_path] = TrafficFactorLookup(csv_path)
+    lookup.refresh()
+    return lookup
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The model scripts import their siblings by bare name, as when run from src/model
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'model')
+if MODEL_DIR not in sys.path:
+    sys.path.insert(0, MODEL_DIR)
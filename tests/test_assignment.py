@@ -0,0 +1,40 @@
+import numpy as np
+
+from assignment import min_cost_assignment, severity_weights
+
+
+def test_higher_severity_wins_even_when_lower_is_cheaper():
+    # One unit, two incidents: severity 1 at 1 minute, severity 2 at 100 minutes
+    incident_ids = np.array([1, 2])
+    resource_ids = np.array([10, 10])
+    costs = np.array([1.0, 100.0])
+    chosen = min_cost_assignment(incident_ids, resource_ids, costs, severity_weights([1, 2]))
+    assert incident_ids[chosen].tolist() == [2]
+
+
+def test_most_severe_incidents_served_when_units_are_scarce():
+    rng = np.random.default_rng(0)
+    incident_ids = np.repeat(np.arange(6), 2)
+    resource_ids = np.tile([10, 11], 6)
+    severity = np.repeat([1, 2, 3, 4, 5, 5], 2)
+    # The low-severity incidents are far cheaper to serve
+    costs = np.where(severity < 4, rng.uniform(0, 1, 12), rng.uniform(500, 1000, 12))
+    chosen = min_cost_assignment(incident_ids, resource_ids, costs, severity_weights(severity))
+    assert sorted(incident_ids[chosen].tolist()) == [4, 5]
+
+
+def test_assigns_as_many_incidents_as_possible():
+    # Incident 1 could take either unit; incident 2 only unit 10
+    incident_ids = np.array([1, 1, 2])
+    resource_ids = np.array([10, 11, 10])
+    costs = np.array([1.0, 50.0, 5.0])
+    chosen = min_cost_assignment(incident_ids, resource_ids, costs)
+    assert sorted(zip(incident_ids[chosen], resource_ids[chosen])) == [(1, 11), (2, 10)]
+
+
+def test_each_unit_used_once_at_minimum_cost():
+    incident_ids = np.array([1, 1, 2, 2])
+    resource_ids = np.array([10, 11, 10, 11])
+    costs = np.array([1.0, 2.0, 1.5, 10.0])
+    chosen = min_cost_assignment(incident_ids, resource_ids, costs)
+    assert sorted(zip(incident_ids[chosen], resource_ids[chosen])) == [(1, 11), (2, 10)]
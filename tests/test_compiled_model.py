@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor, VotingRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from compiled_model import (MAX_PREDICTION_DIFFERENCE, HybridPredictor, check_compiled, compile_model,
+                            load_compiled, save_compiled)
+
+N_FEATURES = 6
+
+
+def make_data(n_rows, seed, missing_share=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 10, (n_rows, N_FEATURES)).astype(np.float32)
+    y = 2 * X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0, 1, n_rows)
+    X[rng.random(X.shape) < missing_share] = np.nan
+    return X, y
+
+
+TREE_MODELS = {
+    'tree': lambda: DecisionTreeRegressor(random_state=0),
+    'forest': lambda: RandomForestRegressor(n_estimators=10, random_state=0),
+    'hist': lambda: HistGradientBoostingRegressor(max_iter=30, random_state=0),
+    'voting': lambda: VotingRegressor([('rf', RandomForestRegressor(n_estimators=5, random_state=0)),
+                                       ('hgb', HistGradientBoostingRegressor(max_iter=20, random_state=0))]),
+}
+
+
+@pytest.mark.parametrize('name', TREE_MODELS)
+@pytest.mark.parametrize('train_missing', [0.0, 0.2])
+def test_compiled_matches_sklearn_with_missing_values(name, train_missing):
+    X, y = make_data(2000, seed=0, missing_share=train_missing)
+    model = TREE_MODELS[name]().fit(X, y)
+    compiled = compile_model(model, N_FEATURES)
+
+    X_test, _ = make_data(500, seed=1, missing_share=0.3)
+    difference = np.abs(compiled.predict(X_test) - model.predict(X_test)).max()
+    assert difference <= MAX_PREDICTION_DIFFERENCE
+    check_compiled(compiled, model, X_test)
+
+
+def test_check_compiled_catches_wrong_missing_direction():
+    X, y = make_data(2000, seed=0, missing_share=0.2)
+    model = HistGradientBoostingRegressor(max_iter=30, random_state=0).fit(X, y)
+    compiled = compile_model(model, N_FEATURES)
+    compiled.missing_right = ~compiled.missing_right
+    with pytest.raises(ValueError):
+        check_compiled(compiled, model, make_data(200, seed=1)[0])
+
+
+def test_hybrid_sends_missing_values_to_sklearn():
+    X, y = make_data(500, seed=0)
+    model = VotingRegressor([('rf', RandomForestRegressor(n_estimators=5, random_state=0)),
+                             ('lr', LinearRegression())]).fit(X, y)
+    hybrid = HybridPredictor(compile_model(model, N_FEATURES), model)
+    X_test = make_data(10, seed=1, missing_share=0.3)[0]
+    # LinearRegression rejects NaN; the compiled linear term would return NaN instead
+    with pytest.raises(ValueError):
+        hybrid.predict(X_test)
+
+
+def test_saved_model_keeps_missing_directions(tmp_path):
+    X, y = make_data(2000, seed=0, missing_share=0.2)
+    model = HistGradientBoostingRegressor(max_iter=30, random_state=0).fit(X, y)
+    save_compiled(compile_model(model, N_FEATURES), str(tmp_path / 'compiled'))
+    compiled = load_compiled(str(tmp_path / 'compiled'))
+    X_test = make_data(500, seed=1, missing_share=0.3)[0]
+    assert np.abs(compiled.predict(X_test) - model.predict(X_test)).max() <= MAX_PREDICTION_DIFFERENCE